@@ -2,6 +2,7 @@
 This module provides functions to analyze habit completion data
 
 count_habit(inlist, period): counts number of completions for given period and list of habits
+completion_arrays(inlist): returns completion days of all habits as one array with offsets
 habit_completion_counts(inlist, indate_early, indate_late): counts number of completion for each habit in giuven period
 completions_habits(inlist, indate_early, indate_late): returns stats like actual and potential completions
 habit_completion_stats(inlist, indate_early, indate_end): returns table with habit data and completion statistics
@@ -12,14 +13,31 @@ habit_streak_stats(inlist): returns habit information and streak statistics for
 streak_data(df, mode): returns streak stats and habit info for longest current or all_time streaks
 completion_dates_statistics(habit): returns completion dates grouped by year and month
 count_completion_dates_statistics(habit): counts completions per month in each year
+
+Completion dates statistics are cached per habit and dropped on completed, cleared and deleted events of the habit
 """
 
+import numpy as np
 import pandas as pd
+import date_kernel
 import tracker
 import tracker_util
-from datetime import datetime, timedelta
+from datetime import datetime
 from functools import reduce
 
+# completion dates statistics per habit: (current and creation year, completion list, statistics)
+_statistics_cache = {}
+
+
+def _invalidate_statistics(event) -> None:
+    """Drops cached statistics of the habit of a HabitEvent
+
+    :param tracker.HabitEvent event:"""
+    _statistics_cache.pop(event.habit, None)
+
+
+tracker.Habit.events.subscribe(_invalidate_statistics, ("completed", "removed", "cleared", "deleted"))
+
 
 def count_habit(inlist=tracker.Habit.habit_list, period="all") -> int:
     """Counts number of times habits have been completed
@@ -40,6 +58,23 @@ def count_habit(inlist=tracker.Habit.habit_list, period="all") -> int:
     return reduce(lambda x, y: x + y, list(map(map_number_of_completions, period_list)))
 
 
+def completion_arrays(inlist) -> tuple:
+    """Returns completion days of all habits as one array, so that all habits can be processed by vectorized
+    functions at once. Completion days of habit i are days[offsets[i]:offsets[i + 1]], in ascending order
+
+    :param list[habit] inlist: list of habit objects
+    :return: tuple[numpy.ndarray[int64], numpy.ndarray[int64]]: day ordinals, offsets of the habits"""
+    arrays = []
+    for habit in inlist:
+        # the completion array cannot be resized by another thread while numpy reads its buffer
+        with habit.lock:
+            arrays.append(date_kernel.to_days(habit.complete_time_list.ordinals()))
+    offsets = np.zeros(len(arrays) + 1, dtype=np.int64)
+    np.cumsum([len(days) for days in arrays], out=offsets[1:])
+    days = np.concatenate(arrays) if arrays else np.zeros(0, dtype=np.int64)
+    return days, offsets
+
+
 def habit_completion_counts(inlist, indate_early, indate_late=datetime.today()) -> list:
     """Calculates number of completions for each habit for a list of habit objects
 
@@ -48,54 +83,16 @@ def habit_completion_counts(inlist, indate_early, indate_late=datetime.today())
     :param datetime indate_late: cutoffdate later
     :return: list[int]: list of integers
     """
-    # change period end points of weekly habits to include entire week
-    def map_week_period_date_early(x) -> datetime:
-        """Changes period start date to beginning of the calendar week
-        :param habit object x: habit object
-        :returns: datetime: period start"""
-        if x.period == "daily":
-            return indate_con_early
-        elif x.period == "weekly":
-            return indate_con_early - timedelta(days=(indate_con_early.isoweekday() - 1))
-
-    def map_week_period_date_late(x) -> datetime:
-        """Changes period end date to end of the calendar week
-        :param habit object x: habit object
-        :returns: datetime: period end"""
-        if x.period == "daily":
-            return indate_con_late
-        elif x.period == "weekly":
-            return indate_con_late + timedelta(days=(7 - indate_con_late.isoweekday()))
-
     # empty input
     if not inlist:
         return []
-    # dropping HH:MM:SS
-    indate_con_early = tracker_util.date_conversion([indate_early])[0]
-    indate_con_late = tracker_util.date_conversion([indate_late])[0]
-    # auxiliary lists for map operations
-    aux_list_mode_early = ["before"] * (count_habit(inlist) + len(inlist))
-    aux_list_mode_late = ["after"] * (count_habit(inlist) + len(inlist))
-
-    # adapt period dates so that they capture entire calendar week
-    aux_list_indate_early_adapted = list(map(map_week_period_date_early, inlist))
-    aux_list_indate_late_adapted = list(map(map_week_period_date_late, inlist))
-
-    # list of complete_time_list attributes of habit objects
-    list_completion_date_lists = list(map(lambda x: x.complete_time_list, inlist))
-
-    # filter out all dates prior to indate_early
-    list_completion_date_lists_filtered_before = list(map(tracker_util.filter_from_date,
-                                                          list_completion_date_lists,
-                                                          aux_list_indate_early_adapted,
-                                                          aux_list_mode_early))
-    # filter out all dates after indate_late
-    list_completion_date_lists_filtered_after = list(map(tracker_util.filter_from_date,
-                                                         list_completion_date_lists_filtered_before,
-                                                         aux_list_indate_late_adapted,
-                                                         aux_list_mode_late))
-    # calculate number of completions for each habit
-    return list(map(lambda x: len(x), list_completion_date_lists_filtered_after))
+    # periods of weekly habits are extended to entire calendar weeks
+    weekly = np.fromiter((habit.period == "weekly" for habit in inlist), dtype=bool, count=len(inlist))
+    period_start = date_kernel.period_start_v(date_kernel.to_day(indate_early), weekly)
+    period_end = date_kernel.period_end_v(date_kernel.to_day(indate_late), weekly)
+    # completions of all habits are counted by one binary search over their concatenated completion days
+    days, offsets = completion_arrays(inlist)
+    return date_kernel.count_days_v(days, offsets, period_start, period_end).tolist()
 
 
 def completions_habits(inlist, indate_start=datetime(1900, 1, 1), indate_end=datetime.today()) -> tuple:
@@ -162,8 +159,7 @@ def completions_habits(inlist, indate_start=datetime(1900, 1, 1), indate_end=dat
                 return tracker_util.day_streak(start_date2, indate_end_c)
         elif x.period == "weekly":
             # check if start date is after end date in terms of calendar week
-            if (start_date2 - timedelta(days=start_date2.isoweekday() - 1) >
-                    (indate_end_c - timedelta(days=indate_end_c.isoweekday() - 1))):
+            if tracker_util.iso_week_index(start_date2) > tracker_util.iso_week_index(indate_end_c):
                 return 0
             else:
                 return tracker_util.week_streak(start_date2, indate_end_c)
@@ -202,8 +198,7 @@ def completions_habits(inlist, indate_start=datetime(1900, 1, 1), indate_end=dat
                 return tracker_util.day_streak(start_date2, indate_end_c)
         elif x.period == "weekly":
             # check if start date is after end date in terms of calendar week
-            if (start_date2 - timedelta(days=start_date2.isoweekday() - 1) >
-                    (indate_end_c - timedelta(days=indate_end_c.isoweekday() - 1))):
+            if tracker_util.iso_week_index(start_date2) > tracker_util.iso_week_index(indate_end_c):
                 return 0
             else:
                 return tracker_util.week_streak(start_date2, indate_end_c)
@@ -466,14 +461,12 @@ def habit_streak_stats(inlist) -> pd.DataFrame:
     habit_names = list(map(lambda x: x.habit_name, inlist))
     habit_period = list(map(lambda x: x.period, inlist))
     habit_credate = list(map(lambda x: x.creation_date, inlist))
-    habit_comptimes = list(map(lambda x: x.complete_time_list, inlist))
 
-    current_streak = list(map(streak_current, habit_comptimes, habit_period))
-    longest_streak = list(map(streaks_longest, habit_comptimes, habit_period))
-    list_streak_current_length = list(map(lambda x: x[0], current_streak))
-    list_streak_current_date = list(map(lambda x: x[1], current_streak))
-    list_streak_longest_length = list(map(lambda x: x[0], longest_streak))
-    list_streak_longest_dates = list(map(lambda x: x[1], longest_streak))
+    # streaks are maintained by the habit objects, so that they do not get recomputed from the full history
+    list_streak_current_length = list(map(lambda x: x.current_streak, inlist))
+    list_streak_current_date = list(map(lambda x: x.current_streak_start, inlist))
+    list_streak_longest_length = list(map(lambda x: x.longest_streak, inlist))
+    list_streak_longest_dates = list(map(lambda x: x.longest_streak_dates, inlist))
 
     df = pd.DataFrame({
         "object": inlist,
@@ -539,7 +532,13 @@ def completion_dates_statistics(habit) -> tuple:
     inlist = habit.complete_time_list
     if not inlist:
         return ()
-    list_years = list(range(datetime.today().year, habit.creation_date.year - 1, -1))
+    year = datetime.today().year
+    # statistics also depend on the current year, the creation date and a completion list loaded from the database
+    key = (year, habit.creation_date.year)
+    cached = _statistics_cache.get(habit)
+    if cached is not None and cached[0] == key and cached[1] is inlist:
+        return cached[2]
+    list_years = list(range(year, habit.creation_date.year - 1, -1))
 
     def year_filter(year, dates):
         """Filters out all dates unequal to given year
@@ -571,6 +570,7 @@ def completion_dates_statistics(habit) -> tuple:
         return tuple(map(month_filter, dates_by_year_list, months))
 
     list_dates_by_year_month = tuple(map(year_month_filter, list_dates_by_year))
+    _statistics_cache[habit] = (key, inlist, list_dates_by_year_month)
 
     return list_dates_by_year_month
 
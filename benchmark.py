@@ -0,0 +1,227 @@
+"""
+This module provides benchmarks for the persistence layer. Results get printed to the console
+
+Start a benchmark from the main directory, e.g.:
+    python benchmark.py bulk-insert --habits 1000 --days 365
+
+Commands:
+    bulk-insert: measures throughput of bulk_insert_habits and bulk_insert_completions
+    load: measures start-up load time of db_to_object
+    profiles: measures save and load throughput under each SQLite performance profile
+    memory: measures memory per completion of CompletionList compared to a list of datetime objects
+    threads: completes and creates habits from many threads and checks for duplicate completions and ids
+    date-kernel: measures time per call of date calculations with datetime conversion, on day ordinals and vectorized
+"""
+
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+import click
+import date_kernel
+import databaseSQL
+import tracker
+import tracker_testing_data
+import tracker_util
+
+
+def temp_db() -> tuple:
+    """Returns file name and database name of a new temporary database file
+
+    :return: tuple[str, str]: file name, database name"""
+    file_name = os.path.join(tempfile.mkdtemp(), "benchmark.db")
+    return file_name, f"sqlite:///{file_name}"
+
+
+def remove_db(file_name) -> None:
+    """Closes shared engine and deletes database file and its directory
+
+    :param str file_name: file name of database"""
+    databaseSQL.close_engine(f"sqlite:///{file_name}")
+    for suffix in ("", "-wal", "-shm", "-journal"):
+        tracker_util.delete_file(file_name + suffix)
+    os.rmdir(os.path.dirname(file_name))
+
+
+def report(name, rows, seconds) -> None:
+    """Prints result of a benchmark
+
+    :param str name: name of measurement
+    :param int rows: number of processed rows
+    :param float seconds: duration"""
+    click.echo(f" {name}: {rows} rows in {seconds:.3f} s - {int(rows / max(seconds, 1e-9))} rows/s")
+
+
+@click.group()
+def cli() -> None:
+    """Benchmarks for the habit tracker persistence layer"""
+
+
+@cli.command("bulk-insert")
+@click.option("--habits", default=1000, help="number of habits")
+@click.option("--days", default=365, help="number of tracked days per habit")
+@click.option("--date-format", default="string", type=click.Choice(databaseSQL.DATE_FORMATS),
+              help="storage format of dates")
+def bench_bulk_insert(habits, days, date_format) -> None:
+    """Measures throughput of the bulk insert functions"""
+    file_name, db_name = temp_db()
+    try:
+        start = time.perf_counter()
+        rows = tracker_testing_data.load_bulk_test_data_to_db(habits, days, db_name, date_format=date_format)
+        report("bulk insert", rows + habits, time.perf_counter() - start)
+    finally:
+        remove_db(file_name)
+
+
+@cli.command("load")
+@click.option("--habits", default=10000, help="number of habits")
+@click.option("--days", default=700, help="number of tracked days per habit, 700 days result in 5M completions for "
+                                          "10k habits")
+@click.option("--date-format", default="string", type=click.Choice(databaseSQL.DATE_FORMATS),
+              help="storage format of dates")
+@click.option("--lazy", is_flag=True, help="load habits without completion history")
+def bench_load(habits, days, date_format, lazy) -> None:
+    """Measures start-up load time of db_to_object"""
+    file_name, db_name = temp_db()
+    try:
+        rows = tracker_testing_data.load_bulk_test_data_to_db(habits, days, db_name, date_format=date_format)
+        start = time.perf_counter()
+        databaseSQL.db_to_object(db_name, lazy=lazy)
+        report("lazy load" if lazy else "load", rows + habits, time.perf_counter() - start)
+    finally:
+        tracker.Habit.habit_list.clear()
+        remove_db(file_name)
+
+
+@cli.command("profiles")
+@click.option("--habits", default=1000, help="number of habits")
+@click.option("--days", default=365, help="number of tracked days per habit")
+@click.option("--single-inserts", default=500, help="number of completions saved with one commit each")
+def bench_profiles(habits, days, single_inserts) -> None:
+    """Measures save and load throughput under each SQLite performance profile"""
+    profile = databaseSQL.database_manager.profile
+    try:
+        for name in databaseSQL.PERFORMANCE_PROFILES:
+            databaseSQL.set_performance_profile(name)
+            click.echo(f"{name}:")
+            file_name, db_name = temp_db()
+            try:
+                start = time.perf_counter()
+                rows = tracker_testing_data.load_bulk_test_data_to_db(habits, days, db_name)
+                report("bulk insert", rows + habits, time.perf_counter() - start)
+                date_start = datetime(2024, 1, 1)
+                start = time.perf_counter()
+                for day in range(single_inserts):
+                    databaseSQL.insert_complete_time_list(date_start + timedelta(days=day), 1, db_name)
+                report("single inserts", single_inserts, time.perf_counter() - start)
+                start = time.perf_counter()
+                databaseSQL.db_to_object(db_name)
+                report("load", rows + single_inserts + habits, time.perf_counter() - start)
+            finally:
+                tracker.Habit.habit_list.clear()
+                remove_db(file_name)
+    finally:
+        databaseSQL.set_performance_profile(profile)
+
+
+@cli.command("memory")
+@click.option("--completions", default=100000, help="number of completions")
+def bench_memory(completions) -> None:
+    """Measures memory per completion of CompletionList compared to a list of datetime objects"""
+    date_start = datetime(2000, 1, 1)
+    for name, factory in (("list of datetime", list), ("CompletionList", tracker.CompletionList)):
+        tracemalloc.start()
+        dates = factory(date_start + timedelta(days=day) for day in range(completions))
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        click.echo(f" {name}: {size / len(dates):.1f} bytes per completion")
+        del dates
+
+
+@cli.command("threads")
+@click.option("--threads", default=8, help="number of threads")
+@click.option("--habits", default=20, help="number of habits shared by all threads")
+@click.option("--completions", default=20000, help="number of completion attempts per thread")
+@click.option("--days", default=60, help="number of days the completion dates are drawn from")
+def bench_threads(threads, habits, completions, days) -> None:
+    """Completes shared habits and creates new ones from many threads at once. Every thread tries to complete the same
+    habits on the same days, so that each period must be completed exactly once"""
+    habit_list = tracker.Habit.habit_list
+    habit_list.clear()
+    shared = [tracker.Habit(f"habit {i}", "weekly" if i % 2 else "daily", datetime(2024, 1, 1))
+              for i in range(habits)]
+    date_start = datetime(2024, 1, 1)
+    accepted = [0] * threads
+    barrier = threading.Barrier(threads)
+
+    def work(thread) -> None:
+        generator = random.Random(thread)
+        barrier.wait()
+        for _ in range(completions):
+            habit = shared[generator.randrange(habits)]
+            if habit.complete_habit(date_start + timedelta(days=generator.randrange(days))):
+                accepted[thread] += 1
+            if generator.random() < 0.01:
+                tracker.Habit(f"thread {thread}", "daily")
+
+    # frequent thread switches make races between checking and completing likely
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        workers = [threading.Thread(target=work, args=(thread,)) for thread in range(threads)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        seconds = time.perf_counter() - start
+    finally:
+        sys.setswitchinterval(switch_interval)
+    report("completion attempts", threads * completions, seconds)
+    duplicates = sum(len(habit.complete_time_list.ordinals()) -
+                     len({tracker.period_key(day, habit.period) for day in habit.complete_time_list.ordinals()})
+                     for habit in shared)
+    ids = [habit.habit_id for habit in habit_list]
+    click.echo(f" accepted completions: {sum(accepted)}, stored completions: "
+               f"{sum(len(habit.complete_time_list) for habit in shared)}")
+    click.echo(f" duplicate completions in a period: {duplicates}, duplicate habit ids: {len(ids) - len(set(ids))}")
+    habit_list.clear()
+
+
+@cli.command("date-kernel")
+@click.option("--calls", default=200000, help="number of calls per measurement")
+def bench_date_kernel(calls) -> None:
+    """Measures time per call of days_difference and week_streak: converting datetime objects with date_conversion
+    as before, the tracker_util wrappers, date_kernel on day ordinals and the vectorized date_kernel functions"""
+    date_start = datetime(2000, 1, 1, 12)
+    dates = [date_start + timedelta(days=day % 3650) for day in range(calls)]
+    days = [indate.toordinal() for indate in dates]
+    day_array = date_kernel.to_days(days)
+    end = datetime(2024, 6, 30, 8)
+
+    def date_conversion_days_difference(indate1, indate2) -> int:
+        date1 = tracker_util.date_conversion([indate1])[0]
+        date2 = tracker_util.date_conversion([indate2])[0]
+        return (date2 - date1).days if date2 > date1 else (date1 - date2).days
+
+    measurements = (
+        ("days_difference with date_conversion", lambda: [date_conversion_days_difference(x, end) for x in dates]),
+        ("tracker_util.days_difference", lambda: [tracker_util.days_difference(x, end) for x in dates]),
+        ("date_kernel.days_difference", lambda: [date_kernel.days_difference(x, end.toordinal()) for x in days]),
+        ("date_kernel.days_difference_v", lambda: date_kernel.days_difference_v(day_array, end.toordinal())),
+        ("tracker_util.week_streak", lambda: [tracker_util.week_streak(x, end) for x in dates]),
+        ("date_kernel.week_streak", lambda: [date_kernel.week_streak(x, end.toordinal()) for x in days]),
+        ("date_kernel.week_streak_v", lambda: date_kernel.week_streak_v(day_array, end.toordinal())))
+    for name, function in measurements:
+        start = time.perf_counter()
+        function()
+        seconds = time.perf_counter() - start
+        click.echo(f" {name}: {seconds / calls * 1e9:.1f} ns per call")
+
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,161 @@
+"""
+This module provides a bitmap representation of completion dates: one bit per period (day for daily habits, ISO
+calendar week for weekly habits) since an origin period, stored in a Python int. Counts use popcount, windowed counts
+use range masks and streaks are found by scanning runs of set bits
+
+CompletionBitmap: bitset of completed periods
+CompletionBitmap.from_days(days, period, origin): builds bitmap from day ordinals
+CompletionBitmap.from_bytes(data): deserializes bitmap, e.g. from a BLOB column
+"""
+import struct
+from array import array
+import date_kernel
+
+# serialized form: encoding, period, origin followed by the payload
+HEADER = struct.Struct("<BBi")
+ENCODING_RAW = 0
+ENCODING_RLE = 1
+PERIODS = ("daily", "weekly")
+
+
+class CompletionBitmap:
+    """
+    Bitset of completed periods. Bit i stands for period origin + i, periods are day ordinals (see date.toordinal)
+    for daily habits and week numbers (see date_kernel.iso_week_index) for weekly habits
+
+    :param int origin: first period of the bitmap
+    :param int bits: bitset
+    :param str period: [daily, weekly]
+    """
+    __slots__ = ("origin", "bits", "period")
+
+    def __init__(self, origin=0, bits=0, period="daily"):
+        self.origin = origin
+        self.bits = bits
+        self.period = period
+
+    @classmethod
+    def from_days(cls, days, period="daily", origin=None):
+        """Builds bitmap from day ordinals
+
+        :param Iterable[int] days: day ordinals of completions
+        :param str period: [daily, weekly]
+        :param int origin: first period of the bitmap, e.g. the period of the creation date. Earlier completions move
+        the origin
+        :return: CompletionBitmap"""
+        keys = list(map(date_kernel.iso_week_index, days)) if period == "weekly" else list(days)
+        if not keys:
+            return cls(origin or 0, 0, period)
+        first = min(keys)
+        origin = first if origin is None else min(origin, first)
+        buffer = bytearray((max(keys) - origin) // 8 + 1)
+        for key in keys:
+            offset = key - origin
+            buffer[offset >> 3] |= 1 << (offset & 7)
+        return cls(origin, int.from_bytes(buffer, "little"), period)
+
+    def key(self, day) -> int:
+        """Returns period of a day ordinal
+
+        :param int day: day ordinal
+        :return: int"""
+        return date_kernel.iso_week_index(day) if self.period == "weekly" else day
+
+    def __contains__(self, key) -> bool:
+        offset = key - self.origin
+        return offset >= 0 and (self.bits >> offset) & 1 == 1
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def __eq__(self, other):
+        if not isinstance(other, CompletionBitmap):
+            return NotImplemented
+        return self.period == other.period and list(self.runs()) == list(other.runs())
+
+    def count(self) -> int:
+        """Returns number of completed periods
+
+        :return: int"""
+        return self.bits.bit_count()
+
+    def count_range(self, first, last) -> int:
+        """Returns number of completed periods from first to last period, both included
+
+        :param int first: first period
+        :param int last: last period
+        :return: int"""
+        first = max(first - self.origin, 0)
+        last = last - self.origin
+        if last < first:
+            return 0
+        return ((self.bits >> first) & ((1 << (last - first + 1)) - 1)).bit_count()
+
+    def runs(self):
+        """Yields runs of consecutive completed periods in ascending order
+
+        :return: generator of tuple[int, int]: first period, number of periods"""
+        bits = self.bits
+        offset = 0
+        while bits:
+            # skip trailing zeros, then count trailing ones
+            zeros = (bits & -bits).bit_length() - 1
+            bits >>= zeros
+            offset += zeros
+            length = (~bits & (bits + 1)).bit_length() - 1
+            yield self.origin + offset, length
+            bits >>= length
+            offset += length
+
+    def longest_run(self) -> int:
+        """Returns length of the longest run of completed periods
+
+        :return: int"""
+        return max((length for _, length in self.runs()), default=0)
+
+    def run_ending_at(self, key) -> int:
+        """Returns length of the run of completed periods, which ends with given period
+
+        :param int key: period
+        :return: int: 0 if period is not completed"""
+        offset = key - self.origin
+        if offset < 0:
+            return 0
+        # the highest zero below the period ends the run
+        window = self.bits & ((1 << (offset + 1)) - 1)
+        gap = ~window & ((1 << (offset + 1)) - 1)
+        return offset + 1 - gap.bit_length() if window >> offset & 1 else 0
+
+    def to_bytes(self) -> bytes:
+        """Serializes bitmap. Sparse bitmaps, e.g. of weekly habits, are stored as runs (first period offset, length)
+        if that is smaller than the raw bitset
+
+        :return: bytes"""
+        period = PERIODS.index(self.period)
+        raw = self.bits.to_bytes((self.bits.bit_length() + 7) // 8, "little")
+        runs = array("I")
+        for first, length in self.runs():
+            runs.extend((first - self.origin, length))
+        if runs.itemsize * len(runs) < len(raw):
+            return HEADER.pack(ENCODING_RLE, period, self.origin) + runs.tobytes()
+        return HEADER.pack(ENCODING_RAW, period, self.origin) + raw
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Deserializes bitmap created by to_bytes
+
+        :param bytes data:
+        :return: CompletionBitmap"""
+        encoding, period, origin = HEADER.unpack_from(data)
+        payload = data[HEADER.size:]
+        if encoding == ENCODING_RAW:
+            return cls(origin, int.from_bytes(payload, "little"), PERIODS[period])
+        runs = array("I")
+        runs.frombytes(payload)
+        bits = 0
+        for i in range(0, len(runs), 2):
+            bits |= ((1 << runs[i + 1]) - 1) << runs[i]
+        return cls(origin, bits, PERIODS[period])
+
+    def __repr__(self) -> str:
+        return f"CompletionBitmap(origin={self.origin}, count={self.count()}, period={self.period!r})"
@@ -0,0 +1,182 @@
+"""
+This module provides an asyncio interface to the persistence layer in databaseSQL. Database work runs on a single
+worker thread, so that the event loop is never blocked by SQLite and all statements are executed in order
+
+load_data(db_name, lazy): loads habit objects from database to habit_list without blocking the event loop
+save_changes(db_name): saves changes of habit objects since the last save or load without blocking the event loop
+stream_complete_time_list(...): yields completion rows from database without blocking the event loop
+Checkpointer: saves changes periodically or on request in the background, usable as async context manager
+shutdown(): waits for pending database work and stops the worker thread
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import databaseSQL
+import tracker
+
+# one worker thread keeps database work in submission order
+_executor = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Returns worker thread executor and creates it on first use
+
+    :return: ThreadPoolExecutor"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="databaseAsync")
+    return _executor
+
+
+async def _run(function, *args, **kwargs):
+    """Runs function on the worker thread and waits for its result without blocking the event loop
+
+    :param function: function to run
+    :return: result of function"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), lambda: function(*args, **kwargs))
+
+
+async def load_data(db_name='sqlite:///user_data.db', lazy=False) -> None:
+    """Loads habit objects stored in database to habit_list, see databaseSQL.db_to_object. Creates the database if it
+    does not exist already and upgrades it otherwise
+
+    :param str db_name: database name
+    :param bool lazy: load completion dates on demand"""
+    await _run(databaseSQL.create_db, db_name)
+    await _run(databaseSQL.db_to_object, db_name, lazy)
+
+
+async def save_changes(db_name='sqlite:///user_data.db') -> None:
+    """Saves habits incrementally, see databaseSQL.save_changes. Changes are taken on the calling thread, so habits can
+    be changed again while the worker thread writes. Changes are restored if the save fails
+
+    :param str db_name: name of database"""
+    habit_list = tracker.Habit.habit_list
+    removed_ids, changes = habit_list.take_changes()
+    if not removed_ids and not changes:
+        return
+    future = asyncio.get_running_loop().run_in_executor(_get_executor(), databaseSQL.write_changes, removed_ids,
+                                                        changes, db_name)
+    try:
+        try:
+            await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # a running write cannot be interrupted, its outcome decides whether the changes get restored. The
+            # cancellation is passed on either way, so that a cancelled checkpoint loop stops
+            try:
+                await future
+            except Exception:
+                habit_list.restore_changes(removed_ids, changes)
+            raise
+    except Exception:
+        habit_list.restore_changes(removed_ids, changes)
+        raise
+
+
+async def stream_complete_time_list(habit_id=None, db_name='sqlite:///user_data.db', date_from=None, date_to=None,
+                                    batch_size=1000, batches=False):
+    """Yields rows of complete_time_list table, see databaseSQL.stream_complete_time_list. Each batch is fetched on the
+    worker thread
+
+    :param int|Iterable[int]|None habit_id: habit_id or several habit ids, None for all habits
+    :param str db_name: database name
+    :param datetime|date|None date_from: first day of range, included
+    :param datetime|date|None date_to: last day of range, included
+    :param int batch_size: number of rows fetched at once
+    :param bool batches: yield lists of up to batch_size rows instead of single rows
+    :return: async generator of rows or lists of rows"""
+    stream = databaseSQL.stream_complete_time_list(habit_id, db_name, date_from, date_to, batch_size, batches=True)
+    try:
+        while True:
+            rows = await _run(next, stream, None)
+            if rows is None:
+                return
+            if batches:
+                yield rows
+            else:
+                for row in rows:
+                    yield row
+    finally:
+        # returns the pooled connection of an unfinished stream
+        await _run(stream.close)
+
+
+async def shutdown() -> None:
+    """Waits for pending database work and stops the worker thread. A new one is started on next use"""
+    global _executor
+    executor, _executor = _executor, None
+    if executor is not None:
+        await asyncio.get_running_loop().run_in_executor(None, executor.shutdown)
+
+
+class Checkpointer:
+    """
+    Saves changes of habit_list in the background, so that changing a habit returns right away while the changes get
+    written on the worker thread. Changes are saved every interval seconds and as soon as possible after request()
+
+        async with Checkpointer('sqlite:///user_data.db') as checkpointer:
+            habit.complete_habit()
+            checkpointer.request()
+
+    Leaving the with-block or stop() saves remaining changes. Errors of background saves are kept in last_error and
+    the changes are saved with the next checkpoint
+    :param str db_name: name of database
+    :param float interval: seconds between checkpoints
+    """
+
+    def __init__(self, db_name='sqlite:///user_data.db', interval=5.0):
+        self.db_name = db_name
+        self.interval = interval
+        self.checkpoints = 0
+        self.last_error = None
+        self._requested = None
+        self._task = None
+
+    def start(self) -> None:
+        """Starts background saving on the running event loop"""
+        if self._task is None:
+            self._requested = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def request(self) -> None:
+        """Requests a checkpoint as soon as possible without waiting for it"""
+        if self._requested is not None:
+            self._requested.set()
+
+    async def checkpoint(self) -> None:
+        """Saves changes now and waits until they are written"""
+        try:
+            await save_changes(self.db_name)
+            self.last_error = None
+        except Exception as error:
+            self.last_error = error
+        self.checkpoints += 1
+
+    async def stop(self) -> None:
+        """Stops background saving and saves remaining changes"""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._requested = None
+        await self.checkpoint()
+
+    async def _run(self) -> None:
+        """Checkpoint loop of the background task"""
+        while True:
+            try:
+                await asyncio.wait_for(self._requested.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._requested.clear()
+            await self.checkpoint()
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        await self.stop()
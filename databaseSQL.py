@@ -1,31 +1,365 @@
 """
 This module provides an interface between the application and the SQL database. It loads and saves data
 
-create_db(db_name): creates database with given name
+DatabaseManager: keeps one engine with a connection pool per database name, usable as context manager
+get_engine(db_name): returns shared engine for given database name
+close_engine(db_name): closes shared engine and its pooled connections for given database name
+set_performance_profile(profile): selects SQLite settings of shared engines [durable, balanced, fast]
+create_db(db_name): creates database with given name in the latest schema version or upgrades an existing one
+get_schema_version(db_name): returns schema version of database
+migrate(db_name): upgrades database in place to the latest schema version
+get_date_format(db_name): returns storage format of dates [string, ordinal]
+convert_date_format(db_name, date_format): converts stored dates in place into given storage format
+date_to_db(indate, date_format): converts date into stored value of given storage format
+read_completion_dates(habit_id, db_name): reads completion dates of a habit as datetime objects
 insert_data_habit(...): insert attributes except completion dates from habit object into database
 insert_complete_time_list(...): inserts completion dates into database
+bulk_insert_habits(rows, db_name, conn): inserts many habit rows with one executemany per batch
+bulk_insert_completions(rows, db_name, conn): inserts many completion rows with one executemany per batch
+habit_rows(habit_list): returns rows for bulk_insert_habits from habit objects
+completion_rows(habit_list): returns rows for bulk_insert_completions from habit objects
 read_data_habits(...): reads habit attributes except completion dates from database
 read_complete_time_list(...): reads completion dates from database
-object_to_db(db_name): saves habit objects stored in habit_list to given database
-db_to_object(db_name): loads habit objects stored in database to habit_list
+stream_data_habits(db_name, batch_size, batches): yields habit rows from database in constant memory
+stream_complete_time_list(habit_id, db_name, date_from, date_to, batch_size, batches): yields completion rows from
+database in constant memory, optionally filtered by habit ids and date range
+object_to_db(db_name): saves habit objects stored in habit_list to a new file, which atomically replaces the database
+save_changes(db_name): saves only changes of habit objects since the last save or load to given database
+write_changes(removed_ids, changes, db_name): writes recorded changes to database in one transaction
+write_bitmaps(habit_list, conn): stores completion bitmaps of habits in database
+read_bitmap(habit_id, db_name): reads completion bitmap of a habit, builds and stores it if it has been reset
+db_to_object(db_name, lazy): loads habit objects stored in database to habit_list, optionally without completion
+history
 app_load_data_base(db_name): loads habit objects from database and creates database if it does not exist already
 """
-from sqlalchemy import create_engine, MetaData, Table, Column, Integer, String, ForeignKey, insert
+from sqlalchemy import create_engine, MetaData, Table, Column, Integer, String, ForeignKey, Index, insert, update, \
+    delete, bindparam, inspect, literal_column, event, make_url, LargeBinary
 import datetime
-import shutil
 import os
+import threading
+from array import array
+from itertools import chain, islice
+from functools import partial
 import tracker
 import tracker_util
+from completion_bitmap import CompletionBitmap
 from datetime import datetime
 
 
-def create_db(db_name='sqlite:///user_data.db') -> None:
-    """creates database with specified name
+class DatabaseManager:
+    """
+    Keeps one engine per database name, so that all functions of this module share pooled connections instead of
+    opening a new connection for every statement. SQLAlchemy caches compiled statements per engine and the SQLite
+    driver caches prepared statements per connection, so both caches survive between calls as well.
+
+    Engines are closed with close() or when leaving a with-block:
+
+        with DatabaseManager() as manager:
+            engine = manager.get_engine('sqlite:///user_data.db')
+
+    Every new pooled SQLite connection gets the PRAGMA settings of the selected performance profile, see
+    PERFORMANCE_PROFILES. Engines are created and closed under a lock, so that threads, e.g. the worker thread of
+    databaseAsync and the UI thread, share one engine per database
+    :param int cached_statements: number of prepared statements the SQLite driver keeps per connection
+    :param str profile: performance profile [durable, balanced, fast]
+    """
+
+    def __init__(self, cached_statements=256, profile="balanced"):
+        if profile not in PERFORMANCE_PROFILES:
+            raise ValueError(f"unknown performance profile {profile}, use one of {list(PERFORMANCE_PROFILES)}")
+        self.cached_statements = cached_statements
+        self.profile = profile
+        self.engines = {}
+        self.lock = threading.Lock()
+
+    def get_engine(self, db_name='sqlite:///user_data.db'):
+        """Returns engine for given database name and creates it on first use
+
+        :param str db_name: name of database
+        :return: sqlalchemy.Engine"""
+        with self.lock:
+            engine = self.engines.get(db_name)
+            if engine is None:
+                connect_args = {}
+                if db_name.startswith("sqlite"):
+                    connect_args["cached_statements"] = self.cached_statements
+                engine = create_engine(db_name, echo=False, connect_args=connect_args)
+                if db_name.startswith("sqlite"):
+                    event.listen(engine, "connect", self._apply_profile)
+                self.engines[db_name] = engine
+            return engine
+
+    def set_profile(self, profile) -> None:
+        """Selects performance profile. Open engines get closed, so that all connections use the new settings
+
+        :param str profile: performance profile [durable, balanced, fast]"""
+        if profile not in PERFORMANCE_PROFILES:
+            raise ValueError(f"unknown performance profile {profile}, use one of {list(PERFORMANCE_PROFILES)}")
+        self.profile = profile
+        self.close()
+
+    def _apply_profile(self, dbapi_connection, connection_record) -> None:
+        """Executes PRAGMA statements of the selected profile on a new driver connection"""
+        cursor = dbapi_connection.cursor()
+        for pragma, value in PERFORMANCE_PROFILES[self.profile].items():
+            cursor.execute(f"PRAGMA {pragma} = {value}")
+        cursor.close()
+
+    def close(self, db_name=None) -> None:
+        """Closes pooled connections of given database or of all databases if db_name is None. Engines get created
+        again on next use
+
+        :param str db_name: name of database"""
+        with self.lock:
+            if db_name is None:
+                names = list(self.engines)
+            else:
+                names = [db_name]
+            for name in names:
+                engine = self.engines.pop(name, None)
+                if engine is not None:
+                    engine.dispose()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+
+def get_engine(db_name='sqlite:///user_data.db'):
+    """Returns shared engine of the module wide database manager for given database name
+
+    :param str db_name: name of database
+    :return: sqlalchemy.Engine"""
+    return database_manager.get_engine(db_name)
+
+
+def close_engine(db_name=None) -> None:
+    """Closes shared engine for given database name or all shared engines if db_name is None. Must be called before
+    the database file gets deleted or replaced
+
+    :param str db_name: name of database"""
+    database_manager.close(db_name)
+
+
+def set_performance_profile(profile="balanced") -> None:
+    """Selects SQLite settings of the module wide database manager. Open engines get closed
+
+    durable: WAL journal, fsync on every commit
+    balanced: WAL journal, fsync on checkpoints only, memory mapped reads and a larger page cache. A power loss can
+    undo the latest commits, but never corrupts the database
+    fast: WAL journal without fsync, large memory map and page cache. A power loss can corrupt the database
+    :param str profile: performance profile [durable, balanced, fast]"""
+    database_manager.set_profile(profile)
+
+
+def create_db(db_name='sqlite:///user_data.db', date_format="string") -> None:
+    """creates database with specified name in the latest schema version. Existing databases get upgraded instead
+    and keep their date format
+
+    Dates get stored either as strings in %Y-%m-%d %H:%M:%S format or as integer day ordinals (see date.toordinal),
+    which are smaller and faster to save and load but drop the time of day
     :param string db_name: name of database
+    :param string date_format: storage format of dates [string, ordinal]
     """
-    engine = create_engine(db_name, echo=False)
-    meta.create_all(engine)
-    engine.dispose()
+    if date_format not in DATE_FORMATS:
+        raise ValueError(f"Date format must be one of {DATE_FORMATS}")
+    engine = get_engine(db_name)
+    if inspect(engine).has_table("habits"):
+        migrate(db_name)
+        return
+    with engine.begin() as conn:
+        meta.create_all(conn)
+        _create_summary_triggers(conn)
+        conn.execute(insert(settings).values(key="date_format", value=date_format))
+        conn.exec_driver_sql(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+
+def get_schema_version(db_name='sqlite:///user_data.db') -> int:
+    """Returns schema version stamped into the database. Databases created before versioning have version 0
+    :param str db_name: name of database
+    :return: int: schema version"""
+    with get_engine(db_name).connect() as conn:
+        return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def migrate(db_name='sqlite:///user_data.db') -> int:
+    """Upgrades database in place to the latest schema version by running all migrations newer than its version.
+    Each migration is committed together with its version stamp
+    :param str db_name: name of database
+    :return: int: schema version after the upgrade"""
+    version = get_schema_version(db_name)
+    for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        with get_engine(db_name).begin() as conn:
+            # the SQLite driver only opens transactions before INSERT, UPDATE and DELETE. BEGIN is issued explicitly,
+            # so that schema changes are part of the transaction as well
+            conn.exec_driver_sql("BEGIN")
+            migration(conn)
+            conn.exec_driver_sql(f"PRAGMA user_version = {number}")
+    return max(version, SCHEMA_VERSION)
+
+
+def _migration_index_habit_id_date(conn) -> None:
+    """Schema version 1: composite index on complete_time_list(habit_id, date), so that reading the completion
+    dates of a habit does not scan the whole table
+    :param sqlalchemy.Connection conn: open connection"""
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_complete_time_list_habit_id_date "
+                         "ON complete_time_list (habit_id, date)")
+
+
+def _migration_unique_period(conn) -> None:
+    """Schema version 2: column period_key with the period a completion belongs to and a unique index on
+    (habit_id, period_key), which allows only one completion per period and habit. Duplicates in existing data are
+    removed, the earliest inserted completion of a period is kept
+    :param sqlalchemy.Connection conn: open connection"""
+    columns = [column["name"] for column in inspect(conn).get_columns("complete_time_list")]
+    if "period_key" not in columns:
+        conn.exec_driver_sql("ALTER TABLE complete_time_list ADD COLUMN period_key INTEGER")
+    conn.exec_driver_sql(f"UPDATE complete_time_list SET period_key = "
+                         f"{_period_key_sql('date', 'complete_time_list.habit_id')}")
+    conn.exec_driver_sql("DELETE FROM complete_time_list WHERE period_key IS NOT NULL AND id NOT IN "
+                         "(SELECT MIN(id) FROM complete_time_list GROUP BY habit_id, period_key)")
+    conn.exec_driver_sql("CREATE UNIQUE INDEX IF NOT EXISTS ux_complete_time_list_habit_id_period_key "
+                         "ON complete_time_list (habit_id, period_key)")
+
+
+def _migration_settings(conn) -> None:
+    """Schema version 3: settings table, which records the storage format of dates, and date columns with integer
+    affinity. Columns declared as VARCHAR would turn day ordinals into strings, so both tables get rebuilt. Existing
+    databases store strings
+    :param sqlalchemy.Connection conn: open connection"""
+    settings.create(conn, checkfirst=True)
+    conn.exec_driver_sql("INSERT OR IGNORE INTO settings (key, value) VALUES ('date_format', 'string')")
+    conn.exec_driver_sql("DROP INDEX IF EXISTS ix_complete_time_list_habit_id_date")
+    conn.exec_driver_sql("DROP INDEX IF EXISTS ux_complete_time_list_habit_id_period_key")
+    conn.exec_driver_sql("ALTER TABLE complete_time_list RENAME TO complete_time_list_old")
+    conn.exec_driver_sql("ALTER TABLE habits RENAME TO habits_old")
+    meta.create_all(conn, tables=[habits, complete_time_list])
+    conn.exec_driver_sql("INSERT INTO habits (habit_id, habit, period, creation_date) "
+                         "SELECT habit_id, habit, period, creation_date FROM habits_old")
+    conn.exec_driver_sql("INSERT INTO complete_time_list (id, date, habit_id, period_key) "
+                         "SELECT id, date, habit_id, period_key FROM complete_time_list_old")
+    conn.exec_driver_sql("DROP TABLE complete_time_list_old")
+    conn.exec_driver_sql("DROP TABLE habits_old")
+
+
+def _migration_completion_summary(conn) -> None:
+    """Schema version 4: completion_summary table with number of completions and latest completion date of each
+    habit, kept up to date by triggers. Allows loading habits without their completion history
+    :param sqlalchemy.Connection conn: open connection"""
+    completion_summary.create(conn, checkfirst=True)
+    conn.exec_driver_sql("INSERT OR REPLACE INTO completion_summary (habit_id, completion_count, latest_date) "
+                         "SELECT habit_id, COUNT(*), MAX(date) FROM complete_time_list GROUP BY habit_id")
+    _create_summary_triggers(conn)
+
+
+def _migration_completion_bitmap(conn) -> None:
+    """Schema version 5: bitmap column in completion_summary with the serialized CompletionBitmap of each habit.
+    Triggers reset it on every change of completions, a stored bitmap is always up to date
+    :param sqlalchemy.Connection conn: open connection"""
+    columns = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info(completion_summary)")}
+    if "bitmap" not in columns:
+        conn.exec_driver_sql("ALTER TABLE completion_summary ADD COLUMN bitmap BLOB")
+    for trigger in ("tr_complete_time_list_insert", "tr_complete_time_list_delete"):
+        conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {trigger}")
+    _create_summary_triggers(conn)
+
+
+def _create_summary_triggers(conn) -> None:
+    """Creates triggers, which keep completion_summary up to date on every insert and delete of completions and reset
+    the stored bitmap
+    :param sqlalchemy.Connection conn: open connection"""
+    conn.exec_driver_sql("""
+        CREATE TRIGGER IF NOT EXISTS tr_complete_time_list_insert AFTER INSERT ON complete_time_list BEGIN
+            INSERT INTO completion_summary (habit_id, completion_count, latest_date)
+            VALUES (NEW.habit_id, 1, NEW.date)
+            ON CONFLICT (habit_id) DO UPDATE SET completion_count = completion_count + 1,
+                latest_date = CASE WHEN latest_date IS NULL OR latest_date < excluded.latest_date
+                              THEN excluded.latest_date ELSE latest_date END,
+                bitmap = NULL;
+        END""")
+    conn.exec_driver_sql("""
+        CREATE TRIGGER IF NOT EXISTS tr_complete_time_list_delete AFTER DELETE ON complete_time_list BEGIN
+            UPDATE completion_summary SET completion_count = completion_count - 1,
+                latest_date = (SELECT MAX(date) FROM complete_time_list WHERE habit_id = OLD.habit_id),
+                bitmap = NULL
+            WHERE habit_id = OLD.habit_id;
+        END""")
+    conn.exec_driver_sql("""
+        CREATE TRIGGER IF NOT EXISTS tr_habits_delete AFTER DELETE ON habits BEGIN
+            DELETE FROM completion_summary WHERE habit_id = OLD.habit_id;
+        END""")
+
+
+def get_date_format(db_name='sqlite:///user_data.db', conn=None) -> str:
+    """Returns storage format of dates in database
+    :param str db_name: name of database, ignored if conn is given
+    :param sqlalchemy.Connection conn: open connection
+    :return: str: [string, ordinal]"""
+    if conn is None:
+        with get_engine(db_name).connect() as conn:
+            return get_date_format(conn=conn)
+    # databases which have not been migrated yet store strings
+    if not inspect(conn).has_table("settings"):
+        return "string"
+    return conn.execute(settings.select().with_only_columns(settings.c.value)
+                        .where(settings.c.key == "date_format")).scalar() or "string"
+
+
+def convert_date_format(db_name='sqlite:///user_data.db', date_format="ordinal") -> None:
+    """Converts all stored dates in place into given storage format with one statement per table. Converting to
+    ordinal drops the time of day
+    :param str db_name: name of database
+    :param str date_format: storage format of dates [string, ordinal]"""
+    if date_format not in DATE_FORMATS:
+        raise ValueError(f"Date format must be one of {DATE_FORMATS}")
+    migrate(db_name)
+    with get_engine(db_name).begin() as conn:
+        if get_date_format(conn=conn) == date_format:
+            return
+        for table, column in (("habits", "creation_date"), ("complete_time_list", "date"),
+                              ("completion_summary", "latest_date")):
+            if date_format == "ordinal":
+                conn.exec_driver_sql(f"UPDATE {table} SET {column} = {_ordinal_sql(column)}")
+            else:
+                conn.exec_driver_sql(f"UPDATE {table} SET {column} = "
+                                     f"strftime('%Y-%m-%d %H:%M:%S', {column} + {JULIAN_DAY_OFFSET})")
+        conn.execute(update(settings).where(settings.c.key == "date_format").values(value=date_format))
+
+
+def date_to_db(indate, date_format="string"):
+    """Converts date into value stored in database
+    :param datetime|str|int indate: datetime object, string in %Y-%m-%d %H:%M:%S format or day ordinal
+    :param str date_format: storage format of dates [string, ordinal]
+    :return: str|int: string in %Y-%m-%d %H:%M:%S format or day ordinal"""
+    if date_format == "ordinal":
+        if isinstance(indate, str):
+            indate = datetime.fromisoformat(indate)
+        return indate if isinstance(indate, int) else indate.toordinal()
+    if isinstance(indate, int):
+        indate = datetime.fromordinal(indate)
+    return indate if isinstance(indate, str) else indate.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _ordinal_sql(date_sql) -> str:
+    """Returns SQL expression for the day ordinal (see date.toordinal) of a date string
+    :param str date_sql: SQL expression of date in %Y-%m-%d %H:%M:%S format
+    :return: str: SQL expression"""
+    return f"CAST(julianday({date_sql}) - {JULIAN_DAY_OFFSET} AS INTEGER)"
+
+
+def _period_key_sql(date_sql, habit_id_sql, date_format="string") -> str:
+    """Returns SQL expression for the period a completion date belongs to: the day ordinal (see date.toordinal) for
+    daily habits and the absolute week number since 0001-01-01 (a Monday) for weekly habits
+    :param str date_sql: SQL expression of completion date in given storage format
+    :param str habit_id_sql: SQL expression of habit_id, used to look up the period of the habit
+    :param str date_format: storage format of dates [string, ordinal]
+    :return: str: SQL expression"""
+    ordinal = date_sql if date_format == "ordinal" else _ordinal_sql(date_sql)
+    # SQL form of tracker.period_key, the week number is defined by date_kernel.iso_week_index
+    return (f"CASE (SELECT period FROM habits WHERE habits.habit_id = {habit_id_sql}) "
+            f"WHEN 'weekly' THEN ({ordinal} - 1) / 7 ELSE {ordinal} END")
 
 
 def insert_data_habits(inhabit_id, inhabit, inperiod, increation_date, db_name='sqlite:///user_data.db') -> None:
@@ -36,17 +370,8 @@ def insert_data_habits(inhabit_id, inhabit, inperiod, increation_date, db_name='
     :param string inperiod:
     :param datetime|string increation_date:
     :param string db_name: """
-    # connects to database file in install directory
-    engine = create_engine(db_name, echo=False)
-    conn = engine.connect()
-    # converts input for creation_date into string if input is datetime object
-    if isinstance(increation_date, datetime):
-        increation_date = increation_date.strftime('%Y-%m-%d %H:%M:%S')
-    ins = insert(habits).values(habit_id=inhabit_id, habit=inhabit, period=inperiod, creation_date=increation_date)
-    conn.execute(ins)
-    conn.commit()
-    conn.close()
-    engine.dispose()
+    # shares the statement of the bulk insert, which converts dates into the storage format of the database
+    bulk_insert_habits([(inhabit_id, inhabit, inperiod, increation_date)], db_name=db_name)
 
 
 def insert_complete_time_list(indate, inhabit_id, db_name='sqlite:///user_data.db') -> None:
@@ -55,17 +380,182 @@ def insert_complete_time_list(indate, inhabit_id, db_name='sqlite:///user_data.d
     :param datetime|str indate:
     :param int inhabit_id:
     :param str db_name: """
-    # connects to database file in install directory
-    engine = create_engine(db_name, echo=False)
-    conn = engine.connect()
-    # converts input datetime object into string as SQLite does not accept datetime objects
-    if isinstance(indate, datetime):
-        indate = indate.strftime('%Y-%m-%d %H:%M:%S')
-    ins = insert(complete_time_list).values(date=indate, habit_id=inhabit_id)
-    conn.execute(ins)
-    conn.commit()
-    conn.close()
-    engine.dispose()
+    # shares the statement of the bulk insert, which derives the period_key of the completion
+    bulk_insert_completions([(indate, inhabit_id)], db_name=db_name)
+
+
+def bulk_insert_habits(rows, db_name='sqlite:///user_data.db', conn=None, batch_size=50000) -> int:
+    """Inserts rows into habits table. Rows get streamed in batches, each batch is sent with a single executemany.
+    All batches are written in one transaction, either in the given connection or in a new one
+
+    :param iterable rows: tuples of (habit_id, habit, period, creation_date), creation_date as datetime, string in
+    %Y-%m-%d %H:%M:%S format or day ordinal
+    :param str db_name: name of database, ignored if conn is given
+    :param sqlalchemy.Connection conn: open connection, caller is responsible for committing
+    :param int batch_size: number of rows per executemany
+    :return: int: number of inserted rows"""
+    if conn is None:
+        with get_engine(db_name).begin() as conn:
+            return bulk_insert_habits(rows, conn=conn, batch_size=batch_size)
+    date_format = get_date_format(conn=conn)
+
+    def convert(row):
+        return row[0], row[1], row[2], date_to_db(row[3], date_format)
+
+    statement = "INSERT INTO habits (habit_id, habit, period, creation_date) VALUES (?, ?, ?, ?)"
+    return _bulk_insert(statement, map(convert, rows), conn, batch_size)
+
+
+def bulk_insert_completions(rows, db_name='sqlite:///user_data.db', conn=None, batch_size=50000) -> int:
+    """Inserts rows into complete_time_list table. Rows get streamed in batches, each batch is sent with a single
+    executemany. All batches are written in one transaction, either in the given connection or in a new one
+
+    period_key is computed from the period of the habit, which has to be inserted first. Loads of at least one full
+    batch drop the insert trigger of completion_summary until the end of the load and update the summary once per
+    habit instead of once per row
+    :param iterable rows: tuples of (date, habit_id), date as datetime, string in %Y-%m-%d %H:%M:%S format or day
+    ordinal
+    :param str db_name: name of database, ignored if conn is given
+    :param sqlalchemy.Connection conn: open connection, caller is responsible for committing
+    :param int batch_size: number of rows per executemany
+    :return: int: number of inserted rows"""
+    if conn is None:
+        with get_engine(db_name).begin() as conn:
+            return bulk_insert_completions(rows, conn=conn, batch_size=batch_size)
+    date_format = get_date_format(conn=conn)
+    # stored value and day ordinal of each distinct date, period of each habit
+    dates = {}
+    periods = {}
+    # number of inserted completions and latest stored date per habit
+    summary = {}
+
+    def convert(row):
+        indate, habit_id = row
+        converted = dates.get(indate)
+        if converted is None:
+            converted = dates[indate] = (date_to_db(indate, date_format), date_to_db(indate, "ordinal"))
+        if habit_id not in periods:
+            periods[habit_id] = conn.exec_driver_sql("SELECT period FROM habits WHERE habit_id = ?",
+                                                     (habit_id,)).scalar()
+        value, day = converted
+        counted = summary.get(habit_id)
+        if counted is None:
+            summary[habit_id] = [1, value]
+        else:
+            counted[0] += 1
+            if counted[1] < value:
+                counted[1] = value
+        return value, habit_id, tracker.period_key(day, periods[habit_id])
+
+    statement = "INSERT INTO complete_time_list (date, habit_id, period_key) VALUES (?, ?, ?)"
+    rows = map(convert, rows)
+    first_batch = list(islice(rows, batch_size))
+    deferred = len(first_batch) == batch_size
+    if deferred:
+        if not conn.connection.dbapi_connection.in_transaction:
+            # the driver only begins transactions before INSERT, UPDATE and DELETE. The trigger is dropped inside the
+            # transaction of the load, so that a failed load keeps it
+            conn.exec_driver_sql("BEGIN")
+        conn.exec_driver_sql("DROP TRIGGER IF EXISTS tr_complete_time_list_insert")
+    count = _bulk_insert(statement, chain(first_batch, rows), conn, batch_size)
+    if deferred:
+        conn.exec_driver_sql("""
+            INSERT INTO completion_summary (habit_id, completion_count, latest_date) VALUES (?, ?, ?)
+            ON CONFLICT (habit_id) DO UPDATE SET completion_count = completion_count + excluded.completion_count,
+                latest_date = CASE WHEN latest_date IS NULL OR latest_date < excluded.latest_date
+                              THEN excluded.latest_date ELSE latest_date END,
+                bitmap = NULL""", [(habit_id, number, latest) for habit_id, (number, latest) in summary.items()])
+        _create_summary_triggers(conn)
+    return count
+
+
+def _bulk_insert(statement, rows, conn, batch_size) -> int:
+    """Sends rows in batches of batch_size through executemany of the driver
+
+    :param str statement: SQL insert statement with positional parameters
+    :param iterator rows: tuples of parameters
+    :param sqlalchemy.Connection conn: open connection
+    :param int batch_size: number of rows per executemany
+    :return: int: number of inserted rows"""
+    count = 0
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return count
+        conn.exec_driver_sql(statement, batch)
+        count += len(batch)
+
+
+def habit_rows(habit_list) -> map:
+    """Returns rows for bulk_insert_habits
+
+    :param list[habit] habit_list: list of habit objects
+    :return: iterator of tuples: (habit_id, habit, period, creation_date)"""
+    return map(lambda x: (x.habit_id, x.habit_name, x.period, x.creation_date), habit_list)
+
+
+def completion_rows(habit_list):
+    """Yields rows for bulk_insert_completions
+
+    :param list[habit] habit_list: list of habit objects
+    :return: generator of tuples: (date, habit_id)"""
+    for habit in habit_list:
+        habit_id = habit.habit_id
+        # day ordinals, which date_to_db converts into either storage format
+        for day in habit.complete_time_list.ordinals():
+            yield day, habit_id
+
+
+def read_completion_dates(habit_id, db_name='sqlite:///user_data.db') -> list:
+    """Reads completion dates of a habit in ascending order and converts them into datetime objects
+
+    :param int habit_id:
+    :param str db_name: name of database
+    :return: list[datetime]"""
+    # backfilled completions are stored with higher ids than later dates, so rows are ordered by date
+    select = (complete_time_list.select().with_only_columns(complete_time_list.c.date)
+              .where(complete_time_list.c.habit_id == habit_id)
+              .order_by(complete_time_list.c.date, complete_time_list.c.id))
+    with get_engine(db_name).connect() as conn:
+        to_datetime = _date_converter(conn)
+        return [to_datetime(row[0]) for row in conn.execute(select)]
+
+
+def _date_converter(conn):
+    """Returns function which converts stored dates of the database into datetime objects. Many habits share the same
+    dates, so each distinct stored value only gets converted once
+
+    :param sqlalchemy.Connection conn: open connection
+    :return: function"""
+    convert = datetime.fromordinal if get_date_format(conn=conn) == "ordinal" else datetime.fromisoformat
+    date_cache = {}
+
+    def to_datetime(value) -> datetime:
+        indate = date_cache.get(value)
+        if indate is None:
+            indate = date_cache[value] = convert(value)
+        return indate
+
+    return to_datetime
+
+
+def _day_converter(conn):
+    """Returns function which converts stored dates of the database into day ordinals (see date.toordinal). Stored
+    strings are converted once per distinct value
+
+    :param sqlalchemy.Connection conn: open connection
+    :return: function"""
+    if get_date_format(conn=conn) == "ordinal":
+        return int
+    day_cache = {}
+
+    def to_day(value) -> int:
+        day = day_cache.get(value)
+        if day is None:
+            day = day_cache[value] = datetime.fromisoformat(value).toordinal()
+        return day
+
+    return to_day
 
 
 def read_data_habits(db_name='sqlite:///user_data.db'):
@@ -77,15 +567,10 @@ def read_data_habits(db_name='sqlite:///user_data.db'):
     index position in tuple represent columns
 
     column1: habit_id, column2: habit name: column3: period, column4: creation date"""
-    # connects to database file in install directory
-    engine = create_engine(db_name, echo=False)
-    conn = engine.connect()
     select = habits.select()
-    result = conn.execute(select)
-    row = result.fetchall()
-    conn.close()
-    engine.dispose()
-    return row
+    # connects to database file via shared engine
+    with get_engine(db_name).connect() as conn:
+        return conn.execute(select).fetchall()
 
 
 def read_complete_time_list(habit_id, db_name='sqlite:///user_data.db'):
@@ -96,65 +581,299 @@ def read_complete_time_list(habit_id, db_name='sqlite:///user_data.db'):
     :return: list[tuple[]]: list of tuples where list item represent rows and
     index position in tuple represent columns
 
-    column1: id, column2: completion date, column3: habit_id"""
-    # connects to database file in install directory
-    engine = create_engine(db_name, echo=False)
-    conn = engine.connect()
+    column1: id, column2: completion date, column3: habit_id, column4: period_key"""
     select = complete_time_list.select().where(complete_time_list.c.habit_id == f"{habit_id}")
-    result = conn.execute(select)
-    row = result.fetchall()
-    conn.close()
-    engine.dispose()
-    return row
+    # connects to database file via shared engine
+    with get_engine(db_name).connect() as conn:
+        return conn.execute(select).fetchall()
+
+
+def stream_data_habits(db_name='sqlite:///user_data.db', batch_size=1000, batches=False):
+    """Yields all rows of habits table ordered by habit_id. Rows are fetched from the cursor batch_size rows at a
+    time, so memory use does not depend on the number of habits
+
+    :param str db_name: database name
+    :param int batch_size: number of rows fetched at once
+    :param bool batches: yield lists of up to batch_size rows instead of single rows
+    :return: generator of rows or lists of rows
+
+    column1: habit_id, column2: habit name: column3: period, column4: creation date"""
+    return _stream(habits.select().order_by(habits.c.habit_id), db_name, batch_size, batches)
+
 
+def stream_complete_time_list(habit_id=None, db_name='sqlite:///user_data.db', date_from=None, date_to=None,
+                              batch_size=1000, batches=False):
+    """Yields rows of complete_time_list table in insertion order. Filters are part of the WHERE clause of the query
+    and rows are fetched from the cursor batch_size rows at a time, so histories larger than memory can be processed
+
+    :param int|Iterable[int]|None habit_id: habit_id or several habit ids, None for all habits
+    :param str db_name: database name
+    :param datetime|date|None date_from: first day of range, included
+    :param datetime|date|None date_to: last day of range, included
+    :param int batch_size: number of rows fetched at once
+    :param bool batches: yield lists of up to batch_size rows instead of single rows
+    :return: generator of rows or lists of rows
+
+    column1: id, column2: completion date, column3: habit_id, column4: period_key"""
+    select = complete_time_list.select().order_by(complete_time_list.c.id)
+    if habit_id is not None:
+        if isinstance(habit_id, int):
+            select = select.where(complete_time_list.c.habit_id == habit_id)
+        else:
+            select = select.where(complete_time_list.c.habit_id.in_(list(habit_id)))
+    if date_from is not None or date_to is not None:
+        date_format = get_date_format(db_name)
+        # whole days are compared, a range ends before the start of the day after date_to
+        if date_from is not None:
+            select = select.where(complete_time_list.c.date >= date_to_db(date_from.toordinal(), date_format))
+        if date_to is not None:
+            select = select.where(complete_time_list.c.date < date_to_db(date_to.toordinal() + 1, date_format))
+    return _stream(select, db_name, batch_size, batches)
 
-def object_to_db(db_name='sqlite:///user_data.db', file_name_1="user_data.db") -> None:
-    """Inserts data from habit_list into database
+
+def _stream(select, db_name, batch_size, batches):
+    """Executes select on a pooled connection, which stays checked out until the generator is exhausted or closed
+
+    :param select: sqlalchemy select statement
+    :param str db_name: database name
+    :param int batch_size: number of rows fetched at once
+    :param bool batches: yield lists of rows instead of single rows
+    :return: generator"""
+    if batch_size < 1:
+        raise ValueError("batch_size must be at least 1")
+    with get_engine(db_name).connect() as conn:
+        result = conn.execution_options(stream_results=True).execute(select)
+        while True:
+            rows = result.fetchmany(batch_size)
+            if not rows:
+                return
+            if batches:
+                yield rows
+            else:
+                yield from rows
+
+
+def object_to_db(db_name='sqlite:///user_data.db', file_name_1="user_data.db", date_format=None) -> None:
+    """Inserts data from habit_list into a new database file, which atomically replaces the database file of db_name.
+    The data is written once and the previous file stays intact until the rename, so there is no moment without a
+    valid database file
     :param db_name: name of database
-    :param file_name_1: name of database file
+    :param file_name_1: not used anymore, the database file is taken from db_name
+    :param date_format: storage format of dates [string, ordinal], None keeps format of existing database
     """
-    # save data in separate file in case something goes wrong
+    file_name = make_url(db_name).database
+    temp_file = f"{file_name}.tmp"
+    temp_db_name = f"sqlite:///{temp_file}"
     try:
-        if os.path.isfile(file_name_1):
-            shutil.copyfile(file_name_1, "user_data_temp.db")
-        else:
-            pass
-        tracker_util.delete_file(file_name_1)
-        create_db(db_name)
+        if date_format is None:
+            date_format = get_date_format(db_name) if os.path.isfile(file_name) else "string"
+        _delete_db_file(temp_file)
+        create_db(temp_db_name, date_format)
         hl = tracker.Habit.habit_list
-        for i in range(len(hl)):
-            insert_data_habits(hl[i].habit_id, hl[i].habit_name, hl[i].period, hl[i].creation_date, db_name=db_name)
-            for b in range(len(hl[i].complete_time_list)):
-                hcl = hl[i].complete_time_list
-                insert_complete_time_list(hcl[b], hl[i].habit_id, db_name=db_name)
+        # a fresh connection is the only one of the temp file, so it can leave WAL mode
+        close_engine(temp_db_name)
+        with get_engine(temp_db_name).connect() as conn:
+            # the temp file only gets used once it is complete, so it needs no journal and no fsync per commit.
+            # Pages are written once instead of once to the WAL and again by the checkpoint
+            conn.exec_driver_sql("PRAGMA journal_mode = OFF")
+            conn.exec_driver_sql("PRAGMA synchronous = OFF")
+            conn.commit()
+            with conn.begin():
+                bulk_insert_habits(habit_rows(hl), conn=conn)
+                bulk_insert_completions(completion_rows(hl), conn=conn)
+                write_bitmaps(hl, conn)
+        # closing the last connections checkpoints the WAL of the replaced file, so no stale WAL belongs to it
+        close_engine(temp_db_name)
+        close_engine(db_name)
+        # one fsync makes the new file durable before it replaces the old one
+        with open(temp_file, "rb+") as file:
+            os.fsync(file.fileno())
+        os.replace(temp_file, file_name)
+        # database now matches habit_list
+        hl.mark_saved()
     except Exception as error:
-        if os.path.isfile("user_data_temp.db"):
-            shutil.copyfile("user_data_temp.db", file_name_1)
+        close_engine(temp_db_name)
+        _delete_db_file(temp_file)
         print('data could not be saved due to an error')
         print(error)
-    finally:
-        tracker_util.delete_file("user_data_temp.db")
 
 
-def db_to_object(db_name='sqlite:///user_data.db') -> None:
-    """Creating list of habit objects from database
+def _delete_db_file(file_name) -> None:
+    """Deletes SQLite database file together with its WAL and shared memory files
+
+    :param str file_name: name of database file"""
+    for suffix in ("", "-wal", "-shm", "-journal"):
+        tracker_util.delete_file(file_name + suffix)
+
+
+def save_changes(db_name='sqlite:///user_data.db') -> None:
+    """Saves habits incrementally: only habits and completion dates which have been created, changed or deleted since
+    the last save or load get written to the database. Changes are restored if the save fails, so that they get
+    written on the next attempt
+
+    :param str db_name: name of database"""
+    removed_ids, changes = tracker.Habit.habit_list.take_changes()
+    if not removed_ids and not changes:
+        return
+    try:
+        write_changes(removed_ids, changes, db_name)
+    except Exception:
+        tracker.Habit.habit_list.restore_changes(removed_ids, changes)
+        raise
+
+
+def write_changes(removed_ids, changes, db_name='sqlite:///user_data.db') -> None:
+    """Writes changes recorded by habit_list to the database in a single transaction. Only the snapshots taken with
+    the changes are read, so that habits can be changed meanwhile, e.g. while databaseAsync writes on its worker thread
+
+    :param set[int] removed_ids: ids of deleted habits
+    :param list[tracker.HabitChange] changes: changes of new and modified habits
+    :param str db_name: name of database"""
+    new_habits = []
+    updated_habits = []
+    period_changed_ids = []
+    reset_bitmap_ids = []
+    cleared_ids = []
+    new_dates = []
+    removed_dates = []
+    date_format = get_date_format(db_name)
+    for change in changes:
+        habit_id = change.habit_id
+        if change.insert:
+            new_habits.append((habit_id, change.habit_name, change.period, change.creation_date))
+        elif change.update:
+            updated_habits.append({"b_habit_id": habit_id, "b_habit": change.habit_name, "b_period": change.period,
+                                   "b_creation_date": date_to_db(change.creation_date, date_format)})
+            if "period" in change.update:
+                period_changed_ids.append(habit_id)
+            if change.update & {"period", "creation_date"}:
+                reset_bitmap_ids.append(habit_id)
+        if change.cleared:
+            cleared_ids.append(habit_id)
+        for indate in change.added:
+            new_dates.append((indate, habit_id))
+        for indate in change.removed:
+            # completions are kept at day resolution, stored dates may carry a time of day
+            day = indate.toordinal()
+            removed_dates.append({"b_habit_id": habit_id, "b_date_from": date_to_db(day, date_format),
+                                  "b_date_to": date_to_db(day + 1, date_format)})
+
+    with get_engine(db_name).begin() as conn:
+        # deletions first, so that the id of a deleted habit can be reused by a new habit
+        if removed_ids:
+            conn.execute(delete(complete_time_list).where(complete_time_list.c.habit_id.in_(removed_ids)))
+            conn.execute(delete(habits).where(habits.c.habit_id.in_(removed_ids)))
+        if cleared_ids:
+            conn.execute(delete(complete_time_list).where(complete_time_list.c.habit_id.in_(cleared_ids)))
+        if removed_dates:
+            conn.execute(delete(complete_time_list).where(
+                (complete_time_list.c.habit_id == bindparam("b_habit_id")) &
+                (complete_time_list.c.date >= bindparam("b_date_from")) &
+                (complete_time_list.c.date < bindparam("b_date_to"))), removed_dates)
+        if new_habits:
+            bulk_insert_habits(new_habits, conn=conn)
+        if updated_habits:
+            conn.execute(update(habits).where(habits.c.habit_id == bindparam("b_habit_id"))
+                         .values(habit=bindparam("b_habit"), period=bindparam("b_period"),
+                                 creation_date=bindparam("b_creation_date")), updated_habits)
+        if period_changed_ids:
+            # remaining completion dates belong to periods of the new periodicity
+            conn.execute(update(complete_time_list).where(complete_time_list.c.habit_id.in_(period_changed_ids))
+                         .values(period_key=literal_column(_period_key_sql("date", "complete_time_list.habit_id",
+                                                                          date_format))))
+        if reset_bitmap_ids:
+            # bitmaps depend on period and creation date as well, read_bitmap builds them again
+            conn.execute(update(completion_summary).where(completion_summary.c.habit_id.in_(reset_bitmap_ids))
+                         .values(bitmap=None))
+        if new_dates:
+            bulk_insert_completions(new_dates, conn=conn)
+
+
+def write_bitmaps(habit_list, conn) -> None:
+    """Stores completion bitmaps of habits in completion_summary. Habits with completion history that has not been
+    loaded are skipped, their bitmap stays reset
+
+    :param list[habit] habit_list: list of habit objects
+    :param sqlalchemy.Connection conn: open connection"""
+    rows = [(habit.completion_bitmap().to_bytes(), habit.habit_id) for habit in habit_list
+            if habit.complete_time_list and getattr(habit.complete_time_list, "loaded", True)]
+    if rows:
+        conn.exec_driver_sql("UPDATE completion_summary SET bitmap = ? WHERE habit_id = ?", rows)
+
+
+def read_bitmap(habit_id, db_name='sqlite:///user_data.db'):
+    """Reads stored completion bitmap of a habit. Saves do not build bitmaps, the triggers only reset them, so a reset
+    bitmap is built here from the stored completion dates and stored for the next read
+
+    :param int habit_id:
+    :param str db_name: name of database
+    :return: CompletionBitmap|None: None if the habit does not exist"""
+    select = (completion_summary.select().with_only_columns(completion_summary.c.bitmap)
+              .where(completion_summary.c.habit_id == habit_id))
+    with get_engine(db_name).begin() as conn:
+        data = conn.execute(select).scalar()
+        if data is not None:
+            return CompletionBitmap.from_bytes(data)
+        row = conn.execute(habits.select().with_only_columns(habits.c.period, habits.c.creation_date)
+                           .where(habits.c.habit_id == habit_id)).first()
+        if row is None:
+            return None
+        to_day = _day_converter(conn)
+        dates = (complete_time_list.select().with_only_columns(complete_time_list.c.date)
+                 .where(complete_time_list.c.habit_id == habit_id).order_by(complete_time_list.c.date))
+        days = [to_day(value) for value, in conn.execute(dates)]
+        bitmap = tracker.completion_bitmap(days, row[0], _date_converter(conn)(row[1]))
+        # habits without completions have no summary row, their empty bitmap is cheap to build again
+        conn.execute(update(completion_summary).where(completion_summary.c.habit_id == habit_id)
+                     .values(bitmap=bitmap.to_bytes()))
+    return bitmap
+
+
+def db_to_object(db_name='sqlite:///user_data.db', lazy=False) -> None:
+    """Creating list of habit objects from database. Habits and completion dates are read with one query each and
+    completion dates get grouped by habit_id in a single pass, so that each habit receives its complete list at once
+
+    In lazy mode only habits and their completion summary are read. Completion dates of a habit get loaded on first
+    full access of its complete_time_list, so that loading depends on the number of habits only
     :param str db_name: database name
+    :param bool lazy: load completion dates on demand
     """
-    tuhabits = read_data_habits(db_name)
-    tracker.Habit.habit_list.clear()
-    for x in range(len(tuhabits)):
-        # convert strings from database into datetime object
-        # 3 refers to column creation_date
-        tempdate1 = tuhabits[x][3]
-        tempdate1 = datetime.strptime(tempdate1, '%Y-%m-%d %H:%M:%S')
-        tracker.Habit(tuhabits[x][1], tuhabits[x][2], tempdate1, tuhabits[x][0])
-        tuple_time_complete_list = read_complete_time_list(tuhabits[x][0], db_name)
-        for b in range(len(tuple_time_complete_list)):
-            # b is for row and 1 for date column
-            # Conversion from date to datetime object
-            tempdate_2 = tuple_time_complete_list[b][1]
-            tempdate_2 = datetime.strptime(tempdate_2, '%Y-%m-%d %H:%M:%S')
-            tracker.Habit.habit_list[x].complete_time_list.append(tempdate_2)
+    habit_list = tracker.Habit.habit_list
+    habit_list.clear()
+    with get_engine(db_name).connect() as conn:
+        to_datetime = _date_converter(conn)
+        if lazy:
+            select = (habits.select().add_columns(completion_summary.c.completion_count,
+                                                  completion_summary.c.latest_date)
+                      .outerjoin(completion_summary, habits.c.habit_id == completion_summary.c.habit_id)
+                      .order_by(habits.c.habit_id))
+            # rows: habit_id, habit, period, creation_date, completion_count, latest_date
+            for row in conn.execute(select):
+                habit = tracker.Habit(row[1], row[2], to_datetime(row[3]), row[0])
+                latest = to_datetime(row[5]) if row[4] else None
+                habit.load_complete_time_list_lazily(partial(read_completion_dates, row[0], db_name), row[4] or 0,
+                                                     latest)
+            habit_list.mark_saved()
+            return
+        to_day = _day_converter(conn)
+        days_by_habit = {}
+        # rows: habit_id, habit, period, creation_date
+        for row in conn.execute(habits.select().order_by(habits.c.habit_id)):
+            tracker.Habit(row[1], row[2], to_datetime(row[3]), row[0])
+            days_by_habit[row[0]] = array("i")
+        # rows come in ascending order of dates per habit, which the index on (habit_id, date) provides without
+        # sorting. Backfilled completions are stored with higher ids than later dates
+        select = (complete_time_list.select()
+                  .with_only_columns(complete_time_list.c.habit_id, complete_time_list.c.date)
+                  .order_by(complete_time_list.c.habit_id, complete_time_list.c.date, complete_time_list.c.id))
+        for habit_id, value in conn.execute(select):
+            days = days_by_habit.get(habit_id)
+            if days is not None:
+                days.append(to_day(value))
+    for habit_id, days in days_by_habit.items():
+        habit_list.get(habit_id).load_complete_time_list(days)
+    # loaded habits match the database, only later changes have to be saved
+    habit_list.mark_saved()
 
 
 def app_load_data_base(file_name_1="user_data.db") -> None:
@@ -164,21 +883,65 @@ def app_load_data_base(file_name_1="user_data.db") -> None:
     if not os.path.isfile(file_name_1):
         create_db()
         return
+    # save files of older versions get upgraded in place
+    migrate()
     db_to_object()
 
 
+# storage formats of dates: strings in %Y-%m-%d %H:%M:%S format or integer day ordinals
+DATE_FORMATS = ("string", "ordinal")
+# julianday of 0001-01-01 00:00:00 is 1721425.5, which is day ordinal 1
+JULIAN_DAY_OFFSET = 1721424.5
+
+# module wide database manager shared by all functions
+# PRAGMA settings applied on every pooled SQLite connection. cache_size in KiB if negative, mmap_size in bytes
+PERFORMANCE_PROFILES = {
+    "durable": {"journal_mode": "WAL", "synchronous": "FULL", "cache_size": -2000, "mmap_size": 0,
+                "temp_store": "DEFAULT"},
+    "balanced": {"journal_mode": "WAL", "synchronous": "NORMAL", "cache_size": -16000, "mmap_size": 64 * 2 ** 20,
+                 "temp_store": "MEMORY"},
+    "fast": {"journal_mode": "WAL", "synchronous": "OFF", "cache_size": -64000, "mmap_size": 256 * 2 ** 20,
+             "temp_store": "MEMORY"},
+}
+
+database_manager = DatabaseManager()
+
 meta = MetaData()
+# date columns hold strings or day ordinals depending on the date format of the database. They are declared as
+# INTEGER, so that SQLite keeps day ordinals as integers, while date strings are stored as text
 habits = Table('habits', meta,
                Column('habit_id', Integer, primary_key=True),
                Column('habit', String),
                Column('period', String),
-               Column('creation_date', String),
+               Column('creation_date', Integer),
                )
 
+settings = Table('settings', meta,
+                 Column('key', String, primary_key=True),
+                 Column('value', String))
+
 complete_time_list = Table('complete_time_list', meta,
                            Column('id', Integer, primary_key=True),
-                           Column('date', String),
-                           Column('habit_id', Integer, ForeignKey('habits.habit_id')))
+                           Column('date', Integer),
+                           Column('habit_id', Integer, ForeignKey('habits.habit_id')),
+                           Column('period_key', Integer),
+                           Index('ix_complete_time_list_habit_id_date', 'habit_id', 'date'),
+                           Index('ux_complete_time_list_habit_id_period_key', 'habit_id', 'period_key',
+                                 unique=True))
+
+completion_summary = Table('completion_summary', meta,
+                           Column('habit_id', Integer, primary_key=True),
+                           Column('completion_count', Integer),
+                           Column('latest_date', Integer),
+                           Column('bitmap', LargeBinary))
+
+# migrations in order, list index + 1 is the schema version a migration upgrades to
+MIGRATIONS = [_migration_index_habit_id_date,
+              _migration_unique_period,
+              _migration_settings,
+              _migration_completion_summary,
+              _migration_completion_bitmap]
+SCHEMA_VERSION = len(MIGRATIONS)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,236 @@
+"""
+This module provides date arithmetic on day ordinals (see date.toordinal): integers counting the days since
+0001-01-01, which is day 1 and a Monday. Scalar functions take and return integers, so that no datetime objects get
+created. Vectorized functions (suffix _v) take numpy arrays of day ordinals or datetime64 values and return arrays of
+day ordinals or counts. tracker_util offers the same calculations for datetime objects as thin wrappers
+
+Functions:
+    to_day(indate): converts date, datetime or day ordinal into day ordinal
+    to_days(dates): converts dates or day ordinals into numpy array of day ordinals
+    as_days(values): converts numpy array of day ordinals or datetime64 values into array of day ordinals
+    to_datetime64(days): converts day ordinals into datetime64[D] array
+    days_difference(day1, day2): returns difference of days
+    day_streak(day1, day2): returns day difference + 1
+    iso_week_index(day): returns absolute number of the ISO calendar week of a day
+    week_streak(day1, day2): returns week difference + 1
+    filter_days(days, cutoff, mode): returns days on or after / on or before a cutoff day
+    day_range(days, first, last): returns slice bounds of a window of ascending days by binary search
+    count_days(days, first, last): counts ascending days in a window by binary search
+    days_difference_v(days1, days2), day_streak_v(days1, days2), iso_week_index_v(days), week_streak_v(days1, days2),
+    filter_days_v(days, cutoff, mode): vectorized forms of the functions above
+    period_start_v(days, weekly), period_end_v(days, weekly): first and last day of the period of each day
+    count_days_v(days, offsets, first, last): counts days in a window for each segment of concatenated ascending days
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date
+import numpy as np
+
+# day ordinal of the datetime64 epoch
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+# segments of concatenated days are shifted apart by this span, which exceeds the day ordinal of 9999-12-31
+SEGMENT_SPAN = 1 << 22
+
+
+def to_day(indate) -> int:
+    """Converts date into its day ordinal, dropping the time of datetime objects
+
+    :param datetime|date|int indate: date or day ordinal
+    :return: int"""
+    return indate if isinstance(indate, int) else indate.toordinal()
+
+
+def to_days(dates) -> np.ndarray:
+    """Converts dates into an array of day ordinals. Arrays of day ordinals (numpy or array('i'), e.g.
+    CompletionList.ordinals) are used without converting each item
+
+    :param Iterable[datetime|date|int]|np.ndarray|array dates:
+    :return: numpy.ndarray[int64]"""
+    if isinstance(dates, np.ndarray):
+        return as_days(dates)
+    if isinstance(dates, array):
+        return np.frombuffer(dates, dtype=np.intc).astype(np.int64)
+    return np.fromiter(map(to_day, dates), dtype=np.int64)
+
+
+def as_days(values) -> np.ndarray:
+    """Converts day ordinals or datetime64 values into an array of day ordinals, dropping times of datetime64 values
+
+    :param np.ndarray|int values: day ordinals, datetime64 values or a scalar of either
+    :return: numpy.ndarray[int64]"""
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        return values.astype("datetime64[D]").astype(np.int64) + EPOCH_ORDINAL
+    if values.dtype == object:
+        return to_days(values.tolist()) if values.ndim else np.int64(to_day(values.item()))
+    return values.astype(np.int64, copy=False)
+
+
+def to_datetime64(days) -> np.ndarray:
+    """Converts day ordinals into datetime64[D] values
+
+    :param np.ndarray|int days: day ordinals
+    :return: numpy.ndarray[datetime64[D]]"""
+    return (np.asarray(days, dtype=np.int64) - EPOCH_ORDINAL).astype("datetime64[D]")
+
+
+def days_difference(day1, day2) -> int:
+    """Returns difference between two days in days. Order of days does not matter
+
+    :param int day1: day ordinal
+    :param int day2: day ordinal
+    :return: int"""
+    return abs(day2 - day1)
+
+
+def day_streak(day1, day2) -> int:
+    """Returns number of days from one day to the other, both included. Order of days does not matter
+
+    :param int day1: day ordinal
+    :param int day2: day ordinal
+    :return: int"""
+    return abs(day2 - day1) + 1
+
+
+def iso_week_index(day) -> int:
+    """Returns absolute number of the ISO calendar week (Monday to Sunday) of a day, counted from the week of
+    0001-01-01. Weeks of consecutive years are numbered consecutively
+
+    :param int day: day ordinal
+    :return: int"""
+    return (day - 1) // 7
+
+
+def week_streak(day1, day2) -> int:
+    """Returns number of ISO calendar weeks from the week of one day to the week of the other, both included. Order of
+    days does not matter
+
+    :param int day1: day ordinal
+    :param int day2: day ordinal
+    :return: int"""
+    return abs(iso_week_index(day2) - iso_week_index(day1)) + 1
+
+
+def filter_days(days, cutoff, mode="before") -> list:
+    """Filters out days before (mode before) or after (mode after) a cutoff day
+
+    :param Iterable[int] days: day ordinals
+    :param int cutoff: day ordinal, kept in both modes
+    :param str mode: [before, after]
+    :return: list[int]"""
+    if mode == "before":
+        return [day for day in days if day >= cutoff]
+    elif mode == "after":
+        return [day for day in days if day <= cutoff]
+
+
+def day_range(days, first=None, last=None) -> tuple:
+    """Returns slice bounds of the days from first to last, both included, in O(log n) without copying
+
+    :param Sequence[int] days: ascending day ordinals, e.g. CompletionList.ordinals
+    :param int|None first: first day of the window, None for no lower bound
+    :param int|None last: last day of the window, None for no upper bound
+    :return: tuple[int, int]: start and stop index, days[start:stop] is the window"""
+    start = 0 if first is None else bisect_left(days, first)
+    stop = len(days) if last is None else bisect_right(days, last)
+    return start, max(start, stop)
+
+
+def count_days(days, first=None, last=None) -> int:
+    """Counts the days from first to last, both included, in O(log n)
+
+    :param Sequence[int] days: ascending day ordinals
+    :param int|None first: first day of the window, None for no lower bound
+    :param int|None last: last day of the window, None for no upper bound
+    :return: int"""
+    start, stop = day_range(days, first, last)
+    return stop - start
+
+
+def days_difference_v(days1, days2) -> np.ndarray:
+    """Vectorized days_difference
+
+    :param np.ndarray days1: day ordinals or datetime64 values
+    :param np.ndarray|int days2: day ordinals or datetime64 values or one day ordinal for all
+    :return: numpy.ndarray[int]"""
+    return np.abs(as_days(days2) - as_days(days1))
+
+
+def day_streak_v(days1, days2) -> np.ndarray:
+    """Vectorized day_streak
+
+    :param np.ndarray days1: day ordinals or datetime64 values
+    :param np.ndarray|int days2: day ordinals or datetime64 values or one day ordinal for all
+    :return: numpy.ndarray[int]"""
+    return np.abs(as_days(days2) - as_days(days1)) + 1
+
+
+def iso_week_index_v(days) -> np.ndarray:
+    """Vectorized iso_week_index
+
+    :param np.ndarray days: day ordinals or datetime64 values
+    :return: numpy.ndarray[int]"""
+    return (as_days(days) - 1) // 7
+
+
+def week_streak_v(days1, days2) -> np.ndarray:
+    """Vectorized week_streak
+
+    :param np.ndarray days1: day ordinals or datetime64 values
+    :param np.ndarray|int days2: day ordinals or datetime64 values or one day ordinal for all
+    :return: numpy.ndarray[int]"""
+    return np.abs(iso_week_index_v(days2) - iso_week_index_v(days1)) + 1
+
+
+def filter_days_v(days, cutoff, mode="before") -> np.ndarray:
+    """Vectorized filter_days
+
+    :param np.ndarray days: day ordinals or datetime64 values
+    :param int cutoff: day ordinal, kept in both modes
+    :param str mode: [before, after]
+    :return: numpy.ndarray[int]: remaining day ordinals"""
+    days = as_days(days)
+    if mode == "before":
+        return days[days >= cutoff]
+    elif mode == "after":
+        return days[days <= cutoff]
+
+
+def period_start_v(days, weekly=False) -> np.ndarray:
+    """Returns first day of the period of each day: the day itself for daily habits and the Monday of its ISO calendar
+    week for weekly habits
+
+    :param np.ndarray|int days: day ordinals or datetime64 values
+    :param np.ndarray|bool weekly: True for weekly periods, per day or for all days
+    :return: numpy.ndarray[int]: day ordinals"""
+    days = as_days(days)
+    return np.where(weekly, iso_week_index_v(days) * 7 + 1, days)
+
+
+def period_end_v(days, weekly=False) -> np.ndarray:
+    """Returns last day of the period of each day: the day itself for daily habits and the Sunday of its ISO calendar
+    week for weekly habits
+
+    :param np.ndarray|int days: day ordinals or datetime64 values
+    :param np.ndarray|bool weekly: True for weekly periods, per day or for all days
+    :return: numpy.ndarray[int]: day ordinals"""
+    days = as_days(days)
+    return np.where(weekly, iso_week_index_v(days) * 7 + 7, days)
+
+
+def count_days_v(days, offsets, first, last) -> np.ndarray:
+    """Counts for each segment days[offsets[i]:offsets[i + 1]] of ascending days the days from first[i] to last[i],
+    both included. Segments are shifted apart, so that all windows are found by one binary search over all days
+
+    :param np.ndarray days: concatenated segments of ascending day ordinals
+    :param np.ndarray offsets: start index of each segment followed by len(days)
+    :param np.ndarray|int first: first day of the window per segment or for all
+    :param np.ndarray|int last: last day of the window per segment or for all
+    :return: numpy.ndarray[int]: count per segment"""
+    segments = len(offsets) - 1
+    shift = np.arange(segments, dtype=np.int64) * SEGMENT_SPAN
+    keys = as_days(days) + np.repeat(shift, np.diff(offsets))
+    first = np.clip(as_days(first), 0, SEGMENT_SPAN - 1) + shift
+    last = np.clip(as_days(last), -1, SEGMENT_SPAN - 1) + shift
+    return np.maximum(np.searchsorted(keys, last, "right") - np.searchsorted(keys, first, "left"), 0)
@@ -5,7 +5,11 @@ Module structure
 - tracker: provides the habit class, which enables storing habit information and provides methods to change habit
 information
 - databaseSQL: interface between application and database to save user data
+- databaseAsync: asyncio interface to databaseSQL with background checkpointing
 - analytics_module: analyzes habit information, mainly completion data
 - tracker_util: auxiliary functions
+- date_kernel: date arithmetic on day ordinals, scalar and vectorized
+- completion_bitmap: bitmap representation of completion dates
 - tracker_testing_data: initializes testing data
+- benchmark: measures performance of the persistence layer
 """
\ No newline at end of file
@@ -5,13 +5,13 @@ Structure
 
 Global variables:
     global_menu_block: dict with building blocks for menu design
-    global_dict and global_dict_2: empty dicts used for temporary storage of index values for habit_list
+    global_dict and global_dict_2: empty dicts used for temporary storage of habit ids shown as menu items
     global_period_options: dict with possible options for custom period setting in analytics menu
     global_variables: performance settings in analytics module
 Menu output: -> print menu items
     main_menu()
     all_habits(): prints all habits grouped by periodicity
-    habit_menu(index): prints habit management menu for a habit determined by the habit_list index
+    habit_menu(habit_id): prints habit management menu for a habit determined by its habit_id
     complete_habit(): prints habit completion menu that print all habits by completion status
     analytics(): prints analytics menu
     change_period(): prints menu for changing period settings in analytics menu
@@ -23,9 +23,9 @@ User interface: -> provides prompt to user
     app_main_menu(user_input): user interface for main menu
     app_new_habit(habit_name: period): user enters habit name and periodicity for new habit
     app_all_habits(user_input): user interface for all habits menu
-    app_habit_menu(user_input, index): user interface for habit management menu
-    app_change_habit_name(index, user_input): user enters new habit name
-    app_change_habit_period(index, user_input): user enters new habit periodicity
+    app_habit_menu(user_input, habit_id): user interface for habit management menu
+    app_change_habit_name(habit_id, user_input): user enters new habit name
+    app_change_habit_period(habit_id, user_input): user enters new habit periodicity
     app_complete_habit(user_input): user interface for complete_habit menu where user marks habit as completed
     app_analytics(user_input): user interface for analytics menu
     app_change_period(user_input): user interface for change period menu
@@ -38,7 +38,7 @@ User interface: -> provides prompt to user
     app_set_threshold(period, user_input): user enters potential completion threshold for given periodicity
     app_back_to_main_menu(user_input): user enters input to return to main menu
     app_back_to_analytics(user_input): user enters input to return to analytics menu
-    app_back_to_habit_menu(user_input, index): user enters input to return to habit management menu
+    app_back_to_habit_menu(user_input, habit_id): user enters input to return to habit management menu
 Auxiliary functions:
     reset_global_variables(): resets global variables to their standard values
     clear_screen(): clears command line interface
@@ -128,34 +128,32 @@ def all_habits() -> None:
     habit_list = tracker.Habit.habit_list
     global_dict.clear()
     global_dict_2.clear()
-    # habit_list indexes as values, keys=b represent item numbers in list shown to user
-    for i in range(len(habit_list)):
-        if habit_list[i].period == "daily":
-            global_dict_2.update({b: i})
-            b += 1
-    for i in range(len(habit_list)):
-        if habit_list[i].period == "weekly":
-            global_dict.update({b: i})
-            b += 1
+    # habit ids as values, keys=b represent item numbers in list shown to user
+    for habit in habit_list.habits_by_period("daily"):
+        global_dict_2.update({b: habit.habit_id})
+        b += 1
+    for habit in habit_list.habits_by_period("weekly"):
+        global_dict.update({b: habit.habit_id})
+        b += 1
     print_app_heading()
     click.echo(" Habit overview")
     click.echo(global_menu_block["line"])
     click.echo(' 0. Back to main menu')
     click.echo(global_menu_block["daily_line"])
     for i in range(len(global_dict_2)):
-        click.echo(f" {i + 1}. {habit_list[global_dict_2[i + 1]].habit_name}")
+        click.echo(f" {i + 1}. {habit_list.get(global_dict_2[i + 1]).habit_name}")
     click.echo(global_menu_block["weekly_line"])
     for i in range(len(global_dict)):
         aux_i = i + len(global_dict_2) + 1
-        click.echo(f" {aux_i}. {habit_list[global_dict[aux_i]].habit_name}")
+        click.echo(f" {aux_i}. {habit_list.get(global_dict[aux_i]).habit_name}")
     click.echo(global_menu_block["line"])
 
 
-def habit_menu(index) -> None:
+def habit_menu(habit_id) -> None:
     """Menu that shows information on a single habit and 
     gives user options as to view more information and modify the habit
 
-    :param str | int index: index of habit object in habit_list"""
+    :param str | int habit_id: habit_id of habit object in habit_list"""
 
     def calendar_week(date) -> str:
         """Returns calendar week of given date"""
@@ -164,8 +162,7 @@ def habit_menu(index) -> None:
         else:
             return "n/a"
 
-    index = int(index)
-    habit = tracker.Habit.habit_list[index]
+    habit = tracker.Habit.habit_list.get(int(habit_id))
     streak_data = list(analytics_module.habit_streak_stats([habit]).itertuples())[0]
     # initialize auxiliary variables
     if habit.period == "daily":
@@ -228,14 +225,15 @@ def complete_habit() -> None:
     habit_list = tracker.Habit.habit_list
     global_dict.clear()
     global_dict_2.clear()
-    # in dictionary: habit_list indexes = values, keys=b represent item numbers in list shown to user
-    for i in range(len(habit_list)):
-        if not habit_list[i].check_complete_status():
-            global_dict_2.update({b: i})
+    # in dictionary: habit ids = values, keys=b represent item numbers in list shown to user
+    completed = [habit.check_complete_status() for habit in habit_list]
+    for habit, status in zip(habit_list, completed):
+        if not status:
+            global_dict_2.update({b: habit.habit_id})
             b += 1
-    for i in range(len(habit_list)):
-        if habit_list[i].check_complete_status():
-            global_dict.update({b: i})
+    for habit, status in zip(habit_list, completed):
+        if status:
+            global_dict.update({b: habit.habit_id})
             b += 1
     print_app_heading()
     click.echo(" Which habit have you completed?")
@@ -247,8 +245,8 @@ def complete_habit() -> None:
     elif len(global_dict_2) == 0:
         click.echo(" All habits have been completed.")
     for i in range(len(global_dict_2)):
-        click.echo(
-            f" {i + 1}. {habit_list[global_dict_2[i + 1]].habit_name}, {habit_list[global_dict_2[i + 1]].period}")
+        habit = habit_list.get(global_dict_2[i + 1])
+        click.echo(f" {i + 1}. {habit.habit_name}, {habit.period}")
     click.echo("--------------------Completed------------------------")
     if len(global_dict_2) == 0 and len(global_dict) == 0:
         click.echo(" -")
@@ -256,7 +254,8 @@ def complete_habit() -> None:
         click.echo(" Not any habit has been completed.")
     for i in range(len(global_dict)):
         aux_i = i + len(global_dict_2) + 1
-        click.echo(f" {aux_i}. {habit_list[global_dict[aux_i]].habit_name}, {habit_list[global_dict[aux_i]].period}")
+        habit = habit_list.get(global_dict[aux_i])
+        click.echo(f" {aux_i}. {habit.habit_name}, {habit.period}")
     click.echo(global_menu_block["line"])
 
 
@@ -613,10 +612,12 @@ def app_main_menu(user_input) -> None:
     # save and exit
     elif user_input == "5":
         try:
-            databaseSQL.object_to_db()
+            databaseSQL.save_changes()
             click.echo("Data has been saved successfully")
         except Exception:
             click.echo("Data could not be saved properly due to an error.")
+        finally:
+            databaseSQL.close_engine()
 
 
 @click.command()
@@ -662,10 +663,10 @@ def app_all_habits(user_input) -> None:
         main_menu()
         app_main_menu()
     elif key in global_dict:
-        index = global_dict.get(key)
+        habit_id = global_dict.get(key)
         clear_screen()
-        habit_menu(index)
-        app_habit_menu(f"{index}")
+        habit_menu(habit_id)
+        app_habit_menu(f"{habit_id}")
     else:
         click.echo(" Error. Invalid input. Please enter a number of a habit in the list.")
         app_all_habits()
@@ -674,14 +675,13 @@ def app_all_habits(user_input) -> None:
 @click.command()
 @click.option('--user_input', prompt=' Input number of option or 0 to go back to habit overview',
               type=click.Choice(["0", "1", "2", "3", "4", "5", "6"]))
-@click.argument("index")
-# index variable corresponds to index in habit_list
-def app_habit_menu(user_input, index) -> None:
+@click.argument("habit_id")
+def app_habit_menu(user_input, habit_id) -> None:
     """User interface for habit_menu. User selects option
     :param string user_input: menu item
-    :param string | int index: index of habit object in habit_list"""
+    :param string | int habit_id: habit_id of habit object in habit_list"""
     # go back to previous menu
-    habit = tracker.Habit.habit_list[int(index)]
+    habit = tracker.Habit.habit_list.get(int(habit_id))
     if user_input == "0":
         clear_screen()
         all_habits()
@@ -700,7 +700,7 @@ def app_habit_menu(user_input, index) -> None:
         else:
             click.echo(" Habit has not been completed on any day yet!")
             click.echo(global_menu_block["line"])
-        app_back_to_habit_menu(index)
+        app_back_to_habit_menu(habit_id)
     # completion date stats
     elif user_input == "2":
         clear_screen()
@@ -725,23 +725,23 @@ def app_habit_menu(user_input, index) -> None:
                     else:
                         click.echo(f" - {calendar.month_name[m]}: {cdates[y][m - 1]}")
                 click.echo(global_menu_block["line"])
-        app_back_to_habit_menu(index)
+        app_back_to_habit_menu(habit_id)
     # change habit description
     elif user_input == "3":
-        app_change_habit_name(index)
+        app_change_habit_name(habit_id)
     # change period
     elif user_input == "4":
-        app_change_habit_period(index)
+        app_change_habit_period(habit_id)
     # clear tracking data
     elif user_input == "5":
         habit.clear_tracking_data()
         click.echo(global_menu_block["line"])
         click.echo(" Tracking data has been reset.")
         click.echo(global_menu_block["line"])
-        app_back_to_habit_menu(index)
+        app_back_to_habit_menu(habit_id)
     # delete habit from habit_list
     elif user_input == "6":
-        _ = tracker.Habit.habit_list.pop(int(index))
+        tracker.Habit.habit_list.remove(habit)
         clear_screen()
         main_menu()
         click.echo(global_menu_block["line"])
@@ -752,31 +752,31 @@ def app_habit_menu(user_input, index) -> None:
 
 @click.command()
 @click.option('--user_input', prompt=' Please input new habit description')
-@click.argument("index")
-def app_change_habit_name(index, user_input) -> None:
+@click.argument("habit_id")
+def app_change_habit_name(habit_id, user_input) -> None:
     """User interface: user enters new habit name
 
-    :param string index: list index of habit in habit_list
+    :param string habit_id: habit_id of habit in habit_list
     :param string user_input: habit name"""
-    tracker.Habit.habit_list[int(index)].habit_name = user_input
+    tracker.Habit.habit_list.get(int(habit_id)).habit_name = user_input
     clear_screen()
-    habit_menu(index)
+    habit_menu(habit_id)
     click.echo(global_menu_block["line"])
     click.echo(f" New habit name {user_input} has been saved.")
     click.echo(global_menu_block["line"])
-    app_habit_menu(index)
+    app_habit_menu(habit_id)
 
 
 @click.command()
 @click.option('--user_input', prompt=' Please input new habit period:',
               type=click.Choice(['daily', 'weekly'], case_sensitive=False))
-@click.argument("index")
-def app_change_habit_period(index, user_input) -> None:
+@click.argument("habit_id")
+def app_change_habit_period(habit_id, user_input) -> None:
     """User interface: user enters tracking period
 
-    :param string index: list index of habit in habit_list
+    :param string habit_id: habit_id of habit in habit_list
     :param string user_input: habit periodicity"""
-    habit = tracker.Habit.habit_list[int(index)]
+    habit = tracker.Habit.habit_list.get(int(habit_id))
     # if user_input is different from period attribute, user data gets wiped
     if habit.period == user_input:
         click.echo(global_menu_block["line"])
@@ -790,7 +790,7 @@ def app_change_habit_period(index, user_input) -> None:
         click.echo(global_menu_block["line"])
         click.echo(" Old tracking data has been deleted as tracking period has been changed.")
         click.echo(global_menu_block["line"])
-    app_back_to_habit_menu(index)
+    app_back_to_habit_menu(habit_id)
 
 
 @click.command()
@@ -809,7 +809,7 @@ def app_complete_habit(user_input) -> None:
         main_menu()
         app_main_menu()
     elif key in global_dict:
-        habit = tracker.Habit.habit_list[global_dict[key]]
+        habit = tracker.Habit.habit_list.get(global_dict[key])
         check_complete = habit.check_complete_status()
         # if check_complete is True, then habit has already been completed in current period
         if check_complete:
@@ -826,7 +826,7 @@ def app_complete_habit(user_input) -> None:
                 f' Habit \"{habit.habit_name}\" has been completed on '
                 f'{tracker_util.get_date_string(habit.complete_time_list[-1])}')
             click.echo(global_menu_block["line"])
-            varstreak = analytics_module.streak_current(habit.complete_time_list, habit.period)[0]
+            varstreak = habit.current_streak
             if varstreak > 1:
                 click.echo(
                     f' Congratulations. You are currently on a {varstreak} periods '
@@ -1475,17 +1475,17 @@ def app_back_to_analytics(user_input) -> None:
 
 @click.command()
 @click.option('--user_input', prompt=" Please enter anything to go back to habit menu")
-@click.argument("index")
-def app_back_to_habit_menu(user_input, index) -> None:
+@click.argument("habit_id")
+def app_back_to_habit_menu(user_input, habit_id) -> None:
     """Prompt to return to respective habit menu.
 
     :type user_input: string
-    :param int index: list index of habit object in habit_list
-    :type index: int
+    :param int habit_id: habit_id of habit object in habit_list
+    :type habit_id: int
     :return: None"""
     clear_screen()
-    habit_menu(index)
-    app_habit_menu(index)
+    habit_menu(habit_id)
+    app_habit_menu(habit_id)
 
 
 def reset_global_variables() -> None:
@@ -1,14 +1,861 @@
 """
-This module contains the Habit class with its methods
+This module contains the Habit class with its methods and the containers which track changes for incremental saving
 
+    Functions:
+        to_day(indate): converts completion date into day ordinal
+        period_key(day, period): returns number of the day or ISO week a day ordinal belongs to
+        completion_bitmap(days, period, creation_date): returns bitmap of completed periods since the creation date
+        synchronized(method): runs method while holding the lock of its object
+    Classes:
+        CompletionList: array of completion days viewed as list of datetimes, records changes since the last save
+        StreakCounter: current and longest streaks of completion days, updated per appended completion
+        EventBus: publishes HabitEvents on changes of habits to subscribers, see Habit.events
+        LazyCompletionList: CompletionList which loads saved completion dates from the database on first full access
+        IdAllocator: hands out the smallest freed habit_id from a min-heap or the next id above a high-water mark
+        HabitList: list of habit objects which records dirty and removed habits since the last save
+        HabitRegistry: HabitList with indexes of habits by habit_id, period and name
+        Habit: habit object
     Methods:
         clear_tracking_data(self): clears completion dates of habit
         check_complete_status(self, indate): checks completion status of habit on given date
         complete_habit(self, indate): mark habit as complete on given date
+        backfill(self, indate): insert past completion at its sorted position
+        complete_many(self, dates): completes habit on many dates at once
+        was_completed(self, indate): checks if habit has been completed on given day
+        completed_in_period(self, indate): checks if habit has been completed in the period of given date
+        was_completed_many(self, dates), completed_in_periods(self, dates): vectorized forms of both checks
+        completion_bitmap(self): returns completions as bitmap of completed days or weeks
+        streaks(self): returns streak statistics, see current_streak, current_streak_start, longest_streak and
+        longest_streak_dates
+
+Thread safety: methods which change a habit hold the lock of the habit, so that e.g. checking and completing a habit
+is atomic. Habits share a fixed set of striped locks instead of one lock each. Changes of habit_list, including the
+allocation of habit ids, hold the lock of the list. A thread holding the lock of the list never waits for the lock of
+a habit, so that the two cannot deadlock
 """
 
+from array import array
+from collections import namedtuple
+from collections.abc import MutableSequence
+import heapq
+import threading
+import numpy as np
+from bisect import bisect_left
 from datetime import datetime
+from functools import wraps
+from itertools import islice
+import date_kernel
 import tracker_util
+from completion_bitmap import CompletionBitmap
+
+
+# pending changes of a single habit since the last save
+# insert: habit row does not exist in database yet, update: set of changed fields [habit_name, period, creation_date],
+# cleared: all completions stored in database have to be deleted, added/removed: completion dates
+# habit_id, habit_name, period, creation_date: values of the habit when the change was taken. The database gets
+# written from these snapshots, so that the habit can be changed meanwhile on another thread
+HabitChange = namedtuple("HabitChange", ["habit", "insert", "update", "cleared", "added", "removed", "habit_id",
+                                         "habit_name", "period", "creation_date"])
+
+# change of a habit published by Habit.events. kind is one of EVENT_KINDS:
+# created: habit object was created, renamed: old and new habit_name, period_changed: old and new period,
+# completed: new completion date, removed: old removed completion date, cleared: old holds the list of all completion
+# dates before clearing, None if the completion history of a lazily loaded habit had not been loaded,
+# deleted: habit left habit_list
+HabitEvent = namedtuple("HabitEvent", ["kind", "habit", "old", "new"])
+EVENT_KINDS = ("created", "renamed", "period_changed", "completed", "removed", "cleared", "deleted")
+
+# habits are assigned to one of these locks by their hash, which saves one lock object per habit
+HABIT_LOCKS = tuple(threading.RLock() for _ in range(64))
+
+
+def to_day(indate) -> int:
+    """Converts completion date into its day ordinal (see date.toordinal)
+
+    :param datetime|date|str|int indate: datetime or date object, string in %Y-%m-%d %H:%M:%S format or day ordinal
+    :return: int: day ordinal"""
+    if isinstance(indate, int):
+        return indate
+    if isinstance(indate, str):
+        indate = tracker_util.indate_type_conversion(indate)
+    return indate.toordinal()
+
+
+def synchronized(method):
+    """Returns method which runs while holding the lock of its object (attribute lock)
+
+    :param method: method to wrap
+    :return: function"""
+    @wraps(method)
+    def locked(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+
+    return locked
+
+
+def period_key(day, period) -> int:
+    """Returns number of the period a day belongs to: the day ordinal itself for daily habits and the number of the
+    ISO calendar week (Monday to Sunday) counted from 0001-01-01, which is a Monday, for weekly habits
+
+    :param int day: day ordinal (see date.toordinal)
+    :param str period: [daily, weekly]
+    :return: int"""
+    return date_kernel.iso_week_index(day) if period == "weekly" else day
+
+
+def completion_bitmap(days, period, creation_date) -> CompletionBitmap:
+    """Returns completion days as bitmap with one bit per day or ISO calendar week since the creation date
+
+    :param Iterable[int] days: day ordinals of completions
+    :param str period: [daily, weekly]
+    :param datetime creation_date: creation date of the habit
+    :return: CompletionBitmap"""
+    return CompletionBitmap.from_days(days, period, period_key(creation_date.toordinal(), period))
+
+
+class CompletionList(MutableSequence):
+    """
+    List of completion dates, which records which dates have been added or removed since the last save, so that only
+    those changes have to be written to the database
+
+    Completions are kept at day resolution as day ordinals (see date.toordinal) in an array of 32-bit integers, which
+    takes 4 bytes per completion instead of a datetime object plus list slot. The list behaves like a list of datetime
+    objects at midnight, ordinals() returns the array itself for vectorized processing
+
+    version counts changes other than appending, which move or drop existing completions, so that derived data like
+    streaks knows when it has to be recomputed
+
+    :param iterable: completion dates as datetime, date, string or day ordinal, these are considered as already saved
+    :param Habit owner: habit object the list belongs to, gets marked as dirty upon changes
+    """
+
+    def __init__(self, iterable=(), owner=None):
+        self.days = iterable if isinstance(iterable, array) else array("i", map(to_day, iterable))
+        self.owner = owner
+        self.version = 0
+        # logs hold day ordinals
+        self.added = []
+        self.removed = []
+        self.cleared = False
+
+    def _log_added(self, day) -> None:
+        # re-adding a date that has been removed since the last save cancels out the removal
+        if day in self.removed:
+            self.removed.remove(day)
+        else:
+            self.added.append(day)
+        self._changed()
+        if self.owner is not None and self.owner.events.active("completed"):
+            self.owner.events.emit("completed", self.owner, new=datetime.fromordinal(day))
+
+    def _log_removed(self, day) -> None:
+        # removing a date that has been added since the last save cancels out the insertion
+        if day in self.added:
+            self.added.remove(day)
+        elif not self.cleared:
+            self.removed.append(day)
+        self._changed()
+        if self.owner is not None and self.owner.events.active("removed"):
+            self.owner.events.emit("removed", self.owner, old=datetime.fromordinal(day))
+
+    def _changed(self) -> None:
+        if self.owner is not None:
+            self.owner.mark_dirty()
+
+    def ordinals(self) -> array:
+        """Returns completions as array of day ordinals. The array is not a copy and must not be changed
+
+        :return: array[int]"""
+        return self.days
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [datetime.fromordinal(day) for day in self.days[index]]
+        return datetime.fromordinal(self.days[index])
+
+    def __iter__(self):
+        return map(datetime.fromordinal, self.days)
+
+    def __reversed__(self):
+        return map(datetime.fromordinal, reversed(self.days))
+
+    def __contains__(self, indate) -> bool:
+        return to_day(indate) in self.days
+
+    def __eq__(self, other):
+        if isinstance(other, CompletionList):
+            return self.days == other.days
+        if isinstance(other, (list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({list(self)!r})"
+
+    def __add__(self, other) -> list:
+        return list(self) + list(other)
+
+    def index(self, indate, *args) -> int:
+        return self.days.index(to_day(indate), *args)
+
+    def count(self, indate) -> int:
+        return self.days.count(to_day(indate))
+
+    def copy(self) -> list:
+        return list(self)
+
+    def sort(self, reverse=False) -> None:
+        # reordering does not change which dates are stored
+        self.days[:] = array("i", sorted(self.days, reverse=reverse))
+        self.version += 1
+
+    def reverse(self) -> None:
+        self.days.reverse()
+        self.version += 1
+
+    def append(self, indate) -> None:
+        day = to_day(indate)
+        self.days.append(day)
+        self._log_added(day)
+
+    def extend(self, iterable) -> None:
+        for indate in iterable:
+            self.append(indate)
+
+    def insert(self, index, indate) -> None:
+        day = to_day(indate)
+        self.days.insert(index, day)
+        self.version += 1
+        self._log_added(day)
+
+    def merge(self, days) -> None:
+        """Inserts ascending day ordinals into the ascending list in one pass, days after the latest completion are
+        appended
+
+        :param list[int] days: ascending day ordinals"""
+        if not days:
+            return
+        if not self.days or days[0] >= self.days[-1]:
+            self.days.extend(days)
+        else:
+            self.days = array("i", heapq.merge(self.days, days))
+            self.version += 1
+        for day in days:
+            self._log_added(day)
+
+    def pop(self, index=-1):
+        day = self.days.pop(index)
+        self.version += 1
+        self._log_removed(day)
+        return datetime.fromordinal(day)
+
+    def remove(self, indate) -> None:
+        day = to_day(indate)
+        self.days.remove(day)
+        self.version += 1
+        self._log_removed(day)
+
+    def clear(self) -> None:
+        publish = self.owner is not None and self.owner.events.active("cleared")
+        self._clear(list(self) if publish else None)
+
+    def _clear(self, old) -> None:
+        """Removes all completion dates and publishes a cleared event with old dates
+
+        :param list[datetime]|None old: completion dates before clearing"""
+        # all saved dates get deleted with a single statement instead of logging each date
+        publish = self.owner is not None and self.owner.events.active("cleared")
+        del self.days[:]
+        self.version += 1
+        self.added.clear()
+        self.removed.clear()
+        self.cleared = True
+        self._changed()
+        if publish:
+            self.owner.events.emit("cleared", self.owner, old=old)
+
+    def __setitem__(self, index, value) -> None:
+        old = self.days[index] if isinstance(index, slice) else [self.days[index]]
+        new = array("i", map(to_day, value)) if isinstance(index, slice) else array("i", [to_day(value)])
+        self.days[index] = new if isinstance(index, slice) else new[0]
+        self.version += 1
+        for day in old:
+            self._log_removed(day)
+        for day in new:
+            self._log_added(day)
+
+    def __delitem__(self, index) -> None:
+        old = self.days[index] if isinstance(index, slice) else [self.days[index]]
+        del self.days[index]
+        self.version += 1
+        for day in old:
+            self._log_removed(day)
+
+    def take_changes(self) -> tuple:
+        """Returns changes since the last save and resets the record
+
+        :return: tuple[bool, list[datetime], list[datetime]]: cleared, added dates, removed dates"""
+        changes = (self.cleared, [datetime.fromordinal(day) for day in self.added],
+                   [datetime.fromordinal(day) for day in self.removed])
+        self.cleared = False
+        self.added = []
+        self.removed = []
+        return changes
+
+    def restore_changes(self, cleared, added, removed) -> None:
+        """Puts changes which could not be saved back into the record. Changes made in the meantime are kept
+
+        :param bool cleared: saved dates had been cleared
+        :param list[datetime] added: added dates
+        :param list[datetime] removed: removed dates"""
+        if cleared and not self.cleared:
+            # everything in the list has to be inserted again after clearing the database
+            self.cleared = True
+            self.added = list(self.days)
+            self.removed = []
+            return
+        if self.cleared:
+            # the database gets cleared anyway and every date in the list is recorded as added
+            return
+        for day in map(to_day, added):
+            if day in self.removed:
+                self.removed.remove(day)
+            else:
+                self.added.append(day)
+        for day in map(to_day, removed):
+            if day in self.added:
+                self.added.remove(day)
+            else:
+                self.removed.append(day)
+
+
+class LazyCompletionList(CompletionList):
+    """
+    CompletionList which loads the saved completion dates only on first full access. Until then, the number of
+    completions and the latest completion are served from a summary, and new completions are kept without loading
+    the saved ones, so that checking and completing a habit does not read its history
+
+    :param Habit owner: habit object the list belongs to
+    :param loader: function without parameters, which returns the saved completion dates
+    :param int count: number of saved completion dates
+    :param datetime latest: latest saved completion date, None if there is none
+    """
+
+    def __init__(self, owner, loader, count, latest):
+        super().__init__(owner=owner)
+        self.loader = loader
+        self.loaded = False
+        # while not loaded, the array only holds completions added since the summary was read, whether they have been
+        # saved already or not. saved_count and latest describe the summary
+        self.saved_count = count
+        self.latest = latest
+
+    def load(self) -> None:
+        """Loads saved completion dates and merges them with the completions added since the summary was read. A
+        save may be pending or done, so added completions are kept whether or not the database already holds them"""
+        if not self.loaded:
+            self.loaded = True
+            self.days[:] = array("i", sorted(set(map(to_day, self.loader())).union(self.days)))
+
+    def __len__(self) -> int:
+        if self.loaded:
+            return len(self.days)
+        return self.saved_count + len(self.days)
+
+    def __getitem__(self, index):
+        if not self.loaded and not isinstance(index, slice) and index == -1:
+            if self.days:
+                return datetime.fromordinal(self.days[-1])
+            if self.saved_count:
+                return datetime.fromordinal(to_day(self.latest))
+        self.load()
+        return super().__getitem__(index)
+
+    def clear(self) -> None:
+        if self.loaded:
+            super().clear()
+            return
+        # saved dates get deleted anyway and are not loaded, cleared events carry no old dates
+        self.loaded = True
+        self._clear(None)
+
+
+
+def _load_before(name):
+    """Returns method of CompletionList with given name, which loads saved completion dates before being executed"""
+    method = getattr(CompletionList, name)
+
+    def load_and_call(self, *args, **kwargs):
+        self.load()
+        return method(self, *args, **kwargs)
+
+    load_and_call.__name__ = name
+    return load_and_call
+
+
+# all other operations need the saved completion dates
+for _name in ("ordinals", "merge", "__iter__", "__reversed__", "__contains__", "__eq__", "__repr__", "__add__", "index",
+              "count", "copy", "sort", "reverse", "insert", "pop", "remove", "__setitem__", "__delitem__"):
+    setattr(LazyCompletionList, _name, _load_before(_name))
+
+
+class StreakCounter:
+    """
+    Streak statistics of ascending completion days: the run of consecutive periods (days or ISO calendar weeks, see
+    period_key) which ends with the latest completion and the longest runs. Appending a completion updates them in
+    O(1), other changes of the completion list require a rebuild
+
+    :param str period: [daily, weekly]
+    """
+    __slots__ = ("period", "version", "count", "last", "run_start", "run_length", "longest", "longest_runs")
+
+    def __init__(self, period="daily"):
+        self.reset(period)
+
+    def reset(self, period, version=0) -> None:
+        """Forgets all completions
+
+        :param str period: [daily, weekly]
+        :param int version: version of the completion list the statistics are based on"""
+        self.period = period
+        self.version = version
+        # number of completions covered and latest of them
+        self.count = 0
+        self.last = None
+        # first day and length of the run ending with the latest completion
+        self.run_start = None
+        self.run_length = 0
+        self.longest = 0
+        # (first day, last day) of each longest run in ascending order
+        self.longest_runs = []
+
+    def add(self, day) -> None:
+        """Adds a completion after the latest one
+
+        :param int day: day ordinal"""
+        key = period_key(day, self.period)
+        last_key = None if self.last is None else period_key(self.last, self.period)
+        self.count += 1
+        self.last = day
+        if key == last_key:
+            # further completion in the same period only moves the end of the run
+            if self.longest_runs and self.longest_runs[-1][0] == self.run_start:
+                self.longest_runs[-1] = (self.run_start, day)
+            return
+        if last_key is not None and key == last_key + 1:
+            self.run_length += 1
+        else:
+            self.run_start = day
+            self.run_length = 1
+        if self.run_length > self.longest:
+            self.longest = self.run_length
+            self.longest_runs = [(self.run_start, day)]
+        elif self.run_length == self.longest:
+            self.longest_runs.append((self.run_start, day))
+
+    def current(self, day) -> int:
+        """Returns length of the run ending with the latest completion if it is still going on at given day, i.e. the
+        latest completion lies in the period of the day or the period before
+
+        :param int day: day ordinal
+        :return: int"""
+        if self.last is None or abs(period_key(day, self.period) - period_key(self.last, self.period)) > 1:
+            return 0
+        return self.run_length
+
+
+class EventBus:
+    """
+    Publishes HabitEvents to subscribed callbacks, so that caches and indexes can update or invalidate exactly the
+    changed habit. Callbacks are called synchronously on the thread which made the change, while the habit or
+    habit_list is locked, so they should only record or invalidate and must not change habits themselves
+
+        def invalidate(event):
+            cache.pop(event.habit, None)
+
+        Habit.events.subscribe(invalidate, ("completed", "removed", "cleared", "deleted"))
+
+    Publishing without subscribers for the kind of event costs a dict lookup
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # callbacks per kind, tuples get replaced instead of changed, so that emit needs no lock
+        self.subscribers = {}
+
+    def subscribe(self, callback, kinds=EVENT_KINDS):
+        """Subscribes callback to events of given kinds
+
+        :param callback: function with HabitEvent as only parameter
+        :param Iterable[str] kinds: kinds of events, see EVENT_KINDS
+        :return: callback, so that subscribe can be used as decorator"""
+        kinds = tuple(kinds)
+        unknown = set(kinds) - set(EVENT_KINDS)
+        if unknown:
+            raise ValueError(f"unknown event kinds {sorted(unknown)}, use some of {list(EVENT_KINDS)}")
+        with self.lock:
+            for kind in kinds:
+                self.subscribers[kind] = self.subscribers.get(kind, ()) + (callback,)
+        return callback
+
+    def unsubscribe(self, callback) -> None:
+        """Removes callback from all kinds of events
+
+        :param callback: subscribed function"""
+        with self.lock:
+            for kind, callbacks in list(self.subscribers.items()):
+                remaining = tuple(subscriber for subscriber in callbacks if subscriber != callback)
+                if remaining:
+                    self.subscribers[kind] = remaining
+                else:
+                    del self.subscribers[kind]
+
+    def active(self, kind) -> bool:
+        """Checks if events of given kind have subscribers, so that building costly event data can be skipped
+
+        :param str kind: kind of event
+        :return: bool"""
+        return kind in self.subscribers
+
+    def emit(self, kind, habit, old=None, new=None) -> None:
+        """Publishes HabitEvent to the subscribers of its kind
+
+        :param str kind: kind of event, see EVENT_KINDS
+        :param Habit habit: changed habit
+        :param old: value before the change
+        :param new: value after the change"""
+        callbacks = self.subscribers.get(kind)
+        if callbacks:
+            event = HabitEvent(kind, habit, old, new)
+            for callback in callbacks:
+                callback(event)
+
+
+class IdAllocator:
+    """
+    Hands out habit ids in O(log n): the smallest freed id from a min-heap or otherwise the next id above the
+    high-water mark. Ids are released when habits leave habit_list and claimed when habits with a given id join it.
+    Claiming an id above the high-water mark only raises the mark in O(1), ids skipped in between (e.g. gaps in the
+    ids of a loaded database) are not handed out
+
+    Freed ids are removed from the heap lazily: an id claimed again stays in the heap and is skipped on allocation.
+    The allocator is not synchronized itself, HabitList uses it while holding its lock
+    """
+
+    def __init__(self):
+        self.used = set()
+        self.free = []
+        self.next_id = 1
+
+    def allocate(self) -> int:
+        """Returns smallest free id and marks it as used
+
+        :return: int: habit_id"""
+        while self.free:
+            habit_id = heapq.heappop(self.free)
+            if habit_id not in self.used:
+                self.used.add(habit_id)
+                return habit_id
+        habit_id = self.next_id
+        self.next_id += 1
+        self.used.add(habit_id)
+        return habit_id
+
+    def claim(self, habit_id) -> None:
+        """Marks given id as used
+
+        :param int habit_id:"""
+        self.used.add(habit_id)
+        if habit_id >= self.next_id:
+            self.next_id = habit_id + 1
+
+    def release(self, habit_id) -> None:
+        """Marks given id as free
+
+        :param int habit_id:"""
+        if habit_id in self.used:
+            self.used.discard(habit_id)
+            heapq.heappush(self.free, habit_id)
+
+    def reset(self) -> None:
+        """Frees all ids"""
+        self.used.clear()
+        self.free.clear()
+        self.next_id = 1
+
+
+class HabitList(list):
+    """
+    List of habit objects, which records new, changed and removed habits since the last save
+
+    Habit objects add themselves upon initialization. Removing a habit from the list (e.g. habit_list.pop) marks it
+    for deletion in the database on the next save. The list owns the IdAllocator of habit ids, ids of habits in the
+    list are used, ids of removed habits become free again. Changes of the list hold its lock
+    """
+
+    def __init__(self, iterable=()):
+        super().__init__()
+        self.lock = threading.RLock()
+        self.dirty = set()
+        self.removed_ids = set()
+        self.ids = IdAllocator()
+        self.extend(iterable)
+
+    def _attach(self, habit) -> None:
+        habit.listed = True
+        self.ids.claim(habit.habit_id)
+        self.dirty.add(habit)
+
+    def _detach(self, habit) -> None:
+        habit.listed = False
+        self.ids.release(habit.habit_id)
+        self.dirty.discard(habit)
+        habit.events.emit("deleted", habit)
+        if habit.persisted:
+            self.removed_ids.add(habit.habit_id)
+            # if the object gets added again, it has to be inserted as a new row
+            habit.persisted = False
+
+    @synchronized
+    def append(self, habit) -> None:
+        super().append(habit)
+        self._attach(habit)
+
+    @synchronized
+    def extend(self, iterable) -> None:
+        for habit in iterable:
+            self.append(habit)
+
+    def __iadd__(self, iterable):
+        self.extend(iterable)
+        return self
+
+    @synchronized
+    def insert(self, index, habit) -> None:
+        super().insert(index, habit)
+        self._attach(habit)
+
+    @synchronized
+    def pop(self, index=-1):
+        habit = super().pop(index)
+        self._detach(habit)
+        return habit
+
+    @synchronized
+    def remove(self, habit) -> None:
+        super().remove(habit)
+        self._detach(habit)
+
+    @synchronized
+    def clear(self) -> None:
+        for habit in self:
+            self._detach(habit)
+        super().clear()
+        self.ids.reset()
+
+    @synchronized
+    def __setitem__(self, index, value) -> None:
+        old = self[index] if isinstance(index, slice) else [self[index]]
+        new = list(value) if isinstance(index, slice) else [value]
+        super().__setitem__(index, new if isinstance(index, slice) else value)
+        for habit in old:
+            self._detach(habit)
+        for habit in new:
+            self._attach(habit)
+
+    @synchronized
+    def __delitem__(self, index) -> None:
+        old = self[index] if isinstance(index, slice) else [self[index]]
+        super().__delitem__(index)
+        for habit in old:
+            self._detach(habit)
+
+    def take_changes(self) -> tuple:
+        """Returns all changes since the last save and resets the record, so that changes made while saving are
+        recorded for the next save
+
+        :return: tuple[set[int], list[HabitChange]]: ids of removed habits, changes of new and modified habits"""
+        with self.lock:
+            removed_ids, self.removed_ids = self.removed_ids, set()
+            dirty, self.dirty = self.dirty, set()
+        # habits take their own locks, habits changed from now on are recorded in the new set
+        return removed_ids, [habit.take_changes() for habit in dirty if habit.listed]
+
+    def restore_changes(self, removed_ids, changes) -> None:
+        """Puts changes back into the record after a failed save
+
+        :param set[int] removed_ids: ids of removed habits
+        :param list[HabitChange] changes: changes of new and modified habits"""
+        with self.lock:
+            self.removed_ids |= removed_ids
+        for change in changes:
+            change.habit.restore_changes(change)
+
+    def mark_saved(self) -> None:
+        """Marks all habits in the list as saved, e.g. after loading them from or writing them to a database"""
+        with self.lock:
+            self.dirty.clear()
+            self.removed_ids.clear()
+            habits = list(self)
+        for habit in habits:
+            with habit.lock:
+                habit.persisted = True
+                habit.modified = set()
+                habit.complete_time_list.take_changes()
+
+    @synchronized
+    def mark_dirty(self, habit) -> None:
+        """Records habit as changed since the last save. Called by Habit
+
+        :param Habit habit: habit in the list"""
+        if habit.listed:
+            self.dirty.add(habit)
+
+
+class HabitRegistry(HabitList):
+    """
+    HabitList with dict indexes of its habits by habit_id, by period and by name, so that lookups take O(1) and listings
+    of k habits with a period or name take O(k). The list itself is the stable ordered view shown in the menu, habits
+    per period and name are listed in the same order
+
+    Indexes are maintained when habits join or leave the list and by Habit when a habit name or period changes. Each
+    habit gets a sequence number when it is indexed, which ascends in list order, so that a habit moved to another
+    period or name is put in place by sorting only the habits of that period or name
+    """
+
+    def __init__(self, iterable=()):
+        self.by_id = {}
+        self.by_period = {}
+        self.by_name = {}
+        self.sequence = {}
+        self.next_sequence = 0
+        super().__init__(iterable)
+
+    def _attach(self, habit) -> None:
+        super()._attach(habit)
+        self._index(habit)
+
+    def _detach(self, habit) -> None:
+        super()._detach(habit)
+        if self.by_id.get(habit.habit_id) is habit:
+            del self.by_id[habit.habit_id]
+        self.sequence.pop(habit, None)
+        self._unindex(self.by_period, habit.period, habit)
+        self._unindex(self.by_name, habit.habit_name, habit)
+
+    def _index(self, habit) -> None:
+        self.by_id[habit.habit_id] = habit
+        self.sequence[habit] = self.next_sequence
+        self.next_sequence += 1
+        # dicts keep insertion order and act as ordered sets
+        self.by_period.setdefault(habit.period, {})[habit] = None
+        self.by_name.setdefault(habit.habit_name, {})[habit] = None
+
+    @staticmethod
+    def _unindex(index, key, habit) -> None:
+        habits = index.get(key)
+        if habits is not None:
+            habits.pop(habit, None)
+            if not habits:
+                del index[key]
+
+    def _reindex(self) -> None:
+        """Rebuilds indexes, so that their order follows the list again after reordering it"""
+        self.by_id.clear()
+        self.by_period.clear()
+        self.by_name.clear()
+        self.sequence.clear()
+        self.next_sequence = 0
+        for habit in self:
+            self._index(habit)
+
+    @synchronized
+    def period_changed(self, habit, old_period) -> None:
+        """Moves habit to the index of its new period. Called by Habit
+
+        :param Habit habit: habit in the list
+        :param str old_period: period before the change"""
+        self._unindex(self.by_period, old_period, habit)
+        self.by_period.setdefault(habit.period, {})[habit] = None
+        if len(self.by_period[habit.period]) > 1:
+            self._reorder(self.by_period, habit.period)
+
+    @synchronized
+    def name_changed(self, habit, old_name) -> None:
+        """Moves habit to the index of its new name. Called by Habit
+
+        :param Habit habit: habit in the list
+        :param str old_name: habit name before the change"""
+        self._unindex(self.by_name, old_name, habit)
+        self.by_name.setdefault(habit.habit_name, {})[habit] = None
+        if len(self.by_name[habit.habit_name]) > 1:
+            self._reorder(self.by_name, habit.habit_name)
+
+    def _reorder(self, index, key) -> None:
+        """Sorts habits of an index entry by position in the list. Only the moved habit at the end is out of order, so
+        sorting by sequence number costs O(k) for k habits of the entry"""
+        index[key] = dict.fromkeys(sorted(index[key], key=self.sequence.__getitem__))
+
+    def complete_bulk(self, dates_by_habit) -> dict:
+        """Completes many habits on many dates at once, see Habit.complete_many
+
+        :param dict[int, Iterable[datetime]] dates_by_habit: completion dates by habit_id
+        :return: dict[int, list[bool]]: for each habit_id and date, True if accepted. Dates of unknown habit ids are
+        rejected"""
+        results = {}
+        for habit_id, dates in dates_by_habit.items():
+            habit = self.by_id.get(habit_id)
+            if habit is None:
+                results[habit_id] = [False] * len(list(dates))
+            else:
+                results[habit_id] = habit.complete_many(dates)
+        return results
+
+    def get(self, habit_id, default=None):
+        """Returns habit with given habit_id
+
+        :param int habit_id:
+        :param default: returned if no habit has the habit_id
+        :return: Habit"""
+        return self.by_id.get(habit_id, default)
+
+    def habits_by_period(self, period) -> list:
+        """Returns habits with given period in list order
+
+        :param str period: [daily, weekly]
+        :return: list[Habit]"""
+        return list(self.by_period.get(period, ()))
+
+    def habits_by_name(self, habit_name) -> list:
+        """Returns habits with given name in list order
+
+        :param str habit_name:
+        :return: list[Habit]"""
+        return list(self.by_name.get(habit_name, ()))
+
+    @synchronized
+    def insert(self, index, habit) -> None:
+        super().insert(index, habit)
+        self._reindex()
+
+    @synchronized
+    def __setitem__(self, index, value) -> None:
+        super().__setitem__(index, value)
+        self._reindex()
+
+    @synchronized
+    def sort(self, *args, **kwargs) -> None:
+        super().sort(*args, **kwargs)
+        self._reindex()
+
+    @synchronized
+    def reverse(self) -> None:
+        super().reverse()
+        self._reindex()
 
 
 class Habit:
@@ -25,38 +872,168 @@ class Habit:
 
     Further attributes:
 
-    complete_time_list: list of datetime objects: when habit was completed, latest item in list is most recent one
+    complete_time_list: CompletionList of completion days viewed as datetime objects: when habit was completed,
+    latest item in list is most recent one
+
+    persisted: bool: habit exists in database
+    modified: set[str]: names of fields [habit_name, period, creation_date] changed since the last save
+    listed: bool: habit is part of habit_list
+    events: EventBus: class attribute, publishes created, renamed, period_changed, completed, removed, cleared and
+    deleted events
+    lock: threading.RLock: held by methods which change the habit, see thread safety in the module description
     """
-    # class attribute where all habit objects are stored
-    habit_list = []
+    # class attribute where all habit objects are stored, indexed by habit_id, period and name
+    habit_list = HabitRegistry()
+    # class attribute which publishes HabitEvents of all habit objects
+    events = EventBus()
+    # no per-object __dict__
+    __slots__ = ("persisted", "modified", "listed", "_habit_name", "_period", "_creation_date", "habit_id",
+                 "_complete_time_list", "_streaks")
 
     def __init__(self, habit_name, period, creation_date=datetime.now(), habit_id=None):
-        self.habit_name = habit_name
-        self.period = period
+        self.persisted = False
+        self.modified = set()
+        self.listed = False
+        self._habit_name = habit_name
+        self._period = period
         # type check and conversion for creation_date
-        self.creation_date = tracker_util.indate_type_conversion(creation_date)
-        self.habit_id = habit_id
-        # determine unique habit_id if habit_id is None (default case), otherwise uniqueness is assumed
-        if self.habit_id is None:
-            # Determining next free habit_id for new object. It is assumed that list from database has been loaded if it
-            # exists
-            # if list is empty and new habit object is the first one to be defined
-            if not Habit.habit_list:
-                self.habit_id = 1
-            # if there is an empty habit_id spot between values
-            else:
-                Habit.habit_list.sort(key=lambda x: x.habit_id, reverse=False)
-                for i in range(len(Habit.habit_list)):
-                    if (i + 1) != Habit.habit_list[i].habit_id:
-                        self.habit_id = i + 1
-                        break
-                # if only empty spot is at end of list
-                if self.habit_id is None:
-                    self.habit_id = len(Habit.habit_list) + 1
-        self.complete_time_list = []
-        # adds new Habit object to class list
-        Habit.habit_list.append(self)
+        self._creation_date = tracker_util.indate_type_conversion(creation_date)
+        self._complete_time_list = CompletionList(owner=self)
+        # StreakCounter, created on first use
+        self._streaks = None
+        with Habit.habit_list.lock:
+            # smallest freed or next habit_id if habit_id is None (default case), otherwise uniqueness is assumed. It is
+            # assumed that list from database has been loaded if it exists
+            self.habit_id = Habit.habit_list.ids.allocate() if habit_id is None else habit_id
+            # adds new Habit object to class list
+            Habit.habit_list.append(self)
+        Habit.events.emit("created", self)
+
+    @property
+    def lock(self) -> threading.RLock:
+        """Lock held by methods which change the habit, shared with other habits of the same stripe"""
+        return HABIT_LOCKS[hash(self) % len(HABIT_LOCKS)]
+
+    @property
+    def habit_name(self) -> str:
+        return self._habit_name
+
+    @habit_name.setter
+    @synchronized
+    def habit_name(self, value) -> None:
+        old_name, self._habit_name = self._habit_name, value
+        self.modified.add("habit_name")
+        if self.listed and old_name != value:
+            Habit.habit_list.name_changed(self, old_name)
+        self.mark_dirty()
+        if old_name != value:
+            Habit.events.emit("renamed", self, old_name, value)
+
+    @property
+    def period(self) -> str:
+        return self._period
+
+    @period.setter
+    @synchronized
+    def period(self, value) -> None:
+        old_period, self._period = self._period, value
+        self.modified.add("period")
+        if self.listed and old_period != value:
+            Habit.habit_list.period_changed(self, old_period)
+        if old_period != value:
+            # e.g. two completions in one week of a formerly daily habit, the database allows one per period
+            self._drop_duplicate_periods()
+        self.mark_dirty()
+        if old_period != value:
+            Habit.events.emit("period_changed", self, old_period, value)
+
+    def _drop_duplicate_periods(self) -> None:
+        """Removes completions which fall into the period of the completion before, so that the earliest completion
+        of each period is kept. Completion dates are assumed to be in ascending order"""
+        days = self._complete_time_list.ordinals()
+        duplicates = [index for index in range(1, len(days))
+                      if period_key(days[index], self._period) == period_key(days[index - 1], self._period)]
+        for index in reversed(duplicates):
+            del self._complete_time_list[index]
 
+    @property
+    def creation_date(self) -> datetime:
+        return self._creation_date
+
+    @creation_date.setter
+    @synchronized
+    def creation_date(self, value) -> None:
+        self._creation_date = tracker_util.indate_type_conversion(value)
+        self.modified.add("creation_date")
+        self.mark_dirty()
+
+    @property
+    def complete_time_list(self) -> CompletionList:
+        return self._complete_time_list
+
+    @complete_time_list.setter
+    @synchronized
+    def complete_time_list(self, value) -> None:
+        # assigning a new list replaces the content, so that the change gets recorded
+        self._complete_time_list.clear()
+        self._complete_time_list.extend(value)
+
+    @synchronized
+    def load_complete_time_list(self, dates) -> None:
+        """Replaces completion dates with dates loaded from the database without recording them as changes
+
+        :param list[datetime]|array[int] dates: completion dates, latest item in list is most recent one. An array of
+        day ordinals gets used without copying"""
+        self._complete_time_list = CompletionList(dates, owner=self)
+        self._streaks = None
+
+    @synchronized
+    def load_complete_time_list_lazily(self, loader, count, latest) -> None:
+        """Replaces completion dates with a LazyCompletionList, which loads the saved dates on first full access
+
+        :param loader: function without parameters, which returns the saved completion dates
+        :param int count: number of saved completion dates
+        :param datetime latest: latest saved completion date, None if there is none"""
+        self._complete_time_list = LazyCompletionList(self, loader, count, latest)
+        self._streaks = None
+
+    def mark_dirty(self) -> None:
+        """Records habit as changed since the last save"""
+        if self.listed:
+            Habit.habit_list.mark_dirty(self)
+
+    @synchronized
+    def take_changes(self) -> HabitChange:
+        """Returns changes of habit since the last save and resets the record. Habit is considered saved afterwards
+
+        :return: HabitChange"""
+        completions = self._complete_time_list
+        cleared, added, removed = completions.take_changes()
+        snapshot = (self.habit_id, self._habit_name, self._period, self._creation_date)
+        if not self.persisted:
+            # new habits get inserted with all of their completion dates
+            change = HabitChange(self, True, set(), False, list(completions), [], *snapshot)
+        else:
+            change = HabitChange(self, False, self.modified, cleared, added, removed, *snapshot)
+        self.persisted = True
+        self.modified = set()
+        return change
+
+    @synchronized
+    def restore_changes(self, change) -> None:
+        """Puts changes back into the record after a failed save
+
+        :param HabitChange change: changes returned by take_changes"""
+        if not self.listed:
+            return
+        if change.insert:
+            self.persisted = False
+        else:
+            self.modified |= change.update
+            self._complete_time_list.restore_changes(change.cleared, change.added, change.removed)
+        self.mark_dirty()
+
+    @synchronized
     def clear_tracking_data(self) -> None:
         """Resets tracking data by clearing completion dates from complete_time_list"""
         self.complete_time_list.clear()
@@ -84,17 +1061,184 @@ class Habit:
             else:
                 return True
 
+    @synchronized
     def complete_habit(self, indate=datetime.now()) -> bool:
-        """Checks if habit has already been completed and appends complete_time_list if not
+        """Checks if habit has already been completed and appends complete_time_list if not. Dates before the latest
+        completion are backfilled at their sorted position
+
+        Checking and completing is atomic, so that concurrent calls complete a period only once
 
         :param datetime indate: date at which habit is completed
         :return: bool: True if completion was valid, False if habit was already completed in current period"""
+        if self.complete_time_list and to_day(indate) < to_day(self.complete_time_list[-1]):
+            return self.backfill(indate)
         if self.check_complete_status(indate):
             return False
         else:
             self.complete_time_list.append(indate)
+            streaks = self._streaks
+            # keeps streaks up to date if they cover every completion before this one
+            if streaks is not None and streaks.version == self.complete_time_list.version and \
+                    streaks.count == len(self.complete_time_list) - 1 and streaks.period == self.period:
+                streaks.add(to_day(indate))
             return True
 
+    @synchronized
+    def backfill(self, indate) -> bool:
+        """Inserts a past completion at its sorted position, unless the habit has already been completed in the period
+        of the date. Position and neighbouring completions are found by binary search, so that importing historical
+        data takes O(log n) comparisons per date. Completion dates are assumed to be in ascending order, as
+        complete_habit and backfill keep them
+
+        :param datetime|date|str indate: date at which habit was completed
+        :return: bool: True if completion was inserted, False if period was already completed"""
+        day = to_day(indate)
+        days = self.complete_time_list.ordinals()
+        position = bisect_left(days, day)
+        key = period_key(day, self.period)
+        # only the completions next to the position can belong to the same period
+        if position > 0 and period_key(days[position - 1], self.period) == key:
+            return False
+        if position < len(days) and period_key(days[position], self.period) == key:
+            return False
+        self.complete_time_list.insert(position, day)
+        return True
+
+    def was_completed(self, indate) -> bool:
+        """Checks by binary search if habit has been completed on the day of given date. Completion dates are assumed
+        to be in ascending order
+
+        :param datetime|date|str indate:
+        :return: bool"""
+        return self._completed_between(to_day(indate), 1)
+
+    def completed_in_period(self, indate) -> bool:
+        """Checks by binary search if habit has been completed in the period (day or ISO calendar week) of given date.
+        Unlike check_complete_status, any past date can be checked. Completion dates are assumed to be in ascending
+        order
+
+        :param datetime|date|str indate:
+        :return: bool"""
+        day = to_day(indate)
+        if self.period == "weekly":
+            return self._completed_between(period_key(day, "weekly") * 7 + 1, 7)
+        return self._completed_between(day, 1)
+
+    def _completed_between(self, start, length) -> bool:
+        """Checks if a completion lies in the days start to start + length - 1"""
+        days = self.complete_time_list.ordinals()
+        position = bisect_left(days, start)
+        return position < len(days) and days[position] < start + length
+
+    def was_completed_many(self, dates) -> np.ndarray:
+        """Vectorized was_completed: checks many dates with one binary search over the completion days
+
+        :param Iterable[datetime|date|str|int] dates: dates or day ordinals
+        :return: numpy.ndarray[bool]: completion status for each date in given order"""
+        starts = np.fromiter(map(to_day, dates), dtype=np.int64)
+        return self._completed_between_many(starts, 1)
+
+    def completed_in_periods(self, dates) -> np.ndarray:
+        """Vectorized completed_in_period: checks the periods of many dates with one binary search over the
+        completion days, e.g. for a calendar view
+
+        :param Iterable[datetime|date|str|int] dates: dates or day ordinals
+        :return: numpy.ndarray[bool]: completion status of the period of each date in given order"""
+        days = np.fromiter(map(to_day, dates), dtype=np.int64)
+        if self.period == "weekly":
+            return self._completed_between_many(date_kernel.iso_week_index_v(days) * 7 + 1, 7)
+        return self._completed_between_many(days, 1)
+
+    def _completed_between_many(self, starts, length) -> np.ndarray:
+        """Checks for each start if a completion lies in the days start to start + length - 1"""
+        days = np.frombuffer(self.complete_time_list.ordinals(), dtype=np.intc)
+        positions = np.searchsorted(days, starts)
+        found = positions < len(days)
+        found[found] = days[positions[found]] < starts[found] + length
+        return found
+
+    def completion_bitmap(self) -> CompletionBitmap:
+        """Returns completions as bitmap with one bit per day or ISO calendar week since the creation date, which
+        offers popcount based counts and run scanning for streaks
+
+        :return: CompletionBitmap"""
+        return completion_bitmap(self.complete_time_list.ordinals(), self.period, self.creation_date)
+
+    @synchronized
+    def streaks(self) -> StreakCounter:
+        """Returns streak statistics of the completions. Completions appended since the last call are added in O(1)
+        each, the statistics are recomputed from all completions only after backfilling, removing or clearing dates or
+        after a change of period. Completion dates are assumed to be in ascending order
+
+        :return: StreakCounter"""
+        days = self.complete_time_list.ordinals()
+        version = self.complete_time_list.version
+        streaks = self._streaks
+        if streaks is None:
+            streaks = self._streaks = StreakCounter(self.period)
+        if streaks.version != version or streaks.period != self.period or streaks.count > len(days):
+            streaks.reset(self.period, version)
+        for day in islice(days, streaks.count, None):
+            streaks.add(day)
+        return streaks
+
+    @property
+    def current_streak(self) -> int:
+        """Number of consecutive periods completed up to today or the period before, 0 if there is no current streak,
+        see analytics_module.streak_current"""
+        return self.streaks().current(datetime.today().toordinal())
+
+    @property
+    def current_streak_start(self) -> datetime | None:
+        """First completion date of the current streak, None if there is no current streak"""
+        streaks = self.streaks()
+        if not streaks.current(datetime.today().toordinal()):
+            return None
+        return datetime.fromordinal(streaks.run_start)
+
+    @property
+    def longest_streak(self) -> int:
+        """Number of consecutive periods of the longest streak, see analytics_module.streaks_longest"""
+        return self.streaks().longest
+
+    @property
+    def longest_streak_dates(self) -> list:
+        """First and last completion date of each longest streak, most recent streak first as in
+        analytics_module.streaks_longest"""
+        return [(datetime.fromordinal(first), datetime.fromordinal(last))
+                for first, last in reversed(self.streaks().longest_runs)]
+
+    @synchronized
+    def complete_many(self, dates) -> list:
+        """Completes habit on many dates at once. Dates are sorted and merged with the existing completions in one
+        pass: a date is rejected if its period has already been completed or if an earlier date of the same call falls
+        into the same period. Completion dates are assumed to be in ascending order, as complete_habit keeps them
+
+        :param Iterable[datetime|date|str] dates: dates at which habit was completed
+        :return: list[bool]: for each date in given order, True if accepted, False if its period was completed"""
+        days = [to_day(indate) for indate in dates]
+        results = [False] * len(days)
+        if not days:
+            return results
+        period = self.period
+        existing = self.complete_time_list.ordinals()
+        order = sorted(range(len(days)), key=days.__getitem__)
+        # the completion before the earliest date may share its week, everything before cannot
+        j = max(bisect_left(existing, days[order[0]]) - 1, 0)
+        accepted = []
+        last_key = None
+        for i in order:
+            key = period_key(days[i], period)
+            while j < len(existing) and period_key(existing[j], period) < key:
+                j += 1
+            if key == last_key or (j < len(existing) and period_key(existing[j], period) == key):
+                continue
+            accepted.append(days[i])
+            last_key = key
+            results[i] = True
+        self.complete_time_list.merge(accepted)
+        return results
+
 
 if __name__ == '__main__':
     pass
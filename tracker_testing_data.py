@@ -118,6 +118,39 @@ def load_test_data_to_db() -> None:
     tracker.Habit.habit_list.clear()
 
 
+def load_bulk_test_data_to_db(number_habits=1000, number_days=365, db_name='sqlite:///user_data.db',
+                              date_end=datetime(2023, 12, 31), date_format="string") -> int:
+    """Writes synthetic test data straight into the database via the bulk insert functions without creating habit
+    objects. Every third habit is weekly and gets completed once a week, the other habits get completed daily in
+    the number_days days before date_end. Used for benchmarks with large amounts of data
+
+    :param int number_habits: number of habits
+    :param int number_days: number of days each habit gets tracked
+    :param str db_name: name of database
+    :param datetime date_end: date of the latest completion
+    :param str date_format: storage format of dates in database [string, ordinal]
+    :return: int: number of inserted completion dates"""
+    date_start = date_end - timedelta(days=number_days - 1)
+    # stored date values are shared by all habits
+    date_values = [databaseSQL.date_to_db(date_start + timedelta(days=x), date_format) for x in range(number_days)]
+
+    def habit_rows():
+        for habit_id in range(1, number_habits + 1):
+            period = "weekly" if habit_id % 3 == 0 else "daily"
+            yield habit_id, f"Habit {habit_id}", period, date_values[0]
+
+    def completion_rows():
+        for habit_id in range(1, number_habits + 1):
+            step = 7 if habit_id % 3 == 0 else 1
+            for x in range(0, number_days, step):
+                yield date_values[x], habit_id
+
+    databaseSQL.create_db(db_name, date_format)
+    with databaseSQL.get_engine(db_name).begin() as conn:
+        databaseSQL.bulk_insert_habits(habit_rows(), conn=conn)
+        return databaseSQL.bulk_insert_completions(completion_rows(), conn=conn)
+
+
 def insert_test_date_into_habit(habit, indate):
     """Simulates regular entry of testing data on given date"""
     # complete habit
@@ -1,5 +1,6 @@
 """
-This module provides utility functions.
+This module provides utility functions. Date calculations are thin wrappers around date_kernel, which works on day
+ordinals, so that no datetime objects are created per call
 
 Functions:
     delete_file(file_name): deletes file with given name
@@ -8,17 +9,35 @@ Functions:
     days_difference(indate1, indate2): returns difference of days between dates
     day_streak(date1, date2): returns day difference + 1 between dates
     week_streak(date1, date2): returns week difference + 1 between dates
+    iso_week_index(indate): returns absolute number of the ISO calendar week of given date
     is_long_year(inyear): checks if given year is an ISO long year
     filter_habit_list(inlist, period): returns list of habit objects with given periodicity
     filter_from_date(inlist, indate, mode): filters out dates before or after given date
+    date_range(inlist, indate_early, indate_late): returns lazy view of the dates in a window
+    count_dates(inlist, indate_early, indate_late): counts dates in a window
     date_conversion(inlist): drops HH:MM:SS from datetime objects
     get_earliest_creation_date(inlist): returns earliest creation date from a list of habit objects
+    days_difference_v, day_streak_v, week_streak_v, iso_week_index_v, period_start_v, period_end_v: vectorized
+    functions on whole numpy arrays of day ordinals or datetime64[D] values, see date_kernel
+
+Classes:
+    DateRange: lazy view of a window of ascending day ordinals as datetime objects
 """
 
 
 import os
-import calendar
+from array import array
+from collections.abc import Sequence
 from datetime import date, datetime
+import date_kernel
+
+# vectorized counterparts of the date calculations, which process whole arrays instead of one date per call
+days_difference_v = date_kernel.days_difference_v
+day_streak_v = date_kernel.day_streak_v
+week_streak_v = date_kernel.week_streak_v
+iso_week_index_v = date_kernel.iso_week_index_v
+period_start_v = date_kernel.period_start_v
+period_end_v = date_kernel.period_end_v
 
 
 def delete_file(file_name) -> None:
@@ -64,14 +83,8 @@ def days_difference(indate1, indate2) -> int:
     :param datetime indate1:
     :param datetime indate2:
     :return: integer"""
-    # check which date is greater to avoid negative number
-    # convert from datetime to date to avoid possible issues with hours, minutes and seconds
-    date1 = date_conversion([indate1])[0]
-    date2 = date_conversion([indate2])[0]
-    if date2 > date1:
-        return (date2 - date1).days
-    else:
-        return (date1 - date2).days
+    # day ordinals ignore hours, minutes and seconds
+    return date_kernel.days_difference(date_kernel.to_day(indate1), date_kernel.to_day(indate2))
 
 
 def day_streak(date1, date2) -> int:
@@ -82,79 +95,42 @@ def day_streak(date1, date2) -> int:
     :return: integer"""
     if date1 is None or date2 is None:
         return 0
-    return days_difference(date1, date2) + 1
+    return date_kernel.day_streak(date_kernel.to_day(date1), date_kernel.to_day(date2))
 
 
 def week_streak(indate1, indate2) -> int:
-    """Calculates streak of weeks. Order of dates does not matter
+    """Calculates streak of weeks, i.e. number of ISO calendar weeks from the week of one date to the week of the
+    other one. Order of dates does not matter
 
     :param datetime indate1:
     :param datetime indate2:
     :return: int"""
-
-    def compensate_for_long_years(year_start, year_end) -> int:
-        """Returns number of weeks to be added in streak between >1 year
-        :param int year_start:
-        :param int year_end:
-        :return: int: # of weeks
-        """
-        if year_end - year_start < 2:
-            return 0
-        if is_long_year(year_start + 1):
-            temp_compensate = 1
-        else:
-            temp_compensate = 0
-        return temp_compensate + compensate_for_long_years(year_start + 1, year_end)
-
     if indate1 is None or indate2 is None:
         return 0
-    date1 = date_conversion([indate1])[0]
-    date2 = date_conversion([indate2])[0]
-    if date1 > date2:
-        date_start = date2
-        date_end = date1
-    else:
-        date_start = date1
-        date_end = date2
-    # case: same week -> streak of one
-    if date_start.isocalendar()[1] == date_end.isocalendar()[1]:
-        return 1
-    # case: same year
-    elif date_start.isocalendar()[0] == date_end.isocalendar()[0]:
-        return date_end.isocalendar()[1] - date_start.isocalendar()[1] + 1
-    # not same year
-    else:
-        year_start = date_start.isocalendar()[0]
-        year_end = date_end.isocalendar()[0]
-        week_compensation = compensate_for_long_years(year_start, year_end)
+    return date_kernel.week_streak(date_kernel.to_day(indate1), date_kernel.to_day(indate2))
 
-        if is_long_year(date_start.isocalendar()[0]):
-            annual_weeks_start = 53
-        else:
-            annual_weeks_start = 52
-        return ((annual_weeks_start - date_start.isocalendar()[1] + 1) + date_end.isocalendar()[1] +
-                (date_end.isocalendar()[0] - date_start.isocalendar()[0] - 1)*52) + week_compensation
+
+def iso_week_index(indate) -> int:
+    """Returns absolute number of the ISO calendar week (Monday to Sunday) of a date, counted from the week of
+    0001-01-01, which is a Monday. Weeks of consecutive years are numbered consecutively, so that the number of weeks
+    between two dates is a subtraction, regardless of long years
+
+    :param datetime|date|int indate: date or day ordinal (see date.toordinal)
+    :return: int"""
+    return date_kernel.iso_week_index(date_kernel.to_day(indate))
 
 
 def is_long_year(inyear) -> bool:
-    """Checks if year is a long year in ISO week date system.
+    """Checks if year is a long year (53 weeks) in ISO week date system.
 
     :param int inyear:
     :return: boolean """
-    # checks if either the last day of the year or the first day of the next year is a Thursday
-    # , which is the criteria for a ISO long year
-    # 4 stands for Thursday
-    # checks for leap year first as rules for long year differ from normal years to leap years
-    if calendar.isleap(inyear):
-        if datetime(inyear, 12, 31).isoweekday() == 5 or datetime(inyear, 1, 1).isoweekday() == 3:
-            return True
-        else:
-            return False
-    else:
-        if datetime(inyear, 12, 31).isoweekday() == 4 or datetime(inyear, 1, 1).isoweekday() == 4:
-            return True
-        else:
-            return False
+    # a year is long if it ends on a Thursday or if the year before ends on a Wednesday (leap years starting on
+    # Thursday). Weekday of December 31st in closed form, 0 = Sunday
+    def weekday_of_year_end(year) -> int:
+        return (year + year // 4 - year // 100 + year // 400) % 7
+
+    return weekday_of_year_end(inyear) == 4 or weekday_of_year_end(inyear - 1) == 3
 
 
 def filter_habit_list(inlist, period) -> list:
@@ -165,6 +141,10 @@ def filter_habit_list(inlist, period) -> list:
     :param period: [daily, weekly]
     :type period: string
     :return: list[habit] """
+    # habit registries keep an index of habits by period
+    if hasattr(inlist, "habits_by_period"):
+        return inlist.habits_by_period(period)
+
     def filter_period(x):
         return x.period == period
 
@@ -181,29 +161,91 @@ def filter_from_date(inlist, indate, mode="before") -> list:
     :type indate:datetime
     :param mode: [before, after]
     :type mode: string
-    :return: list[datetime] """
-    inlist_con = date_conversion(inlist)
-    indate_con = date_conversion([indate])[0]
+    :return: list[datetime] or DateRange for completion lists"""
+    if hasattr(inlist, "ordinals"):
+        # completion lists are in ascending order, the window is found by binary search
+        if mode == "before":
+            return date_range(inlist, indate_early=indate)
+        elif mode == "after":
+            return date_range(inlist, indate_late=indate)
+        return None
+    days = map(date_kernel.to_day, inlist)
+    if mode in ("before", "after"):
+        return list(map(datetime.fromordinal, date_kernel.filter_days(days, date_kernel.to_day(indate), mode)))
+
+
+class DateRange(Sequence):
+    """
+    Lazy view of ascending day ordinals, which behaves like a list of datetime objects at midnight. Dates are created
+    on access only. date_range passes a copy of the window, so that later changes of the completion list, e.g.
+    backfilled dates, do not move the view
+
+    :param Sequence[int] days: ascending day ordinals, owned by the view
+    """
+    __slots__ = ("days",)
+
+    def __init__(self, days):
+        self.days = days
+
+    def ordinals(self) -> Sequence:
+        """Returns day ordinals of the window. The sequence is not a copy and must not be changed
+
+        :return: Sequence[int]"""
+        return self.days
+
+    def __len__(self) -> int:
+        return len(self.days)
 
-    if mode == "before":
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [datetime.fromordinal(day) for day in self.days[index]]
+        return datetime.fromordinal(self.days[index])
 
-        def check_date_before(indate2):
-            if indate2 >= indate_con:
-                return True
-            else:
-                return False
+    def __iter__(self):
+        return map(datetime.fromordinal, self.days)
 
-        return list(filter(check_date_before, inlist_con))
+    def __eq__(self, other):
+        if isinstance(other, (DateRange, list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
 
-    elif mode == "after":
+    def __repr__(self) -> str:
+        return f"DateRange({list(self)!r})"
 
-        def check_date_after(indate2):
-            if indate2 <= indate_con:
-                return True
-            else:
-                return False
 
-        return list(filter(check_date_after, inlist_con))
+def date_range(inlist, indate_early=None, indate_late=None) -> DateRange:
+    """Returns lazy view of the dates from indate_early to indate_late, both days included. The window of completion
+    lists (see tracker.CompletionList) is found by binary search in O(log n) and copied as day ordinals without
+    creating datetime objects, other lists of dates get converted and sorted first
+
+    :param list[datetime]|CompletionList inlist: dates, completion lists are in ascending order
+    :param datetime|date|None indate_early: first day of the window, None for no lower bound
+    :param datetime|date|None indate_late: last day of the window, None for no upper bound
+    :return: DateRange"""
+    if hasattr(inlist, "ordinals"):
+        days = inlist.ordinals()
+    else:
+        days = array("i", sorted(map(date_kernel.to_day, inlist)))
+    first = None if indate_early is None else date_kernel.to_day(indate_early)
+    last = None if indate_late is None else date_kernel.to_day(indate_late)
+    start, stop = date_kernel.day_range(days, first, last)
+    return DateRange(days[start:stop])
+
+
+def count_dates(inlist, indate_early=None, indate_late=None) -> int:
+    """Counts dates from indate_early to indate_late, both days included. Completion lists (see tracker.CompletionList)
+    are counted by binary search in O(log n), other lists of dates in one pass
+
+    :param list[datetime]|CompletionList inlist: dates, completion lists are in ascending order
+    :param datetime|date|None indate_early: first day of the window, None for no lower bound
+    :param datetime|date|None indate_late: last day of the window, None for no upper bound
+    :return: int"""
+    first = None if indate_early is None else date_kernel.to_day(indate_early)
+    last = None if indate_late is None else date_kernel.to_day(indate_late)
+    if hasattr(inlist, "ordinals"):
+        return date_kernel.count_days(inlist.ordinals(), first, last)
+    return sum(1 for day in map(date_kernel.to_day, inlist)
+               if (first is None or day >= first) and (last is None or day <= last))
 
 
 def date_conversion(inlist):
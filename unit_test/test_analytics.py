@@ -129,6 +129,41 @@ class Test_Habit_Completion_Counts(unittest.TestCase):
                          "with already completed habit but completion date is before period start ")
 
 
+class Test_Completion_Arrays(unittest.TestCase):
+
+    def setUp(self):
+        self.habit_list = tracker.Habit.habit_list
+        self.habit_list.clear()
+        self.h1 = tracker.Habit("h1", "daily", datetime(2023, 11, 1))
+        self.h2 = tracker.Habit("h2", "weekly", datetime(2023, 11, 1))
+        self.h3 = tracker.Habit("h3", "daily", datetime(2023, 11, 1))
+        self.h1.complete_time_list.extend([datetime(2023, 11, day) for day in range(1, 31, 2)])
+        self.h3.complete_time_list.extend([datetime(2023, 12, day) for day in range(1, 10)])
+
+    def tearDown(self):
+        self.habit_list.clear()
+
+    def test_concatenated_days_with_offsets(self):
+        days, offsets = analytics_module.completion_arrays(self.habit_list)
+        self.assertEqual([0, 15, 15, 24], offsets.tolist(), "Offsets of habits are wrong")
+        self.assertEqual([day.toordinal() for day in self.h3.complete_time_list], days[offsets[2]:].tolist(),
+                         "Completion days are not concatenated in habit order")
+
+    def test_counts_match_scalar_counts(self):
+        self.h2.complete_time_list.extend([datetime(2023, 11, 6), datetime(2023, 11, 15), datetime(2023, 12, 3)])
+        windows = ((datetime(2023, 11, 8), datetime(2023, 12, 3)), (datetime(2023, 12, 5), datetime(2023, 12, 4)),
+                   (datetime(2023, 11, 30), datetime(2023, 11, 30)))
+        for start, end in windows:
+            expected = []
+            for habit in self.habit_list:
+                first, last = start, end
+                if habit.period == "weekly":
+                    first, last = start - timedelta(days=start.weekday()), end + timedelta(days=6 - end.weekday())
+                expected.append(tracker_util.count_dates(habit.complete_time_list, first, last))
+            self.assertEqual(expected, analytics_module.habit_completion_counts(self.habit_list, start, end),
+                             "Vectorized completion counts differ from counting each habit")
+
+
 class Test_Completion_Habits(unittest.TestCase):
 
     def setUp(self):
@@ -456,6 +491,17 @@ class Test_Completion_Dates_Statistics(unittest.TestCase):
         test_input = self.habit_list[0]
         self.assertEqual(5, len(analytics_module.completion_dates_statistics(test_input)[-1][11]))
 
+    def test_cache_invalidated_by_completion(self):
+        test_input = self.habit_list[0]
+        self.assertIs(analytics_module.completion_dates_statistics(test_input),
+                      analytics_module.completion_dates_statistics(test_input), "Statistics are not cached")
+        test_input.complete_habit(datetime(datetime.today().year, 1, 1))
+        self.assertEqual(1, len(analytics_module.completion_dates_statistics(test_input)[0][0]),
+                         "Cached statistics are not dropped on completion")
+        test_input.complete_time_list.remove(datetime(datetime.today().year, 1, 1))
+        self.assertEqual(0, len(analytics_module.completion_dates_statistics(test_input)[0][0]),
+                         "Cached statistics are not dropped on removal of a completion")
+
 
 class Test_Count_Completion_Dates_Statistics(unittest.TestCase):
 
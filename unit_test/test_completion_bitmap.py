@@ -0,0 +1,49 @@
+import os
+import sys
+import unittest
+from datetime import date
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+
+from completion_bitmap import CompletionBitmap
+
+
+class Test_Completion_Bitmap(unittest.TestCase):
+
+    def setUp(self):
+        self.start = date(2023, 12, 1).toordinal()
+        # runs of 3, 1 and 4 days
+        self.days = [self.start + offset for offset in (0, 1, 2, 5, 10, 11, 12, 13)]
+        self.bitmap = CompletionBitmap.from_days(self.days, origin=self.start - 3)
+
+    def test_counts(self):
+        self.assertEqual(8, self.bitmap.count(), "Completions are not counted")
+        self.assertEqual(3, self.bitmap.count_range(self.start + 2, self.start + 10), "Window is not counted")
+        self.assertEqual(0, self.bitmap.count_range(self.start - 10, self.start - 1), "Empty window is counted")
+
+    def test_runs(self):
+        self.assertEqual([(self.start, 3), (self.start + 5, 1), (self.start + 10, 4)], list(self.bitmap.runs()),
+                         "Runs of completed days are not found")
+        self.assertEqual(4, self.bitmap.longest_run(), "Longest run is wrong")
+        self.assertEqual(2, self.bitmap.run_ending_at(self.start + 11), "Run ending at a day is wrong")
+        self.assertEqual(0, self.bitmap.run_ending_at(self.start + 4), "Run ending at a missed day is found")
+
+    def test_weekly_periods(self):
+        bitmap = CompletionBitmap.from_days([date(2023, 12, 4).toordinal(), date(2023, 12, 10).toordinal(),
+                                             date(2023, 12, 13).toordinal()], "weekly")
+        self.assertEqual((2, 2), (bitmap.count(), bitmap.longest_run()),
+                         "Completions are not grouped by calendar week")
+
+    def test_serialization_round_trip(self):
+        sparse = CompletionBitmap.from_days([1, 5000], "weekly")
+        self.assertEqual(self.bitmap, CompletionBitmap.from_bytes(self.bitmap.to_bytes()),
+                         "Raw bitmap does not survive serialization")
+        self.assertEqual(sparse, CompletionBitmap.from_bytes(sparse.to_bytes()),
+                         "Run-length encoded bitmap does not survive serialization")
+        self.assertLess(len(sparse.to_bytes()), 100, "Sparse bitmap is not run-length encoded")
+
+
+if __name__ == '__main__':
+    unittest.main()
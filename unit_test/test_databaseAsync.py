@@ -0,0 +1,92 @@
+import asyncio
+import os
+import sys
+import unittest
+import threading
+import time
+from datetime import datetime
+from unittest import mock
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+
+import databaseAsync
+import databaseSQL
+import tracker
+import tracker_testing_data
+
+
+class Test_Async_Persistence(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.db_file, self.db_name = tracker_testing_data.temp_db()
+        self.habit_list = tracker.Habit.habit_list
+        self.habit_list.clear()
+        await databaseAsync.load_data(self.db_name)
+        self.habit = tracker.Habit("h1", "daily", datetime(2023, 12, 1))
+        self.habit.complete_habit(datetime(2023, 12, 2))
+
+    async def asyncTearDown(self):
+        await databaseAsync.shutdown()
+        self.habit_list.clear()
+        tracker_testing_data.remove_db(self.db_file)
+
+    async def test_save_and_load(self):
+        await databaseAsync.save_changes(self.db_name)
+        await databaseAsync.load_data(self.db_name)
+        self.assertEqual([("h1", [datetime(2023, 12, 2)])],
+                         [(habit.habit_name, list(habit.complete_time_list)) for habit in self.habit_list],
+                         "Habits are not saved or loaded asynchronously")
+
+    async def test_failed_save_restores_changes(self):
+        with self.assertRaises(Exception, msg="Failed asynchronous save does not raise"):
+            await databaseAsync.save_changes("sqlite:////missing_directory/user_data.db")
+        databaseSQL.close_engine("sqlite:////missing_directory/user_data.db")
+        await databaseAsync.save_changes(self.db_name)
+        self.assertEqual(1, len(databaseSQL.read_complete_time_list(self.habit.habit_id, db_name=self.db_name)),
+                         "Changes of failed asynchronous save are lost")
+
+    async def test_stream(self):
+        self.habit.complete_habit(datetime(2023, 12, 3))
+        await databaseAsync.save_changes(self.db_name)
+        rows = [row async for row in databaseAsync.stream_complete_time_list(self.habit.habit_id, self.db_name,
+                                                                             batch_size=1)]
+        self.assertEqual(["2023-12-02 00:00:00", "2023-12-03 00:00:00"], [row[1] for row in rows],
+                         "Completion rows are not streamed asynchronously")
+
+    async def test_checkpointer_saves_in_background(self):
+        async with databaseAsync.Checkpointer(self.db_name, interval=60) as checkpointer:
+            checkpointer.request()
+            while checkpointer.checkpoints == 0:
+                await asyncio.sleep(0.01)
+            self.assertEqual(1, len(databaseSQL.read_complete_time_list(self.habit.habit_id, db_name=self.db_name)),
+                             "Requested checkpoint does not save changes")
+            self.habit.complete_habit(datetime(2023, 12, 3))
+        self.assertEqual(2, len(databaseSQL.read_complete_time_list(self.habit.habit_id, db_name=self.db_name)),
+                         "Remaining changes are not saved when the checkpointer stops")
+
+    async def test_stop_during_failing_write(self):
+        started = threading.Event()
+
+        def failing_write(*args):
+            started.set()
+            time.sleep(0.2)
+            raise OSError("disk full")
+
+        checkpointer = databaseAsync.Checkpointer(self.db_name, interval=60)
+        with mock.patch.object(databaseSQL, "write_changes", failing_write):
+            checkpointer.start()
+            checkpointer.request()
+            await asyncio.get_running_loop().run_in_executor(None, started.wait)
+            start = time.perf_counter()
+            await asyncio.wait_for(checkpointer.stop(), 3)
+        self.assertLess(time.perf_counter() - start, 2, "Checkpointer does not stop during a failing write")
+        self.assertIsInstance(checkpointer.last_error, OSError, "Failed write is not reported")
+        await databaseAsync.save_changes(self.db_name)
+        self.assertEqual(1, len(databaseSQL.read_complete_time_list(self.habit.habit_id, db_name=self.db_name)),
+                         "Changes of a write failing during stop are lost")
+
+
+if __name__ == '__main__':
+    unittest.main()
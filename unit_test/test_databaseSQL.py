@@ -1,8 +1,11 @@
 import os
 import sys
+import threading
+import time
 import unittest
-import tempfile
+from unittest import mock
 import tracker_testing_data
+from datetime import datetime, timedelta, date
 
 current = os.path.dirname(os.path.realpath(__file__))
 parent = os.path.dirname(current)
@@ -14,8 +17,14 @@ import tracker
 
 class Test_Data_Base_Reading_Writing(unittest.TestCase):
 
+    def setUp(self):
+        self.db_file = tracker_testing_data.temp_db()[0]
+
+    def tearDown(self):
+        tracker_testing_data.remove_db(self.db_file)
+
     def test_writing_reading_habit_data(self):
-        db_name = tempfile.NamedTemporaryFile(suffix=".db").name
+        db_name = self.db_file
         databaseSQL.create_db(db_name=f'sqlite:///{db_name}')
         tracker_testing_data.load_test_data()
         databaseSQL.object_to_db(file_name_1=f"{db_name}.db", db_name=f'sqlite:///{db_name}')
@@ -24,7 +33,7 @@ class Test_Data_Base_Reading_Writing(unittest.TestCase):
                          data[0][1], "Writing or reading habit data from/to database does not work correctly")
 
     def test_writing_reading_complete_time_data(self):
-        db_name = tempfile.NamedTemporaryFile(suffix=".db").name
+        db_name = self.db_file
         databaseSQL.create_db(db_name=f'sqlite:///{db_name}')
         tracker_testing_data.load_test_data()
         test = tracker.Habit.habit_list[0].complete_time_list[0]
@@ -36,5 +45,565 @@ class Test_Data_Base_Reading_Writing(unittest.TestCase):
                          "Writing or reading complete time data from/to database does not work correctly")
 
 
+class Test_Incremental_Save(unittest.TestCase):
+
+    def setUp(self):
+        self.db_file, self.db_name = tracker_testing_data.temp_db()
+        databaseSQL.create_db(db_name=self.db_name)
+        tracker.Habit.habit_list.clear()
+        tracker_testing_data.load_test_data()
+        databaseSQL.save_changes(db_name=self.db_name)
+        self.habit_list = tracker.Habit.habit_list
+
+    def tearDown(self):
+        self.habit_list.clear()
+        tracker_testing_data.remove_db(self.db_file)
+
+    def reload(self):
+        databaseSQL.db_to_object(db_name=self.db_name)
+        return {habit.habit_id: habit for habit in self.habit_list}
+
+    def test_initial_save_inserts_everything(self):
+        habits = self.reload()
+        self.assertEqual(5, len(habits), "Incremental save does not insert new habits")
+        self.assertEqual(9, len(habits[1].complete_time_list), "Incremental save does not insert completion dates")
+
+    def test_nothing_to_save_after_save(self):
+        self.assertEqual((set(), []), self.habit_list.take_changes(),
+                         "Changes are still recorded after saving")
+
+    def test_rename_complete_and_delete(self):
+        self.habit_list[0].habit_name = "Walking"
+        self.habit_list[0].complete_habit(datetime(2030, 1, 1))
+        self.habit_list[1].complete_time_list.remove(datetime(2023, 12, 8))
+        self.habit_list.pop(2)
+        databaseSQL.save_changes(db_name=self.db_name)
+        habits = self.reload()
+        self.assertEqual("Walking", habits[1].habit_name, "Renamed habit is not saved")
+        self.assertEqual(datetime(2030, 1, 1), habits[1].complete_time_list[-1], "New completion is not saved")
+        self.assertNotIn(datetime(2023, 12, 8), habits[2].complete_time_list, "Removed completion is not deleted")
+        self.assertNotIn(3, habits, "Deleted habit is not removed from database")
+        self.assertEqual([], databaseSQL.read_complete_time_list(3, db_name=self.db_name),
+                         "Completion dates of deleted habit are not removed from database")
+
+    def test_period_change_without_clearing_updates_period_key(self):
+        habit = tracker.Habit("h6", "daily")
+        habit.complete_time_list.extend([datetime(2023, 12, 4), datetime(2023, 12, 11)])
+        databaseSQL.save_changes(db_name=self.db_name)
+        habit.period = "weekly"
+        databaseSQL.save_changes(db_name=self.db_name)
+        with self.assertRaises(Exception, msg="Period key is not updated after period change"):
+            databaseSQL.insert_complete_time_list(datetime(2023, 12, 6), habit.habit_id, db_name=self.db_name)
+
+    def test_period_change_drops_completions_of_same_week(self):
+        habit = tracker.Habit("h6", "daily")
+        habit.complete_time_list.extend([datetime(2023, 12, 4), datetime(2023, 12, 6), datetime(2023, 12, 11)])
+        databaseSQL.save_changes(db_name=self.db_name)
+        habit.period = "weekly"
+        self.assertEqual([datetime(2023, 12, 4), datetime(2023, 12, 11)], list(habit.complete_time_list),
+                         "Second completion of a week is kept after period change")
+        databaseSQL.save_changes(db_name=self.db_name)
+        habits = self.reload()
+        self.assertEqual([datetime(2023, 12, 4), datetime(2023, 12, 11)], list(habits[6].complete_time_list),
+                         "Period change with completions in the same week is not saved")
+
+    def test_period_change_clears_completions(self):
+        self.habit_list[0].clear_tracking_data()
+        self.habit_list[0].period = "weekly"
+        databaseSQL.save_changes(db_name=self.db_name)
+        habits = self.reload()
+        self.assertEqual(("weekly", []), (habits[1].period, list(habits[1].complete_time_list)),
+                         "Period change and cleared tracking data are not saved")
+
+    def test_failed_save_restores_changes(self):
+        self.habit_list[0].habit_name = "Walking"
+        tracker.Habit("New habit", "daily")
+        with self.assertRaises(Exception):
+            databaseSQL.save_changes(db_name="sqlite:////nonexistent_directory/user_data.db")
+        databaseSQL.save_changes(db_name=self.db_name)
+        habits = self.reload()
+        self.assertEqual(("Walking", "New habit"), (habits[1].habit_name, habits[6].habit_name),
+                         "Changes of failed save are not written on next save")
+
+    def test_write_uses_snapshot_of_changes(self):
+        habit = self.habit_list[0]
+        habit.habit_name = "Walking"
+        removed_ids, changes = self.habit_list.take_changes()
+        # changed after the changes were taken, e.g. while another thread writes them
+        habit.habit_name = "Running"
+        habit.complete_habit(datetime(2030, 1, 1))
+        databaseSQL.write_changes(removed_ids, changes, self.db_name)
+        self.assertEqual(("Walking", 9), (databaseSQL.read_data_habits(self.db_name)[0][1],
+                                          len(databaseSQL.read_complete_time_list(1, self.db_name))),
+                         "Values changed after taking the changes are written")
+        databaseSQL.save_changes(db_name=self.db_name)
+        habits = self.reload()
+        self.assertEqual(("Running", datetime(2030, 1, 1)), (habits[1].habit_name, habits[1].complete_time_list[-1]),
+                         "Changes made while writing are not saved next")
+
+    def test_backfill_reloads_in_ascending_order(self):
+        habit = tracker.Habit("h6", "daily")
+        habit.complete_time_list.extend([datetime(2023, 12, 1), datetime(2023, 12, 2), datetime(2023, 12, 5)])
+        databaseSQL.save_changes(db_name=self.db_name)
+        habit.backfill(datetime(2023, 12, 3))
+        habit.backfill(datetime(2023, 12, 4))
+        databaseSQL.save_changes(db_name=self.db_name)
+        for lazy in (False, True):
+            databaseSQL.db_to_object(db_name=self.db_name, lazy=lazy)
+            habit = self.habit_list.get(6)
+            self.assertEqual([datetime(2023, 12, day) for day in range(1, 6)], list(habit.complete_time_list),
+                             "Backfilled completions are not reloaded at their sorted position")
+            self.assertTrue(habit.was_completed(datetime(2023, 12, 3)), "Reloaded backfill is not found")
+            self.assertFalse(habit.backfill(datetime(2023, 12, 3)), "Reloaded backfill is accepted twice")
+            self.assertEqual(5, habit.longest_streak, "Streak of reloaded completions is wrong")
+            databaseSQL.save_changes(db_name=self.db_name)
+
+
+class Test_Snapshot_Save(unittest.TestCase):
+
+    def setUp(self):
+        self.file_name, self.db_name = tracker_testing_data.temp_db()
+        tracker.Habit.habit_list.clear()
+        self.habit = tracker.Habit("h1", "daily", datetime(2023, 12, 1))
+        self.habit.complete_habit(datetime(2023, 12, 2))
+        databaseSQL.object_to_db(self.db_name)
+
+    def tearDown(self):
+        tracker.Habit.habit_list.clear()
+        tracker_testing_data.remove_db(self.file_name)
+
+    def test_snapshot_replaces_database(self):
+        self.habit.habit_name = "h2"
+        databaseSQL.object_to_db(self.db_name)
+        self.assertEqual(["h2"], [row[1] for row in databaseSQL.read_data_habits(self.db_name)],
+                         "Snapshot does not replace database")
+        self.assertFalse(os.path.exists(f"{self.file_name}.tmp"), "Temporary file is left behind")
+
+    def test_failed_snapshot_keeps_database(self):
+        # second completion on the same day violates the unique period index
+        self.habit.complete_time_list.append(datetime(2023, 12, 2, 12))
+        databaseSQL.object_to_db(self.db_name)
+        self.assertEqual(1, len(databaseSQL.read_complete_time_list(self.habit.habit_id, self.db_name)),
+                         "Failed snapshot changes database")
+        self.assertFalse(os.path.exists(f"{self.file_name}.tmp"), "Temporary file is left behind")
+
+
+class Test_Bulk_Insert(unittest.TestCase):
+
+    def setUp(self):
+        self.db_file, self.db_name = tracker_testing_data.temp_db()
+        databaseSQL.create_db(db_name=self.db_name)
+
+    def tearDown(self):
+        tracker_testing_data.remove_db(self.db_file)
+
+    def test_bulk_insert_habits(self):
+        rows = [(1, "h1", "daily", datetime(2023, 12, 1)), (2, "h2", "weekly", "2023-12-02 00:00:00")]
+        self.assertEqual(2, databaseSQL.bulk_insert_habits(rows, db_name=self.db_name),
+                         "Bulk insert does not return number of inserted habits")
+        self.assertEqual([(1, "h1", "daily", "2023-12-01 00:00:00"), (2, "h2", "weekly", "2023-12-02 00:00:00")],
+                         databaseSQL.read_data_habits(db_name=self.db_name), "Bulk insert of habits does not work")
+
+    def test_bulk_insert_completions_in_batches(self):
+        rows = ((datetime(2023, 1, 1) + timedelta(days=x), 1) for x in range(25))
+        self.assertEqual(25, databaseSQL.bulk_insert_completions(rows, db_name=self.db_name, batch_size=10),
+                         "Bulk insert does not return number of inserted completion dates")
+        data = databaseSQL.read_complete_time_list(1, db_name=self.db_name)
+        self.assertEqual(("2023-01-01 00:00:00", "2023-01-25 00:00:00"), (data[0][1], data[-1][1]),
+                         "Bulk insert of completion dates in batches does not work")
+
+    def test_bulk_insert_defers_summary_trigger(self):
+        databaseSQL.bulk_insert_habits([(1, "h1", "weekly", datetime(2023, 1, 1))], db_name=self.db_name)
+        databaseSQL.insert_complete_time_list(datetime(2022, 12, 1), 1, db_name=self.db_name)
+        rows = ((datetime(2023, 1, 2) + timedelta(weeks=x), 1) for x in range(25))
+        databaseSQL.bulk_insert_completions(rows, db_name=self.db_name, batch_size=10)
+        databaseSQL.insert_complete_time_list(datetime(2021, 12, 1), 1, db_name=self.db_name)
+        with databaseSQL.get_engine(self.db_name).connect() as conn:
+            summary = conn.exec_driver_sql("SELECT completion_count, latest_date FROM completion_summary").fetchall()
+            keys = [row[0] for row in conn.exec_driver_sql("SELECT period_key FROM complete_time_list ORDER BY date")]
+        # the last insert is counted by the restored trigger
+        self.assertEqual([(27, "2023-06-19 00:00:00")], summary, "Completion summary is wrong after bulk insert")
+        self.assertEqual([tracker.period_key((datetime(2023, 1, 2) + timedelta(weeks=x)).toordinal(), "weekly")
+                          for x in range(25)], keys[2:], "Weekly period keys are not computed")
+
+
+class Test_Load_Database(unittest.TestCase):
+
+    def setUp(self):
+        self.db_file, self.db_name = tracker_testing_data.temp_db()
+        databaseSQL.create_db(db_name=self.db_name)
+        databaseSQL.bulk_insert_habits([(1, "h1", "daily", "2023-12-01 00:00:00"),
+                                        (2, "h2", "weekly", "2023-12-01 00:00:00"),
+                                        (3, "h3", "daily", "2023-12-01 00:00:00")], db_name=self.db_name)
+        databaseSQL.bulk_insert_completions([("2023-12-02 00:00:00", 1), ("2023-12-04 00:00:00", 2),
+                                             ("2023-12-03 08:30:00", 1), ("2023-12-02 00:00:00", 2)],
+                                            db_name=self.db_name)
+        databaseSQL.db_to_object(db_name=self.db_name)
+        self.habit_list = tracker.Habit.habit_list
+
+    def tearDown(self):
+        self.habit_list.clear()
+        tracker_testing_data.remove_db(self.db_file)
+
+    def test_completions_grouped_by_habit(self):
+        # completions are kept at day resolution
+        self.assertEqual([[datetime(2023, 12, 2), datetime(2023, 12, 3)],
+                          [datetime(2023, 12, 2), datetime(2023, 12, 4)],
+                          []],
+                         [list(habit.complete_time_list) for habit in self.habit_list],
+                         "Completion dates are not assigned to their habits in ascending order")
+
+    def test_loaded_data_is_not_recorded_as_change(self):
+        self.assertEqual((set(), []), self.habit_list.take_changes(),
+                         "Loaded habits are recorded as changes")
+
+
+class Test_Lazy_Load(unittest.TestCase):
+
+    def setUp(self):
+        self.db_file, self.db_name = tracker_testing_data.temp_db()
+        databaseSQL.create_db(db_name=self.db_name)
+        databaseSQL.bulk_insert_habits([(1, "h1", "daily", "2023-12-01 00:00:00"),
+                                        (2, "h2", "weekly", "2023-12-01 00:00:00")], db_name=self.db_name)
+        databaseSQL.bulk_insert_completions([("2023-12-03 00:00:00", 1), ("2023-12-02 00:00:00", 1)],
+                                            db_name=self.db_name)
+        databaseSQL.db_to_object(db_name=self.db_name, lazy=True)
+        self.habit_list = tracker.Habit.habit_list
+
+    def tearDown(self):
+        self.habit_list.clear()
+        tracker_testing_data.remove_db(self.db_file)
+
+    def test_summary_without_loading(self):
+        habit = self.habit_list[0]
+        self.assertEqual((2, datetime(2023, 12, 3), False),
+                         (len(habit.complete_time_list), habit.complete_time_list.latest,
+                          habit.complete_time_list.loaded),
+                         "Completion summary is not read from database")
+
+    def test_dates_loaded_on_access(self):
+        self.assertEqual([datetime(2023, 12, 2), datetime(2023, 12, 3)], list(self.habit_list[0].complete_time_list),
+                         "Lazy completion dates are not loaded in ascending order")
+
+    def test_save_without_loading(self):
+        self.habit_list[0].complete_habit(datetime(2023, 12, 5))
+        databaseSQL.save_changes(self.db_name)
+        databaseSQL.db_to_object(db_name=self.db_name, lazy=True)
+        habit = self.habit_list[0]
+        self.assertEqual((3, datetime(2023, 12, 5)), (len(habit.complete_time_list), habit.complete_time_list.latest),
+                         "Completion summary is not updated on save")
+        self.assertEqual([datetime(2023, 12, 2), datetime(2023, 12, 3), datetime(2023, 12, 5)],
+                         list(habit.complete_time_list), "Saved completion is missing")
+
+    def test_load_while_save_is_pending(self):
+        habit = self.habit_list[0]
+        habit.complete_habit(datetime(2023, 12, 5))
+        removed_ids, changes = self.habit_list.take_changes()
+        # completion history loaded before the worker thread has written the changes
+        self.assertEqual([datetime(2023, 12, 2), datetime(2023, 12, 3), datetime(2023, 12, 5)],
+                         list(habit.complete_time_list), "Pending completion is lost when loading")
+        databaseSQL.write_changes(removed_ids, changes, self.db_name)
+        self.assertFalse(habit.complete_habit(datetime(2023, 12, 5)), "Pending completion is accepted twice")
+        self.assertEqual([datetime(2023, 12, 2), datetime(2023, 12, 3), datetime(2023, 12, 5)],
+                         databaseSQL.read_completion_dates(habit.habit_id, self.db_name),
+                         "Pending completion is not written")
+
+    def test_load_after_save(self):
+        habit = self.habit_list[0]
+        habit.complete_habit(datetime(2023, 12, 5))
+        databaseSQL.save_changes(self.db_name)
+        self.assertEqual((3, [datetime(2023, 12, 2), datetime(2023, 12, 3), datetime(2023, 12, 5)]),
+                         (len(habit.complete_time_list), list(habit.complete_time_list)),
+                         "Saved completion is duplicated when loading")
+
+    def test_summary_follows_deletes(self):
+        self.habit_list[0].complete_time_list.remove(datetime(2023, 12, 3))
+        databaseSQL.save_changes(self.db_name)
+        with databaseSQL.get_engine(self.db_name).connect() as conn:
+            rows = conn.exec_driver_sql("SELECT habit_id, completion_count, latest_date FROM completion_summary"
+                                        ).fetchall()
+        self.assertEqual([(1, 1, "2023-12-02 00:00:00")], rows, "Completion summary is not updated on delete")
+
+
+class Test_Bitmap_Storage(unittest.TestCase):
+
+    def setUp(self):
+        self.db_file, self.db_name = tracker_testing_data.temp_db()
+        databaseSQL.create_db(db_name=self.db_name)
+        tracker.Habit.habit_list.clear()
+        self.habit = tracker.Habit("h1", "daily", datetime(2023, 12, 1))
+        self.habit.complete_many([datetime(2023, 12, 1), datetime(2023, 12, 2)])
+        databaseSQL.save_changes(self.db_name)
+
+    def tearDown(self):
+        tracker.Habit.habit_list.clear()
+        tracker_testing_data.remove_db(self.db_file)
+
+    def stored_bitmap(self):
+        with databaseSQL.get_engine(self.db_name).connect() as conn:
+            return conn.exec_driver_sql("SELECT bitmap FROM completion_summary WHERE habit_id = ?",
+                                        (self.habit.habit_id,)).scalar()
+
+    def test_save_does_not_build_bitmap(self):
+        self.assertIsNone(self.stored_bitmap(), "Save builds the completion bitmap")
+
+    def test_bitmap_built_on_read(self):
+        self.assertEqual(self.habit.completion_bitmap(), databaseSQL.read_bitmap(self.habit.habit_id, self.db_name),
+                         "Completion bitmap is not built from stored dates")
+        self.assertIsNotNone(self.stored_bitmap(), "Built completion bitmap is not stored")
+        self.assertEqual(self.habit.completion_bitmap(), databaseSQL.read_bitmap(self.habit.habit_id, self.db_name),
+                         "Stored completion bitmap is not read")
+
+    def test_bitmap_reset_by_other_writers(self):
+        databaseSQL.read_bitmap(self.habit.habit_id, self.db_name)
+        databaseSQL.insert_complete_time_list(datetime(2023, 12, 5), self.habit.habit_id, db_name=self.db_name)
+        self.assertIsNone(self.stored_bitmap(), "Outdated bitmap is kept")
+        self.habit.complete_habit(datetime(2023, 12, 5))
+        self.assertEqual(self.habit.completion_bitmap(), databaseSQL.read_bitmap(self.habit.habit_id, self.db_name),
+                         "Reset bitmap is not built again")
+
+    def test_bitmap_reset_by_period_change(self):
+        # no completions of the same week, so no completion gets deleted by the period change
+        self.habit.complete_time_list.remove(datetime(2023, 12, 2))
+        databaseSQL.save_changes(self.db_name)
+        databaseSQL.read_bitmap(self.habit.habit_id, self.db_name)
+        self.habit.period = "weekly"
+        databaseSQL.save_changes(self.db_name)
+        self.assertEqual(self.habit.completion_bitmap(), databaseSQL.read_bitmap(self.habit.habit_id, self.db_name),
+                         "Bitmap of the old period is kept")
+
+
+class Test_Streaming(unittest.TestCase):
+
+    def setUp(self):
+        self.db_file, self.db_name = tracker_testing_data.temp_db()
+        databaseSQL.create_db(db_name=self.db_name, date_format="ordinal")
+        databaseSQL.bulk_insert_habits([(habit_id, f"h{habit_id}", "daily", datetime(2023, 12, 1))
+                                        for habit_id in range(1, 4)], db_name=self.db_name)
+        databaseSQL.bulk_insert_completions([(datetime(2023, 12, day), habit_id) for day in range(1, 11)
+                                             for habit_id in range(1, 4)], db_name=self.db_name)
+
+    def tearDown(self):
+        tracker_testing_data.remove_db(self.db_file)
+
+    def test_stream_habits_in_batches(self):
+        self.assertEqual([2, 1], [len(batch) for batch in databaseSQL.stream_data_habits(
+            self.db_name, batch_size=2, batches=True)], "Habit rows are not fetched in batches")
+
+    def test_stream_matches_read(self):
+        self.assertEqual(databaseSQL.read_complete_time_list(2, db_name=self.db_name),
+                         list(databaseSQL.stream_complete_time_list(2, self.db_name, batch_size=3)),
+                         "Streamed rows differ from read rows")
+
+    def test_stream_filters(self):
+        rows = list(databaseSQL.stream_complete_time_list([1, 3], self.db_name, date_from=date(2023, 12, 3),
+                                                          date_to=datetime(2023, 12, 4, 23, 0)))
+        self.assertEqual([(date(2023, 12, 3).toordinal(), 1), (date(2023, 12, 3).toordinal(), 3),
+                          (date(2023, 12, 4).toordinal(), 1), (date(2023, 12, 4).toordinal(), 3)],
+                         [(row[1], row[2]) for row in rows], "Streamed rows are not filtered by habit and day")
+
+    def test_stream_filters_string_dates(self):
+        databaseSQL.convert_date_format(self.db_name, "string")
+        databaseSQL.bulk_insert_completions([(datetime(2023, 12, 11, 8, 30), 1)], db_name=self.db_name)
+        self.assertEqual(["2023-12-10 00:00:00", "2023-12-11 08:30:00"],
+                         [row[1] for row in databaseSQL.stream_complete_time_list(
+                             1, self.db_name, date_from=date(2023, 12, 10), date_to=date(2023, 12, 11))],
+                         "Streamed string dates are not filtered by day")
+
+
+class Test_Schema_Migration(unittest.TestCase):
+
+    def setUp(self):
+        self.db_file, self.db_name = tracker_testing_data.temp_db()
+        # schema before versioning: no period_key, no indexes and duplicate completions in one period
+        with databaseSQL.get_engine(self.db_name).begin() as conn:
+            conn.exec_driver_sql("CREATE TABLE habits (habit_id INTEGER PRIMARY KEY, habit VARCHAR, "
+                                 "period VARCHAR, creation_date VARCHAR)")
+            conn.exec_driver_sql("CREATE TABLE complete_time_list (id INTEGER PRIMARY KEY, date VARCHAR, "
+                                 "habit_id INTEGER REFERENCES habits (habit_id))")
+            conn.exec_driver_sql("INSERT INTO habits VALUES (1, 'h1', 'daily', '2023-12-01 00:00:00'), "
+                                 "(2, 'h2', 'weekly', '2023-12-01 00:00:00')")
+            conn.exec_driver_sql("INSERT INTO complete_time_list (date, habit_id) VALUES "
+                                 "('2023-12-04 08:00:00', 1), ('2023-12-04 20:00:00', 1), "
+                                 "('2023-12-05 00:00:00', 1), ('2023-12-04 00:00:00', 2), "
+                                 "('2023-12-10 00:00:00', 2), ('2023-12-11 00:00:00', 2)")
+
+    def tearDown(self):
+        tracker_testing_data.remove_db(self.db_file)
+
+    def test_migration_stamps_latest_version(self):
+        self.assertEqual(0, databaseSQL.get_schema_version(self.db_name), "Unversioned database has a version")
+        self.assertEqual(databaseSQL.SCHEMA_VERSION, databaseSQL.migrate(self.db_name),
+                         "Migration does not upgrade to the latest version")
+        self.assertEqual(databaseSQL.SCHEMA_VERSION, databaseSQL.get_schema_version(self.db_name),
+                         "Migration does not stamp the schema version")
+
+    def test_migration_creates_indexes(self):
+        databaseSQL.migrate(self.db_name)
+        with databaseSQL.get_engine(self.db_name).connect() as conn:
+            indexes = {row[1] for row in conn.exec_driver_sql("PRAGMA index_list(complete_time_list)")}
+        self.assertEqual({"ix_complete_time_list_habit_id_date", "ux_complete_time_list_habit_id_period_key"},
+                         indexes, "Migration does not create indexes")
+
+    def test_migration_removes_duplicate_periods(self):
+        databaseSQL.migrate(self.db_name)
+        self.assertEqual(["2023-12-04 08:00:00", "2023-12-05 00:00:00"],
+                         [row[1] for row in databaseSQL.read_complete_time_list(1, db_name=self.db_name)],
+                         "Migration does not remove duplicate daily completions")
+        self.assertEqual(["2023-12-04 00:00:00", "2023-12-11 00:00:00"],
+                         [row[1] for row in databaseSQL.read_complete_time_list(2, db_name=self.db_name)],
+                         "Migration does not remove duplicate weekly completions")
+
+    def test_migrated_database_stores_ordinals_as_integers(self):
+        databaseSQL.convert_date_format(self.db_name, "ordinal")
+        self.assertEqual(date(2023, 12, 4).toordinal(),
+                         databaseSQL.read_complete_time_list(1, db_name=self.db_name)[0][1],
+                         "Date columns of migrated database do not keep integers")
+
+    def test_migration_adds_bitmap_column(self):
+        databaseSQL.migrate(self.db_name)
+        with databaseSQL.get_engine(self.db_name).connect() as conn:
+            columns = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info(completion_summary)")}
+        self.assertIn("bitmap", columns, "Migration does not add the bitmap column")
+        with databaseSQL.get_engine(self.db_name).connect() as conn:
+            bitmaps = conn.exec_driver_sql("SELECT bitmap FROM completion_summary").fetchall()
+        self.assertTrue(all(row[0] is None for row in bitmaps), "Migrated database has a bitmap")
+
+    def test_unique_period_is_enforced(self):
+        databaseSQL.migrate(self.db_name)
+        with self.assertRaises(Exception, msg="Second completion in the same week is accepted"):
+            databaseSQL.insert_complete_time_list(datetime(2023, 12, 13), 2, db_name=self.db_name)
+
+    def test_new_database_has_latest_version(self):
+        db_file, db_name = tracker_testing_data.temp_db()
+        databaseSQL.create_db(db_name)
+        self.assertEqual(databaseSQL.SCHEMA_VERSION, databaseSQL.get_schema_version(db_name),
+                         "New database is not stamped with the latest schema version")
+        tracker_testing_data.remove_db(db_file)
+
+
+class Test_Date_Format(unittest.TestCase):
+
+    def setUp(self):
+        self.db_file, self.db_name = tracker_testing_data.temp_db()
+        self.habit_list = tracker.Habit.habit_list
+        self.habit_list.clear()
+        self.h1 = tracker.Habit("h1", "daily", creation_date=datetime(2023, 12, 1))
+        self.h1.complete_time_list.extend([datetime(2023, 12, 2), datetime(2023, 12, 3)])
+
+    def tearDown(self):
+        self.habit_list.clear()
+        tracker_testing_data.remove_db(self.db_file)
+
+    def test_ordinal_format_stores_integers(self):
+        databaseSQL.create_db(self.db_name, date_format="ordinal")
+        databaseSQL.save_changes(db_name=self.db_name)
+        self.assertEqual([date(2023, 12, 2).toordinal(), date(2023, 12, 3).toordinal()],
+                         [row[1] for row in databaseSQL.read_complete_time_list(1, db_name=self.db_name)],
+                         "Ordinal date format does not store day ordinals")
+
+    def test_ordinal_format_round_trip(self):
+        databaseSQL.create_db(self.db_name, date_format="ordinal")
+        databaseSQL.save_changes(db_name=self.db_name)
+        databaseSQL.db_to_object(db_name=self.db_name)
+        self.assertEqual((datetime(2023, 12, 1), [datetime(2023, 12, 2), datetime(2023, 12, 3)]),
+                         (self.habit_list[0].creation_date, list(self.habit_list[0].complete_time_list)),
+                         "Dates stored as ordinals are not loaded correctly")
+
+    def test_convert_string_to_ordinal_and_back(self):
+        databaseSQL.create_db(self.db_name)
+        databaseSQL.save_changes(db_name=self.db_name)
+        databaseSQL.convert_date_format(self.db_name, "ordinal")
+        self.assertEqual("ordinal", databaseSQL.get_date_format(self.db_name), "Date format is not recorded")
+        self.assertEqual(date(2023, 12, 2).toordinal(),
+                         databaseSQL.read_complete_time_list(1, db_name=self.db_name)[0][1],
+                         "Conversion to ordinal date format does not work")
+        databaseSQL.convert_date_format(self.db_name, "string")
+        self.assertEqual("2023-12-02 00:00:00", databaseSQL.read_complete_time_list(1, db_name=self.db_name)[0][1],
+                         "Conversion to string date format does not work")
+
+    def test_wrong_date_format_error(self):
+        with self.assertRaises(ValueError, msg="Does not recognize unknown date format"):
+            databaseSQL.create_db(self.db_name, date_format="epoch")
+
+
+class Test_Database_Manager(unittest.TestCase):
+
+    def setUp(self):
+        self.db_file, self.db_name = tracker_testing_data.temp_db()
+
+    def tearDown(self):
+        tracker_testing_data.remove_db(self.db_file)
+
+    def test_engine_is_shared(self):
+        with databaseSQL.DatabaseManager() as manager:
+            self.assertIs(manager.get_engine(self.db_name), manager.get_engine(self.db_name),
+                          "Engine is not reused for the same database name")
+
+    def test_context_manager_closes_engines(self):
+        with databaseSQL.DatabaseManager() as manager:
+            manager.get_engine(self.db_name)
+        self.assertEqual({}, manager.engines, "Engines are not closed when leaving the with-block")
+
+    def test_engine_is_shared_between_threads(self):
+        create_engine = databaseSQL.create_engine
+
+        def slow_create_engine(*args, **kwargs):
+            time.sleep(0.05)
+            return create_engine(*args, **kwargs)
+
+        engines = []
+        with databaseSQL.DatabaseManager() as manager, \
+                mock.patch.object(databaseSQL, "create_engine", side_effect=slow_create_engine) as patched:
+            threads = [threading.Thread(target=lambda: engines.append(manager.get_engine(self.db_name)))
+                       for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(1, patched.call_count, "Concurrent threads create several engines")
+        self.assertEqual(1, len(set(map(id, engines))), "Threads get different engines")
+
+    def test_functions_use_shared_engine(self):
+        databaseSQL.create_db(db_name=self.db_name)
+        databaseSQL.insert_data_habits(1, "habit", "daily", datetime(2023, 12, 1), db_name=self.db_name)
+        databaseSQL.insert_complete_time_list(datetime(2023, 12, 2), 1, db_name=self.db_name)
+        self.assertEqual(1, len(databaseSQL.read_complete_time_list(1, db_name=self.db_name)),
+                         "Reading and writing via shared engine does not work")
+        self.assertIn(self.db_name, databaseSQL.database_manager.engines,
+                      "Module functions do not keep the shared engine")
+        databaseSQL.close_engine(self.db_name)
+        self.assertNotIn(self.db_name, databaseSQL.database_manager.engines, "Shared engine is not closed")
+
+
+class Test_Performance_Profile(unittest.TestCase):
+
+    def setUp(self):
+        self.db_file, self.db_name = tracker_testing_data.temp_db()
+
+    def tearDown(self):
+        tracker_testing_data.remove_db(self.db_file)
+
+    def pragmas(self, manager):
+        with manager.get_engine(self.db_name).connect() as conn:
+            return tuple(conn.exec_driver_sql(f"PRAGMA {pragma}").scalar()
+                         for pragma in ("journal_mode", "synchronous", "temp_store"))
+
+    def test_profile_applied_on_connection(self):
+        with databaseSQL.DatabaseManager(profile="durable") as manager:
+            self.assertEqual(("wal", 2, 0), self.pragmas(manager), "Durable profile is not applied")
+
+    def test_set_profile_reopens_engines(self):
+        with databaseSQL.DatabaseManager(profile="durable") as manager:
+            engine = manager.get_engine(self.db_name)
+            manager.set_profile("fast")
+            self.assertIsNot(engine, manager.get_engine(self.db_name), "Engine with old profile is kept")
+            self.assertEqual(("wal", 0, 2), self.pragmas(manager), "Fast profile is not applied")
+
+    def test_unknown_profile_error(self):
+        with self.assertRaises(ValueError, msg="Unknown profile is accepted"):
+            databaseSQL.set_performance_profile("unsafe")
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,85 @@
+import os
+import sys
+import unittest
+from array import array
+from datetime import date, datetime
+
+import numpy as np
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+
+import date_kernel
+
+
+class Test_Date_Kernel(unittest.TestCase):
+
+    def setUp(self):
+        # Sunday of calendar week 52 of 2022 and Monday of calendar week 2 of 2023
+        self.day1 = date(2023, 1, 1).toordinal()
+        self.day2 = date(2023, 1, 9).toordinal()
+
+    def test_scalar_functions(self):
+        self.assertEqual((8, 9, 3), (date_kernel.days_difference(self.day2, self.day1),
+                                     date_kernel.day_streak(self.day1, self.day2),
+                                     date_kernel.week_streak(self.day2, self.day1)),
+                         "Scalar date arithmetic on day ordinals is wrong")
+        self.assertEqual(date_kernel.to_day(datetime(2023, 1, 1, 23, 59)), self.day1, "Time is not dropped")
+
+    def test_vectorized_functions_match_scalar(self):
+        days = date_kernel.to_days([date(2020, 2, 29), datetime(2023, 1, 1, 12), self.day2])
+        self.assertEqual([date_kernel.week_streak(day, self.day2) for day in days.tolist()],
+                         date_kernel.week_streak_v(days, self.day2).tolist(), "Vectorized week streak is wrong")
+        self.assertEqual([date_kernel.day_streak(day, self.day1) for day in days.tolist()],
+                         date_kernel.day_streak_v(days, self.day1).tolist(), "Vectorized day streak is wrong")
+        self.assertEqual([date_kernel.iso_week_index(day) for day in days.tolist()],
+                         date_kernel.iso_week_index_v(days).tolist(), "Vectorized week index is wrong")
+
+    def test_filter_days(self):
+        days = array("i", [self.day1, self.day1 + 1, self.day2])
+        self.assertEqual([self.day1 + 1, self.day2], date_kernel.filter_days(days, self.day1 + 1, "before"),
+                         "Days before cutoff are kept")
+        self.assertEqual([self.day1, self.day1 + 1],
+                         date_kernel.filter_days_v(date_kernel.to_days(days), self.day1 + 1, "after").tolist(),
+                         "Days after cutoff are kept")
+        self.assertEqual(np.int64, date_kernel.to_days(array("i")).dtype, "Empty array is not converted")
+
+    def test_day_range(self):
+        days = array("i", [self.day1, self.day1 + 2, self.day1 + 2, self.day2])
+        self.assertEqual([(1, 3), (0, 0), (0, 4), (3, 3)],
+                         [date_kernel.day_range(days, self.day1 + 1, self.day1 + 5),
+                          date_kernel.day_range(days, None, self.day1 - 1), date_kernel.day_range(days),
+                          date_kernel.day_range(days, self.day2, self.day1)],
+                         "Window bounds of ascending days are wrong")
+        self.assertEqual(2, date_kernel.count_days(days, self.day1 + 2, self.day1 + 2),
+                         "Days in window are not counted")
+
+    def test_datetime64_input(self):
+        dates = np.array(["2023-01-01", "2023-01-09"], dtype="datetime64[D]")
+        self.assertEqual([self.day1, self.day2], date_kernel.as_days(dates).tolist(), "datetime64 is not converted")
+        self.assertEqual([3, 3], date_kernel.week_streak_v(dates, dates[::-1]).tolist(),
+                         "Vectorized functions do not take datetime64 values")
+        self.assertTrue((dates == date_kernel.to_datetime64(date_kernel.as_days(dates))).all(),
+                        "Day ordinals are not converted back to datetime64")
+
+    def test_period_bucketing(self):
+        days = np.array([self.day1, self.day2])
+        weekly = np.array([True, False])
+        self.assertEqual([date(2022, 12, 26).toordinal(), self.day2],
+                         date_kernel.period_start_v(days, weekly).tolist(), "Period starts are wrong")
+        self.assertEqual([self.day1, date(2023, 1, 15).toordinal()],
+                         date_kernel.period_end_v(days, True).tolist(), "Period ends are wrong")
+
+    def test_count_days_per_segment(self):
+        days = np.array([1, 5, 9, 3, 4, 10])
+        offsets = np.array([0, 3, 5, 5, 6])
+        self.assertEqual([2, 1, 0, 1],
+                         date_kernel.count_days_v(days, offsets, np.array([2, 0, 0, 10]), np.array([9, 3, 5, 10]))
+                         .tolist(), "Windows of concatenated segments are not counted")
+        self.assertEqual([0, 0, 0, 0], date_kernel.count_days_v(days, offsets, 6, 2).tolist(),
+                         "Empty windows are not counted as zero")
+
+
+if __name__ == '__main__':
+    unittest.main()
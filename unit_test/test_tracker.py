@@ -1,6 +1,7 @@
 import unittest
 import sys
 import os
+import threading
 from datetime import datetime, timedelta, date
 
 current = os.path.dirname(os.path.realpath(__file__))
@@ -8,6 +9,7 @@ parent = os.path.dirname(current)
 sys.path.append(parent)
 
 import tracker
+import analytics_module
 
 
 class Test_Habit_Initializer_Habit_Id(unittest.TestCase):
@@ -93,5 +95,407 @@ class Test_Complete_Habit(unittest.TestCase):
                          "Does not complete weekly habit even though not completed")
 
 
+class Test_Change_Tracking(unittest.TestCase):
+
+    def setUp(self):
+        self.habit_list = tracker.Habit.habit_list
+        self.h1 = tracker.Habit("h1", "daily")
+        self.h1.complete_time_list.extend([datetime(2023, 12, 1), datetime(2023, 12, 2)])
+        self.habit_list.mark_saved()
+
+    def tearDown(self):
+        self.habit_list.clear()
+
+    def test_new_habit_is_inserted(self):
+        h2 = tracker.Habit("h2", "weekly")
+        removed_ids, changes = self.habit_list.take_changes()
+        self.assertEqual([(h2, True)], [(change.habit, change.insert) for change in changes],
+                         "New habit is not recorded for insertion")
+
+    def test_only_new_completions_are_recorded(self):
+        self.h1.complete_habit(datetime(2023, 12, 3))
+        change = self.habit_list.take_changes()[1][0]
+        self.assertEqual(([datetime(2023, 12, 3)], [], set()), (change.added, change.removed, change.update),
+                         "Completion changes are not recorded correctly")
+
+    def test_added_and_removed_date_cancel_out(self):
+        self.h1.complete_time_list.append(datetime(2023, 12, 3))
+        self.h1.complete_time_list.pop()
+        change = self.habit_list.take_changes()[1][0]
+        self.assertEqual(([], []), (change.added, change.removed),
+                         "Adding and removing the same date is recorded as change")
+
+    def test_rename_is_recorded(self):
+        self.h1.habit_name = "h1 renamed"
+        change = self.habit_list.take_changes()[1][0]
+        self.assertEqual({"habit_name"}, change.update, "Changed habit name is not recorded")
+
+    def test_deleted_habit_is_recorded(self):
+        self.habit_list.pop(0)
+        self.assertEqual(({1}, []), self.habit_list.take_changes(), "Deleted habit is not recorded")
+
+
+class Test_Completion_Storage(unittest.TestCase):
+
+    def setUp(self):
+        self.habit = tracker.Habit("h1", "daily")
+        self.habit.complete_time_list.extend([datetime(2023, 12, 1, 8, 30), date(2023, 12, 2)])
+
+    def tearDown(self):
+        tracker.Habit.habit_list.clear()
+
+    def test_days_stored_as_ordinals(self):
+        days = self.habit.complete_time_list.ordinals()
+        self.assertEqual(("i", [date(2023, 12, 1).toordinal(), date(2023, 12, 2).toordinal()]),
+                         (days.typecode, days.tolist()), "Completions are not stored as day ordinals")
+
+    def test_datetime_view(self):
+        self.assertEqual([datetime(2023, 12, 1), datetime(2023, 12, 2)], self.habit.complete_time_list,
+                         "Completions are not viewed as datetime objects at day resolution")
+        self.assertEqual(datetime(2023, 12, 2), self.habit.complete_time_list[-1], "Item access does not work")
+        self.assertIn(datetime(2023, 12, 1, 20), self.habit.complete_time_list, "Membership is not checked by day")
+
+    def test_habit_has_slots(self):
+        with self.assertRaises(AttributeError, msg="Habit accepts arbitrary attributes"):
+            self.habit.undefined = 1
+
+
+class Test_Backfill(unittest.TestCase):
+
+    def setUp(self):
+        self.daily = tracker.Habit("daily", "daily")
+        self.weekly = tracker.Habit("weekly", "weekly")
+        for day in (1, 4, 8):
+            self.daily.complete_habit(datetime(2023, 12, day))
+        # mondays of calendar weeks 49 and 51
+        for day in (4, 18):
+            self.weekly.complete_habit(datetime(2023, 12, day))
+
+    def tearDown(self):
+        tracker.Habit.habit_list.clear()
+
+    def test_backfill_keeps_order(self):
+        self.assertTrue(self.daily.backfill(datetime(2023, 12, 3)), "Past completion is rejected")
+        self.assertTrue(self.daily.complete_habit(datetime(2023, 11, 30)), "complete_habit does not backfill")
+        self.assertEqual([datetime(2023, 11, 30), datetime(2023, 12, 1), datetime(2023, 12, 3), datetime(2023, 12, 4),
+                          datetime(2023, 12, 8)], self.daily.complete_time_list,
+                         "Backfilled completions are not inserted at their sorted position")
+
+    def test_duplicate_period_rejected(self):
+        self.assertFalse(self.daily.backfill(datetime(2023, 12, 4, 18)), "Completed day is backfilled again")
+        self.assertFalse(self.weekly.backfill(datetime(2023, 12, 24)), "Completed week is backfilled again")
+        self.assertTrue(self.weekly.backfill(datetime(2023, 12, 14)), "Missing week is not backfilled")
+        self.assertEqual([datetime(2023, 12, 4), datetime(2023, 12, 14), datetime(2023, 12, 18)],
+                         self.weekly.complete_time_list, "Weekly completions are not in order")
+
+
+class Test_Complete_Many(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = tracker.Habit.habit_list
+        self.daily = tracker.Habit("daily", "daily")
+        self.weekly = tracker.Habit("weekly", "weekly")
+        self.daily.complete_habit(datetime(2023, 12, 5))
+        self.weekly.complete_habit(datetime(2023, 12, 5))
+
+    def tearDown(self):
+        self.registry.clear()
+
+    def test_complete_many_results(self):
+        results = self.daily.complete_many([datetime(2023, 12, 7), datetime(2023, 12, 5, 9), datetime(2023, 12, 3),
+                                            datetime(2023, 12, 7, 20)])
+        self.assertEqual([True, False, True, False], results, "Dates are not checked against completed days")
+        self.assertEqual([datetime(2023, 12, 3), datetime(2023, 12, 5), datetime(2023, 12, 7)],
+                         self.daily.complete_time_list, "Accepted dates are not merged in order")
+
+    def test_complete_many_weekly(self):
+        self.assertEqual([False, True, False, True],
+                         self.weekly.complete_many([datetime(2023, 12, 10), datetime(2023, 12, 12),
+                                                    datetime(2023, 12, 17), datetime(2023, 11, 27)]),
+                         "Dates are not deduplicated by calendar week")
+
+    def test_complete_bulk(self):
+        results = self.registry.complete_bulk({self.daily.habit_id: [datetime(2023, 12, 6)],
+                                               self.weekly.habit_id: [datetime(2023, 12, 6)],
+                                               999: [datetime(2023, 12, 6)]})
+        self.assertEqual({self.daily.habit_id: [True], self.weekly.habit_id: [False], 999: [False]}, results,
+                         "Bulk completion results are not reported per habit and date")
+
+
+class Test_Completion_Queries(unittest.TestCase):
+
+    def setUp(self):
+        self.daily = tracker.Habit("daily", "daily")
+        self.weekly = tracker.Habit("weekly", "weekly")
+        self.daily.complete_many([datetime(2023, 12, 1), datetime(2023, 12, 4), datetime(2023, 12, 5)])
+        self.weekly.complete_many([datetime(2023, 11, 29), datetime(2023, 12, 13)])
+
+    def tearDown(self):
+        tracker.Habit.habit_list.clear()
+
+    def test_past_dates(self):
+        self.assertEqual([True, False, True, False],
+                         [self.daily.was_completed(datetime(2023, 12, 4, 12)),
+                          self.daily.was_completed(date(2023, 12, 3)),
+                          self.weekly.completed_in_period(datetime(2023, 12, 17)),
+                          self.weekly.completed_in_period(datetime(2023, 12, 4))],
+                         "Past completion status is not determined correctly")
+
+    def test_vectorized_queries(self):
+        dates = [datetime(2023, 11, 27), datetime(2023, 12, 1), datetime(2023, 12, 6), datetime(2023, 12, 11)]
+        self.assertEqual([False, True, False, False], self.daily.was_completed_many(dates).tolist(),
+                         "Vectorized day check does not work")
+        self.assertEqual([True, True, False, True], self.weekly.completed_in_periods(dates).tolist(),
+                         "Vectorized period check does not work")
+        self.assertEqual([], tracker.Habit("new", "daily").completed_in_periods(dates[:0]).tolist(),
+                         "Vectorized check fails without dates")
+
+
+class Test_Streak_Counters(unittest.TestCase):
+
+    def setUp(self):
+        self.daily = tracker.Habit("daily", "daily")
+        self.weekly = tracker.Habit("weekly", "weekly")
+        self.today = datetime.today().replace(hour=0, minute=0, second=0, microsecond=0)
+        # runs of 2 and 3 days, the latter ending today
+        for offset in (7, 6, 2, 1, 0):
+            self.daily.complete_habit(self.today - timedelta(days=offset))
+        for day in (4, 11, 25):
+            self.weekly.complete_habit(datetime(2023, 12, day))
+
+    def tearDown(self):
+        tracker.Habit.habit_list.clear()
+
+    def test_streaks_match_analytics(self):
+        for habit in (self.daily, self.weekly):
+            self.assertEqual(analytics_module.streak_current(list(habit.complete_time_list), habit.period),
+                             (habit.current_streak, habit.current_streak_start), "Current streak is wrong")
+            self.assertEqual(analytics_module.streaks_longest(list(habit.complete_time_list), habit.period),
+                             (habit.longest_streak, habit.longest_streak_dates), "Longest streaks are wrong")
+
+    def test_appended_completion_updates_counter(self):
+        streaks = self.daily.streaks()
+        self.daily.complete_habit(self.today + timedelta(days=1))
+        self.assertIs(streaks, self.daily.streaks(), "Streak counter is replaced on completion")
+        self.assertEqual((4, [(self.today - timedelta(days=2), self.today + timedelta(days=1))]),
+                         (self.daily.longest_streak, self.daily.longest_streak_dates),
+                         "Appended completion does not extend the streak")
+
+    def test_backfill_and_period_change_recompute(self):
+        self.daily.streaks()
+        for offset in (5, 4, 3):
+            self.daily.backfill(self.today - timedelta(days=offset))
+        self.assertEqual((8, self.today - timedelta(days=7)),
+                         (self.daily.current_streak, self.daily.current_streak_start),
+                         "Backfilled completions do not join the streak")
+        self.weekly.streaks()
+        self.weekly.period = "daily"
+        self.assertEqual(1, self.weekly.longest_streak, "Streaks are not recomputed after a change of period")
+        self.daily.clear_tracking_data()
+        self.assertEqual((0, None, 0, []), (self.daily.current_streak, self.daily.current_streak_start,
+                                            self.daily.longest_streak, self.daily.longest_streak_dates),
+                         "Streaks are not reset with the tracking data")
+
+
+class Test_Thread_Safety(unittest.TestCase):
+
+    def setUp(self):
+        tracker.Habit.habit_list.clear()
+        self.habit = tracker.Habit("shared", "weekly", datetime(2024, 1, 1))
+        # frequent thread switches make races between checking and completing likely
+        self.switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+
+    def tearDown(self):
+        sys.setswitchinterval(self.switch_interval)
+        tracker.Habit.habit_list.clear()
+
+    def run_threads(self, work, count=8):
+        threads = [threading.Thread(target=work) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def test_concurrent_completion_once_per_period(self):
+        def work():
+            for day in range(7 * 300):
+                self.habit.complete_habit(datetime(2024, 1, 1) + timedelta(days=day))
+
+        self.run_threads(work)
+        self.assertEqual([datetime(2024, 1, 1) + timedelta(weeks=week) for week in range(300)],
+                         self.habit.complete_time_list, "Concurrent completions complete a week more than once")
+
+    def test_concurrent_creation_unique_ids(self):
+        def work():
+            for _ in range(200):
+                tracker.Habit("new", "daily")
+
+        self.run_threads(work)
+        ids = [habit.habit_id for habit in tracker.Habit.habit_list]
+        self.assertEqual(list(range(1, 1602)), sorted(ids), "Concurrently created habits share habit ids")
+        self.assertEqual(1601, len(tracker.Habit.habit_list.by_id), "Concurrently created habits are not indexed")
+
+
+class Test_Habit_Events(unittest.TestCase):
+
+    def setUp(self):
+        tracker.Habit.habit_list.clear()
+        self.events = []
+        tracker.Habit.events.subscribe(self.events.append)
+
+    def tearDown(self):
+        tracker.Habit.events.unsubscribe(self.events.append)
+        tracker.Habit.habit_list.clear()
+
+    def test_events_of_habit_life_cycle(self):
+        habit = tracker.Habit("h1", "daily", datetime(2023, 12, 1))
+        habit.habit_name = "h2"
+        habit.period = "weekly"
+        habit.complete_habit(datetime(2023, 12, 4))
+        habit.complete_habit(datetime(2023, 12, 11))
+        habit.complete_time_list.remove(datetime(2023, 12, 11))
+        habit.clear_tracking_data()
+        tracker.Habit.habit_list.remove(habit)
+        self.assertEqual([("created", None, None), ("renamed", "h1", "h2"), ("period_changed", "daily", "weekly"),
+                          ("completed", None, datetime(2023, 12, 4)), ("completed", None, datetime(2023, 12, 11)),
+                          ("removed", datetime(2023, 12, 11), None), ("cleared", [datetime(2023, 12, 4)], None),
+                          ("deleted", None, None)],
+                         [(event.kind, event.old, event.new) for event in self.events], "Habit events are wrong")
+        self.assertTrue(all(event.habit is habit for event in self.events), "Events do not refer to the habit")
+
+    def test_subscription_by_kind(self):
+        completed = []
+        tracker.Habit.events.subscribe(completed.append, ["completed"])
+        habit = tracker.Habit("h1", "daily")
+        habit.complete_many([datetime(2023, 12, 1), datetime(2023, 12, 2)])
+        habit.habit_name = "h1"
+        tracker.Habit.events.unsubscribe(completed.append)
+        habit.complete_habit(datetime(2023, 12, 3))
+        self.assertEqual([datetime(2023, 12, 1), datetime(2023, 12, 2)], [event.new for event in completed],
+                         "Subscriber receives events of other kinds or after unsubscribing")
+        self.assertNotIn("renamed", [event.kind for event in self.events], "Unchanged name is published")
+        with self.assertRaises(ValueError, msg="Unknown event kind is accepted"):
+            tracker.Habit.events.subscribe(completed.append, ["updated"])
+
+
+class Test_Id_Allocation(unittest.TestCase):
+
+    def setUp(self):
+        self.habit_list = tracker.Habit.habit_list
+        self.habit_list.clear()
+        self.habits = [tracker.Habit(f"h{i}", "daily") for i in range(1, 6)]
+
+    def tearDown(self):
+        self.habit_list.clear()
+
+    def test_smallest_free_id_is_reused(self):
+        self.habit_list.remove(self.habits[3])
+        self.habit_list.remove(self.habits[1])
+        self.assertEqual([2, 4, 6], [tracker.Habit("new", "daily").habit_id for _ in range(3)],
+                         "Freed ids are not reused in ascending order")
+
+    def test_order_of_habit_list_is_kept(self):
+        self.habit_list.remove(self.habits[0])
+        tracker.Habit("new", "daily")
+        self.assertEqual(["h2", "h3", "h4", "h5", "new"], [habit.habit_name for habit in self.habit_list],
+                         "Creating a habit reorders habit_list")
+
+    def test_sparse_id_only_raises_high_water_mark(self):
+        tracker.Habit("loaded", "daily", habit_id=10 ** 6)
+        self.assertEqual([], self.habit_list.ids.free, "Ids below a given habit_id are stored as free")
+        self.habit_list.remove(self.habits[2])
+        self.assertEqual([3, 10 ** 6 + 1], [tracker.Habit("new", "daily").habit_id for _ in range(2)],
+                         "Freed id or id above the high-water mark is not allocated")
+
+
+class Test_Habit_Registry(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = tracker.Habit.habit_list
+        self.registry.clear()
+        self.h1 = tracker.Habit("h1", "daily")
+        self.h2 = tracker.Habit("h2", "weekly")
+        self.h3 = tracker.Habit("h3", "daily")
+
+    def tearDown(self):
+        self.registry.clear()
+
+    def test_lookup_by_id_and_name(self):
+        self.assertIs(self.h2, self.registry.get(self.h2.habit_id), "Habit is not found by habit_id")
+        self.assertEqual([self.h3], self.registry.habits_by_name("h3"), "Habit is not found by name")
+
+    def test_period_listing_follows_list_order(self):
+        self.h2.period = "daily"
+        self.assertEqual([self.h1, self.h2, self.h3], self.registry.habits_by_period("daily"),
+                         "Period index does not follow list order")
+        self.assertEqual([], self.registry.habits_by_period("weekly"), "Period index keeps old period")
+        self.registry.sort(key=lambda habit: habit.habit_name, reverse=True)
+        self.assertEqual([self.h3, self.h2, self.h1], self.registry.habits_by_period("daily"),
+                         "Period index does not follow sorted list")
+
+    def test_period_listing_follows_inserted_habit(self):
+        self.registry.remove(self.h3)
+        self.registry.insert(0, self.h3)
+        self.h2.period = "daily"
+        self.assertEqual([self.h3, self.h1, self.h2], self.registry.habits_by_period("daily"),
+                         "Period index does not follow list order after insert")
+
+    def test_removed_habit_is_unindexed(self):
+        self.registry.remove(self.h1)
+        self.h3.habit_name = "renamed"
+        self.assertEqual((None, [self.h3], [], [self.h3]),
+                         (self.registry.get(self.h1.habit_id), self.registry.habits_by_period("daily"),
+                          self.registry.habits_by_name("h3"), self.registry.habits_by_name("renamed")),
+                         "Indexes are not maintained on removal and rename")
+
+
+class Test_Lazy_Completion_List(unittest.TestCase):
+
+    def setUp(self):
+        self.loads = 0
+        self.habit = tracker.Habit("h1", "daily")
+        self.habit.load_complete_time_list_lazily(self.loader, 2, datetime(2023, 12, 2))
+        tracker.Habit.habit_list.mark_saved()
+
+    def tearDown(self):
+        tracker.Habit.habit_list.clear()
+
+    def loader(self):
+        self.loads += 1
+        return [datetime(2023, 12, 1), datetime(2023, 12, 2)]
+
+    def test_length_and_last_date_without_loading(self):
+        self.assertEqual((2, datetime(2023, 12, 2), 0),
+                         (len(self.habit.complete_time_list), self.habit.complete_time_list[-1], self.loads),
+                         "Lazy completion list loads for length or last date")
+
+    def test_new_completion_without_loading(self):
+        self.habit.complete_habit(datetime(2023, 12, 3))
+        self.assertEqual((3, 0), (len(self.habit.complete_time_list), self.loads),
+                         "Completion of lazy list loads the completion history")
+        self.assertEqual([datetime(2023, 12, 1), datetime(2023, 12, 2), datetime(2023, 12, 3)],
+                         list(self.habit.complete_time_list), "Loaded dates are not merged with new completions")
+        change = tracker.Habit.habit_list.take_changes()[1][0]
+        self.assertEqual([datetime(2023, 12, 3)], change.added, "Completion of lazy list is not recorded")
+
+    def test_loaded_once(self):
+        list(self.habit.complete_time_list)
+        self.assertIn(datetime(2023, 12, 1), self.habit.complete_time_list)
+        self.assertEqual(1, self.loads, "Lazy completion list loads more than once")
+
+    def test_clear_without_loading(self):
+        events = []
+        tracker.Habit.events.subscribe(events.append, ["cleared"])
+        try:
+            self.habit.clear_tracking_data()
+        finally:
+            tracker.Habit.events.unsubscribe(events.append)
+        self.assertEqual((0, 0), (self.loads, len(self.habit.complete_time_list)),
+                         "Clearing lazy completion list loads the completion history")
+        self.assertEqual([None], [event.old for event in events], "Cleared event of unloaded list has old dates")
+        self.assertTrue(tracker.Habit.habit_list.take_changes()[1][0].cleared, "Clearing lazy list is not recorded")
+
+
 if __name__ == '__main__':
     unittest.main()
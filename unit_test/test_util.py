@@ -1,5 +1,6 @@
 import unittest
 import os
+import random
 import sys
 import tracker_testing_data
 from datetime import timedelta, datetime, date
@@ -156,6 +157,50 @@ class Test_Week_Streak(unittest.TestCase):
                          'if there is a streak across entire years -> long year')
 
 
+def reference_week_streak(date_start, date_end) -> int:
+    """Former year-by-year implementation of week_streak, expects date_start <= date_end in different ISO weeks"""
+    def long_year(year):
+        return date(year, 12, 28).isocalendar()[1] == 53
+
+    year_start, week_start = date_start.isocalendar()[:2]
+    year_end, week_end = date_end.isocalendar()[:2]
+    if year_start == year_end:
+        return week_end - week_start + 1
+    week_compensation = sum(long_year(year) for year in range(year_start + 1, year_end))
+    annual_weeks_start = 53 if long_year(year_start) else 52
+    return (annual_weeks_start - week_start + 1) + week_end + (year_end - year_start - 1) * 52 + week_compensation
+
+
+class Test_Iso_Week_Index(unittest.TestCase):
+
+    def test_matches_year_by_year_implementation(self):
+        generator = random.Random(22)
+        first, last = date(1600, 1, 1).toordinal(), date(2600, 12, 31).toordinal()
+        for _ in range(5000):
+            date_start, date_end = sorted(date.fromordinal(generator.randint(first, last)) for _ in range(2))
+            if date_start.isocalendar()[:2] == date_end.isocalendar()[:2]:
+                expected = 1
+            else:
+                expected = reference_week_streak(date_start, date_end)
+            self.assertEqual(expected, tracker_util.week_streak(date_end, date_start),
+                             f"Week streak from {date_start} to {date_end} is wrong")
+
+    def test_index_follows_iso_calendar(self):
+        generator = random.Random(7)
+        for _ in range(5000):
+            day = date.fromordinal(generator.randint(1, date(9999, 12, 31).toordinal()))
+            year, week = day.isocalendar()[:2]
+            self.assertEqual(tracker_util.iso_week_index(date.fromisocalendar(year, week, 1)),
+                             tracker_util.iso_week_index(day), f"Week index of {day} is not its ISO week")
+        self.assertEqual([year for year in range(1, 10000) if date(year, 12, 28).isocalendar()[1] == 53],
+                         [year for year in range(1, 10000) if tracker_util.is_long_year(year)],
+                         "Long years are not those with 53 ISO weeks")
+
+    def test_same_week_number_in_different_years(self):
+        self.assertEqual(158, tracker_util.week_streak(datetime(2020, 3, 2), datetime(2023, 3, 6)),
+                         "Equal week numbers of different years count as one week")
+
+
 class Test_Filter_Period_Habit(unittest.TestCase):
 
     def setUp(self):
@@ -316,6 +361,46 @@ class Test_Filter_From_Date(unittest.TestCase):
                          "if cut-off date is smaller than any element of list")
 
 
+class Test_Date_Range(unittest.TestCase):
+
+    def setUp(self):
+        tracker.Habit.habit_list.clear()
+        self.habit = tracker.Habit("h1", "daily", datetime(2023, 12, 1))
+        self.habit.complete_many([datetime(2023, 12, day) for day in (1, 3, 4, 8, 10)])
+
+    def tearDown(self):
+        tracker.Habit.habit_list.clear()
+
+    def test_window_of_completion_list(self):
+        window = tracker_util.date_range(self.habit.complete_time_list, datetime(2023, 12, 3, 18), date(2023, 12, 8))
+        self.assertEqual([datetime(2023, 12, 3), datetime(2023, 12, 4), datetime(2023, 12, 8)], window,
+                         "Window does not hold the dates between both days")
+        self.assertEqual((datetime(2023, 12, 8), [datetime(2023, 12, 4)]), (window[-1], window[1:2]),
+                         "Window is not indexed like a list")
+
+    def test_window_unaffected_by_later_changes(self):
+        window = tracker_util.date_range(self.habit.complete_time_list, datetime(2023, 12, 3), datetime(2023, 12, 8))
+        self.habit.backfill(datetime(2023, 12, 2))
+        self.habit.complete_many([datetime(2023, 12, 5), datetime(2023, 12, 6)])
+        self.assertEqual([datetime(2023, 12, 3), datetime(2023, 12, 4), datetime(2023, 12, 8)], window,
+                         "Window follows changes of the completion list")
+
+    def test_count_dates(self):
+        self.assertEqual([3, 0, 5], [tracker_util.count_dates(self.habit.complete_time_list, datetime(2023, 12, 4)),
+                                     tracker_util.count_dates(self.habit.complete_time_list, date(2023, 12, 5),
+                                                              date(2023, 12, 7)),
+                                     tracker_util.count_dates(self.habit.complete_time_list)],
+                         "Dates in window are not counted")
+        self.assertEqual(2, tracker_util.count_dates([datetime(2023, 12, 9), datetime(2023, 12, 1),
+                                                      datetime(2023, 12, 3)], None, datetime(2023, 12, 3)),
+                         "Dates of unsorted list are not counted")
+
+    def test_filter_completion_list(self):
+        self.assertEqual([datetime(2023, 12, 1), datetime(2023, 12, 3)],
+                         tracker_util.filter_from_date(self.habit.complete_time_list, datetime(2023, 12, 3), "after"),
+                         "Completion list is not filtered by binary search")
+
+
 class Test_get_earliest_Creation_Date(unittest.TestCase):
 
     def setUp(self):
@@ -2,7 +2,10 @@ import unittest
 import test_tracker
 import test_analytics
 import test_databaseSQL
+import test_databaseAsync
 import test_util
+import test_completion_bitmap
+import test_date_kernel
 
 
 def suite():
@@ -10,7 +13,10 @@ def suite():
     my_suite.addTest(unittest.TestLoader().loadTestsFromModule(test_tracker))
     my_suite.addTest(unittest.TestLoader().loadTestsFromModule(test_analytics))
     my_suite.addTest(unittest.TestLoader().loadTestsFromModule(test_databaseSQL))
+    my_suite.addTest(unittest.TestLoader().loadTestsFromModule(test_databaseAsync))
     my_suite.addTest(unittest.TestLoader().loadTestsFromModule(test_util))
+    my_suite.addTest(unittest.TestLoader().loadTestsFromModule(test_completion_bitmap))
+    my_suite.addTest(unittest.TestLoader().loadTestsFromModule(test_date_kernel))
     return my_suite
 
 
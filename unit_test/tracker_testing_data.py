@@ -1,5 +1,6 @@
 import os
 import sys
+import tempfile
 from datetime import datetime, timedelta
 
 # load modules from parent folder
@@ -126,6 +127,25 @@ def load_test_data_to_db() -> None:
     tracker.Habit.habit_list.clear()
 
 
+def temp_db() -> tuple:
+    """Returns file name and database name of a new temporary database file, see remove_db
+
+    :return: tuple[str, str]: file name, database name"""
+    file_name = os.path.join(tempfile.mkdtemp(), "test.db")
+    return file_name, f"sqlite:///{file_name}"
+
+
+def remove_db(file_name) -> None:
+    """Closes shared engine of a temporary database and deletes its file, WAL, shared memory and journal file and its
+    directory
+
+    :param str file_name: file name of database"""
+    databaseSQL.close_engine(f"sqlite:///{file_name}")
+    for suffix in ("", "-wal", "-shm", "-journal"):
+        tracker_util.delete_file(file_name + suffix)
+    os.rmdir(os.path.dirname(file_name))
+
+
 def insert_test_date_into_habit(habit, indate):
     """Simulates regular entry of testing data on given date"""
     # complete habit